@@ -1,10 +1,17 @@
 import sys
 import os
+import time
+import threading
 import streamlit as st
+import streamlit.components.v1 as components
 
 # Ensure we can import from the src directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# When set, the graph runs in the analysis service (python -m src.service) and this app is a thin client
+ANALYSIS_SERVICE_URL = os.environ.get("ANALYSIS_SERVICE_URL")
+READINESS_POLL_SECONDS = 2   # sidebar refresh while Ollama models are still warming
+
 # --- STREAMLIT CONFIG ---
 st.set_page_config(
     page_title="Agentic Event Intel",
@@ -16,6 +23,17 @@ st.set_page_config(
 # This block handles the connection to your backend and catches dependency errors
 try:
     from src.graph import build_graph
+    from src.rag import warm_vectorstore, EMBEDDING_MODEL
+    from src.agents import llm, creative_llm
+    from src.ollama_clients import embeddings_model, warm_models, get_model_readiness
+    from src.result_cache import CachedGraph
+    from src.telemetry import TraceRecorder, format_span, get_trace_summary
+    from src.streaming import stream_with_spans, partial_json_string
+    from src.marketing_renderer import PageAssembler
+    from src.fast_path import get_fast_path_stats
+    from src.llm_scheduler import get_scheduler_stats
+    from src.memory_writer import get_memory_writer
+    from src.service import AnalysisClient, ServiceBusy
 except ImportError as e:
     # Check specifically for the common Pydantic/LangChain version mismatch
     if "pydantic_v1" in str(e) or "langchain_core" in str(e):
@@ -41,7 +59,16 @@ def load_agent_system():
     Load the graph once and cache it. 
     This prevents re-initializing the LLM/VectorDB on every button click.
     """
-    return build_graph()
+    # Load the Ollama models in the background; the sidebar polls their readiness
+    models = {"Reasoning LLM": llm, "Creative LLM": creative_llm, "Embeddings": embeddings_model(EMBEDDING_MODEL)}
+    warmup = threading.Thread(target=warm_models, args=(models,), daemon=True)
+    warmup.start()
+    # Warm the shared vector store so the first analysis doesn't pay for it
+    warm_vectorstore()
+    # Start the memory writer now so feedback journaled before a crash is replayed
+    get_memory_writer()
+    # Near-duplicate events are answered from the semantic result cache
+    return CachedGraph(build_graph())
 
 # --- CSS STYLING ---
 st.markdown("""
@@ -54,6 +81,146 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# --- EXECUTION MODES ---
+def run_blocking(app, inputs, recorder):
+    """
+    Runs the graph in a worker thread; this (script) thread renders
+    each node/LLM span as soon as it finishes.
+    """
+    outcome = {}
+    
+    def _run_graph():
+        try:
+            outcome["result"] = app.invoke(inputs, config={"callbacks": [recorder]})
+        except Exception as e:
+            outcome["error"] = e
+    
+    worker = threading.Thread(target=_run_graph, daemon=True)
+    worker.start()
+    while worker.is_alive():
+        for span in recorder.drain():
+            st.write(format_span(span))
+        time.sleep(0.1)
+    for span in recorder.drain():
+        st.write(format_span(span))
+    
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+def run_remote_blocking(client, job_id, status):
+    """
+    Waits for a service job, showing each span as the service reports it.
+    """
+    result = {}
+    for event in client.stream(job_id, tokens=False):
+        if event["type"] == "span":
+            with status:
+                st.write(format_span(event["span"]))
+        elif event["type"] == "final":
+            result = event["state"]
+    return result
+
+def run_streaming(events, event_name, status, live):
+    """
+    Streams tokens into live panels: the Event Profile as soon as inference is
+    done, then the risk reasoning and the landing page while they are written.
+    `events` is stream_with_spans() in-process, or AnalysisClient.stream() for
+    a service job. `live` is an st.empty() placed outside the status box.
+    """
+    with live.container():
+        st.subheader("⚡ Live Output")
+        profile_col, risk_col = st.columns([1, 1])
+        profile_slot = profile_col.empty()
+        risk_slot = risk_col.empty()
+        page_slot = st.empty()
+    
+    risk_text = ""
+    page = PageAssembler(event_name)
+    last_page_render = 0.0
+    result = {}
+    
+    for event in events:
+        if event["type"] == "span":
+            with status:
+                st.write(format_span(event["span"]))
+        elif event["type"] == "update" and "event_details" in event["data"]:
+            with profile_slot.container():
+                st.markdown("**Event Profile**")
+                st.json(event["data"].get("event_details", {}))
+        elif event["type"] == "token" and event["node"] == "risk":
+            risk_text += event["text"]
+            reasoning = partial_json_string(risk_text, "reasoning")
+            risk_slot.markdown(f"**Risk reasoning (live):** {reasoning or '…'}")
+        elif event["type"] == "token" and event["node"] == "marketing":
+            page.feed(event["text"])
+            # Re-rendering the iframe on every token is wasteful; twice a second is plenty
+            if time.time() - last_page_render > 0.5:
+                last_page_render = time.time()
+                with page_slot.container():
+                    components.html(page.snapshot(), height=400, scrolling=True)
+        elif event["type"] == "final":
+            result = event["state"]
+    
+    # The full dashboard below takes over from the live panels
+    live.empty()
+    return result
+
+def render_model_readiness(readiness):
+    """
+    One line per warmed Ollama model (filled in by warm_models at boot).
+    """
+    icons = {"ready": "🟢", "warming": "🟡", "error": "🔴"}
+    for label, state in readiness.items():
+        line = f"{icons.get(state['status'], '⚪')} {label} · `{state['model']}`"
+        if state["status"] == "ready":
+            line += f" · loaded in {state['seconds']:.1f}s"
+        elif state["status"] == "error":
+            line += f" · {state['error']}"
+        st.caption(line)
+
+@st.fragment(run_every=READINESS_POLL_SECONDS)
+def render_warming_models():
+    """
+    Re-runs on its own (just this panel) while models are still loading.
+    """
+    render_model_readiness(get_model_readiness())
+
+def render_service_status():
+    """
+    Thin-client sidebar: the service's queue and its model readiness.
+    """
+    client = AnalysisClient(ANALYSIS_SERVICE_URL)
+    try:
+        health = client.health()
+    except Exception as e:
+        st.error(f"Analysis service unreachable at {ANALYSIS_SERVICE_URL}: {e}")
+        st.stop()
+    st.session_state['agent_app'] = client
+    st.success(f"Analysis service · {health['workers']} workers")
+    st.caption(f"🏃 {health['running']} running · ⏳ {health['queued']}/{health['max_queued']} queued · "
+               f"🔗 {health['counters']['deduplicated']} deduplicated")
+    render_model_readiness(health["models"])
+    render_scheduler_stats(health["llm_scheduler"])
+
+def render_scheduler_stats(stats):
+    """
+    LLM scheduler table: queue depth and waits per priority class.
+    """
+    rows = [
+        {
+            "class": cls,
+            "running": f"{c['running']}/{c['limit']}",
+            "queued": c["queued"],
+            "calls": c["granted"],
+            "avg wait s": round(c["avg_wait_seconds"], 2),
+            "p95 wait s": round(c["p95_wait_seconds"], 2),
+        }
+        for cls, c in stats["classes"].items()
+    ]
+    st.caption(f"🚦 LLM slots: {stats['slots']} (JSON agents before page generation)")
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+
 # --- MAIN APP LOGIC ---
 def main():
     # Sidebar
@@ -61,7 +228,9 @@ def main():
         st.header("⚙️ System Status")
         
         # Initialize System
-        if 'app_initialized' not in st.session_state:
+        if ANALYSIS_SERVICE_URL:
+            render_service_status()
+        elif 'app_initialized' not in st.session_state:
             with st.spinner("Booting Agents & Memory..."):
                 try:
                     app = load_agent_system()
@@ -74,8 +243,15 @@ def main():
                     st.stop()
         else:
             st.success("System Ready")
+        if not ANALYSIS_SERVICE_URL:
+            readiness = get_model_readiness()
+            if any(state["status"] == "warming" for state in readiness.values()):
+                render_warming_models()
+            else:
+                render_model_readiness(readiness)
 
         st.markdown("---")
+        streaming = st.toggle("⚡ Stream agent output", value=True, help="Show the profile, risk reasoning and landing page while they are generated.")
         st.info("💡 **Architecture:**\n\n- **Orchestrator:** LangGraph\n- **Reasoning:** Llama 3.2\n- **Memory:** ChromaDB + mxbai-large\n- **Interface:** Streamlit")
         
         if st.button("🧹 Clear Cache / Reset"):
@@ -105,19 +281,34 @@ def main():
         if not app:
             st.error("Agents are not initialized. Please reset the app.")
             st.stop()
+        
+        job = None
+        if ANALYSIS_SERVICE_URL:
+            try:
+                job = app.submit(event_name)
+            except ServiceBusy as e:
+                st.warning(f"⏳ The analysis service is at capacity. Try again in about {e.retry_after:.0f}s.")
+                st.stop()
+            if job["deduplicated"]:
+                st.caption("🔗 An identical analysis is already running; showing its results.")
 
-        with st.status("🤖 Orchestrating Agents...", expanded=True) as status:
+        status = st.status("🤖 Orchestrating Agents...", expanded=True)
+        # Live panels sit below the status box, so they stay visible when it collapses
+        live = st.empty()
+        with status:
             try:
                 # 1. Run the Graph
                 inputs = {"event_name": event_name}
+                recorder = TraceRecorder()
                 
-                st.write("🕵️ Inference Agent: Expanding context & normalizing data...")
-                # Invoke the graph
-                result = app.invoke(inputs)
-                
-                st.write("🧠 Memory Agent: Retrieving SOPs & Historical Failures...")
-                st.write("⚠️ Risk Agent: Calculating safety score...")
-                st.write("🎨 Marketing Agent: Coding landing page...")
+                if job and streaming:
+                    result = run_streaming(app.stream(job["job_id"]), event_name, status, live)
+                elif job:
+                    result = run_remote_blocking(app, job["job_id"], status)
+                elif streaming:
+                    result = run_streaming(stream_with_spans(app, inputs, recorder), event_name, status, live)
+                else:
+                    result = run_blocking(app, inputs, recorder)
                 
                 # Extract Data
                 details = result.get('event_details', {})
@@ -189,8 +380,36 @@ def main():
             
             # Preview (Sandboxed iframe)
             st.caption("Live Preview:")
-            import streamlit.components.v1 as components
             components.html(marketing, height=600, scrolling=True)
 
+def render_performance_panel():
+    """
+    Rolling per-stage summary of recent traces (this process).
+    """
+    summary = get_trace_summary()
+    if not summary:
+        return
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("📈 Performance (recent runs)")
+        fast = get_fast_path_stats()
+        if fast["requests"]:
+            st.caption(f"⚡ Fast path served {fast['fast']}/{fast['requests']} requests ({fast['fast_fraction']:.0%}) without the inference/classification LLM calls.")
+        rows = [
+            {
+                "stage": stage,
+                "runs": stats["runs"],
+                "avg s": round(stats["avg_seconds"], 2),
+                "p95 s": round(stats["p95_seconds"], 2),
+                "tok/s": round(stats["avg_tokens_per_second"], 1),
+                "docs": round(stats["avg_docs"], 1),
+            }
+            for stage, stats in summary.items()
+        ]
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        if not ANALYSIS_SERVICE_URL:
+            render_scheduler_stats(get_scheduler_stats())
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+    render_performance_panel()
\ No newline at end of file
@@ -1,17 +1,69 @@
+import os
 import json
-from langchain_ollama import ChatOllama
+import asyncio
+from typing import Any, Dict
+from pydantic import ValidationError
 from langchain_core.messages import SystemMessage, HumanMessage
 from .state import AgentState
-from .tools import retrieve_sop_guidelines, retrieve_past_events
-from .prompts import INFERENCE_PROMPT, CLASSIFICATION_PROMPT, RISK_ANALYSIS_PROMPT, MARKETING_PROMPT
+from .tools import retrieve_context
+from .context import build_risk_context
+from .fast_path import fast_classify, record_fast_path
+from .prompts import INFERENCE_PROMPT, CLASSIFICATION_PROMPT, PROFILE_PROMPT, RISK_ANALYSIS_PROMPT, MARKETING_PROMPT
+from .schemas import ProfileWithTags
+from .ollama_clients import chat_model
+from .llm_scheduler import ScheduledChatModel
 
 # --- IMPORT THE NEW RENDERER ---
-from .marketing_renderer import render_full_page
+from .marketing_renderer import render_full_page, clean_body
 
 # --- CONFIGURATION ---
-# Ensure you have run `ollama pull llama3.2`
-llm = ChatOllama(model="llama3.2", temperature=0, format="json")
-creative_llm = ChatOllama(model="llama3.2", temperature=0.7) # Higher temp for creativity
+# "ollama": the real models | "mock": deterministic canned replies (see src/mock_llm.py)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "ollama")
+# Every client takes a slot from src/llm_scheduler.py: short JSON calls go before page generations
+LLM_SCHEDULING = os.environ.get("LLM_SCHEDULING", "1") != "0"
+CLIENT_PRIORITIES = {"llm": "json", "profile_llm": "json", "creative_llm": "creative"}
+
+def make_llms(backend: str = LLM_BACKEND, scheduled: bool = LLM_SCHEDULING, **options) -> Dict[str, Any]:
+    """
+    Builds the llm / creative_llm / profile_llm clients for a backend.
+    `options` go to the mock (latency_seconds, tokens_per_second).
+    scheduled=False returns the bare clients (no priority queue in front).
+    """
+    clients = _make_clients(backend, **options)
+    if not scheduled:
+        return clients
+    return {name: ScheduledChatModel(client, CLIENT_PRIORITIES[name]) for name, client in clients.items()}
+
+def _make_clients(backend: str, **options) -> Dict[str, Any]:
+    if backend == "mock":
+        from .mock_llm import mock_llms
+        return mock_llms(**options)
+    if backend != "ollama":
+        raise ValueError(f"Unknown LLM backend: {backend!r} (expected 'ollama' or 'mock')")
+    # Ensure you have run `ollama pull llama3.2`
+    # Clients come from the shared layer (pooled connections + keep_alive)
+    return {
+        "llm": chat_model("llama3.2", temperature=0, format="json"),
+        "creative_llm": chat_model("llama3.2", temperature=0.7), # Higher temp for creativity
+        # Combined profile call: Ollama constrains the output to the JSON schema itself
+        "profile_llm": chat_model("llama3.2", temperature=0, format=ProfileWithTags.model_json_schema()),
+    }
+
+def use_llm_backend(backend: str, scheduled: bool = LLM_SCHEDULING, **options):
+    """
+    Swaps the module-level clients. Nodes look them up on every call, so
+    graphs that are already built pick up the change.
+    """
+    global llm, creative_llm, profile_llm
+    clients = make_llms(backend, scheduled=scheduled, **options)
+    llm, creative_llm, profile_llm = clients["llm"], clients["creative_llm"], clients["profile_llm"]
+
+_clients = make_llms()
+llm, creative_llm, profile_llm = _clients["llm"], _clients["creative_llm"], _clients["profile_llm"]
+
+# "split": Inference -> Classification (two calls)
+# "combined": one Profile call returning both (benchmark the saving vs quality)
+PROFILE_MODE = "split"
 
 # --- HELPER ---
 def clean_json_response(response_content: str) -> dict:
@@ -30,8 +82,66 @@ def clean_json_response(response_content: str) -> dict:
         except:
             return {"error": "Failed to parse JSON", "raw": response_content}
 
+# --- PROMPT BUILDERS ---
+# Shared by the sync and async versions of each node.
+
+def _inference_prompt(state: AgentState) -> str:
+    # Format the prompt with the input event name
+    return INFERENCE_PROMPT.format(event_name=state['event_name'])
+
+def _classification_prompt(state: AgentState) -> str:
+    return CLASSIFICATION_PROMPT.format(event_details_json=json.dumps(state['event_details']))
+
+def _profile_prompt(state: AgentState) -> str:
+    return PROFILE_PROMPT.format(event_name=state['event_name'])
+
+def _profile_update(profile: ProfileWithTags) -> AgentState:
+    return {"event_details": profile.event_details.model_dump(), "search_queries": profile.queries}
+
+def _risk_prompt(state: AgentState) -> str:
+    # Deduped, grouped and trimmed to a token budget instead of raw json.dumps
+    sops_context, memories_context, stats = build_risk_context(state['knowledge_docs'], state['past_memories'])
+    print(f"   ✂️ Risk context: {stats['tokens_before']} -> {stats['tokens_after']} tokens "
+          f"(saved {stats['tokens_saved']}, kept {stats['chunks_kept']}/{stats['chunks_in']} chunks)")
+    
+    return RISK_ANALYSIS_PROMPT.format(
+        event_details_json=json.dumps(state['event_details']),
+        sops_context=sops_context,
+        memories_context=memories_context
+    )
+
+def _marketing_prompt(state: AgentState) -> str:
+    # Inject variables into the prompt
+    return MARKETING_PROMPT.format(
+        event_name=state['event_name'],
+        event_details_json=json.dumps(state['event_details'])
+    )
+
+def _render_marketing(name: str, content_html: str) -> str:
+    # CLEANUP: Remove markdown backticks if the LLM accidentally added them
+    content_html = clean_body(content_html)
+    
+    # RENDER: Merge content with the beautiful Glassmorphism template
+    return render_full_page(title=name, body_content=content_html)
+
 # --- AGENT NODES ---
 
+def fast_path_agent(state: AgentState) -> AgentState:
+    """
+    Agent 0: Rule-Based Fast Path (Functional Node)
+    Fills the profile + search tags for routine events without calling the LLM.
+    Returns nothing when unsure, which routes the event to the LLM agents.
+    """
+    result = fast_classify(state['event_name'])
+    record_fast_path(result is not None)
+    
+    if result is None:
+        print("--- AGENT: FAST PATH (ambiguous, handing over to LLM agents) ---")
+        return {}
+    
+    print("--- AGENT: FAST PATH (routine event, skipping inference + classification) ---")
+    return result
+
 def inference_agent(state: AgentState) -> AgentState:
     """
     Agent 1: Event Context Inference
@@ -39,10 +149,7 @@ def inference_agent(state: AgentState) -> AgentState:
     """
     print(f"--- AGENT: INFERENCE (Processing '{state['event_name']}') ---")
     
-    # Format the prompt with the input event name
-    prompt = INFERENCE_PROMPT.format(event_name=state['event_name'])
-    
-    response = llm.invoke([HumanMessage(content=prompt)])
+    response = llm.invoke([HumanMessage(content=_inference_prompt(state))])
     data = clean_json_response(response.content)
     
     return {"event_details": data}
@@ -54,14 +161,28 @@ def classification_agent(state: AgentState) -> AgentState:
     """
     print("--- AGENT: CLASSIFICATION ---")
     
-    details = state['event_details']
-    prompt = CLASSIFICATION_PROMPT.format(event_details_json=json.dumps(details))
-    
-    response = llm.invoke([HumanMessage(content=prompt)])
+    response = llm.invoke([HumanMessage(content=_classification_prompt(state))])
     data = clean_json_response(response.content)
     
     return {"search_queries": data.get("queries", [])}
 
+def profile_agent(state: AgentState) -> AgentState:
+    """
+    Agent 1+2: Combined Profile (Inference + Classification)
+    One schema-constrained call returns the event profile AND the search tags.
+    Output is validated against ProfileWithTags; if it doesn't validate we
+    fall back to the two split agents instead of passing an error dict along.
+    """
+    print(f"--- AGENT: PROFILE (Processing '{state['event_name']}') ---")
+    
+    response = profile_llm.invoke([HumanMessage(content=_profile_prompt(state))])
+    try:
+        return _profile_update(ProfileWithTags.model_validate_json(response.content))
+    except ValidationError as e:
+        print(f"   ⚠️ Profile failed schema validation ({e.error_count()} errors). Falling back to split agents.")
+        details = inference_agent(state)
+        return {**details, **classification_agent({**state, **details})}
+
 def memory_retrieval_node(state: AgentState) -> AgentState:
     """
     Agent 3: Memory Retrieval (Functional Node)
@@ -71,11 +192,9 @@ def memory_retrieval_node(state: AgentState) -> AgentState:
     
     queries = state['search_queries']
     
-    # 1. Get SOPs (Knowledge)
-    sops = retrieve_sop_guidelines(queries)
-    
-    # 2. Get Past Events (Memory)
-    memories = retrieve_past_events(queries)
+    # Get SOPs (Knowledge) + Past Events (Memory) with one embedding call;
+    # past events are filtered on the event's type, setting, size and date
+    sops, memories = retrieve_context(queries, state.get('event_details'))
     
     return {"knowledge_docs": sops, "past_memories": memories}
 
@@ -86,17 +205,7 @@ def risk_analysis_agent(state: AgentState) -> AgentState:
     """
     print("--- AGENT: RISK ANALYSIS ---")
     
-    details = state['event_details']
-    sops = state['knowledge_docs']
-    memories = state['past_memories']
-    
-    prompt = RISK_ANALYSIS_PROMPT.format(
-        event_details_json=json.dumps(details),
-        sops_json=json.dumps(sops),
-        memories_json=json.dumps(memories)
-    )
-    
-    response = llm.invoke([HumanMessage(content=prompt)])
+    response = llm.invoke([HumanMessage(content=_risk_prompt(state))])
     data = clean_json_response(response.content)
     
     return {"risk_assessment": data}
@@ -108,24 +217,55 @@ def marketing_agent(state: AgentState) -> AgentState:
     """
     print("--- AGENT: MARKETING (Design Phase) ---")
     
-    details = state['event_details']
-    name = state['event_name']
-    
-    # Inject variables into the prompt
-    final_prompt = MARKETING_PROMPT.format(
-        event_name=name,
-        event_details_json=json.dumps(details)
-    )
-    
     # Get the "Content Blocks" from Llama 3.2
     # We use creative_llm (higher temp) for better copy
-    response = creative_llm.invoke([HumanMessage(content=final_prompt)])
-    content_html = response.content
+    response = creative_llm.invoke([HumanMessage(content=_marketing_prompt(state))])
     
-    # CLEANUP: Remove markdown backticks if the LLM accidentally added them
-    content_html = content_html.replace("```html", "").replace("```", "")
+    return {"marketing_code": _render_marketing(state['event_name'], response.content)}
+
+# --- ASYNC AGENT NODES ---
+# Same logic, but awaiting the model so many events can share one Ollama server.
+
+async def ainference_agent(state: AgentState) -> AgentState:
+    """Async version of inference_agent."""
+    print(f"--- AGENT: INFERENCE (Processing '{state['event_name']}') ---")
     
-    # RENDER: Merge content with the beautiful Glassmorphism template
-    full_website_code = render_full_page(title=name, body_content=content_html)
+    response = await llm.ainvoke([HumanMessage(content=_inference_prompt(state))])
+    return {"event_details": clean_json_response(response.content)}
+
+async def aclassification_agent(state: AgentState) -> AgentState:
+    """Async version of classification_agent."""
+    print("--- AGENT: CLASSIFICATION ---")
+    
+    response = await llm.ainvoke([HumanMessage(content=_classification_prompt(state))])
+    return {"search_queries": clean_json_response(response.content).get("queries", [])}
+
+async def aprofile_agent(state: AgentState) -> AgentState:
+    """Async version of profile_agent."""
+    print(f"--- AGENT: PROFILE (Processing '{state['event_name']}') ---")
+    
+    response = await profile_llm.ainvoke([HumanMessage(content=_profile_prompt(state))])
+    try:
+        return _profile_update(ProfileWithTags.model_validate_json(response.content))
+    except ValidationError as e:
+        print(f"   ⚠️ Profile failed schema validation ({e.error_count()} errors). Falling back to split agents.")
+        details = await ainference_agent(state)
+        return {**details, **(await aclassification_agent({**state, **details}))}
+
+async def amemory_retrieval_node(state: AgentState) -> AgentState:
+    """Async version of memory_retrieval_node (the vector DB client is sync, so it runs in a thread)."""
+    return await asyncio.to_thread(memory_retrieval_node, state)
+
+async def arisk_analysis_agent(state: AgentState) -> AgentState:
+    """Async version of risk_analysis_agent."""
+    print("--- AGENT: RISK ANALYSIS ---")
+    
+    response = await llm.ainvoke([HumanMessage(content=_risk_prompt(state))])
+    return {"risk_assessment": clean_json_response(response.content)}
+
+async def amarketing_agent(state: AgentState) -> AgentState:
+    """Async version of marketing_agent."""
+    print("--- AGENT: MARKETING (Design Phase) ---")
     
-    return {"marketing_code": full_website_code}
\ No newline at end of file
+    response = await creative_llm.ainvoke([HumanMessage(content=_marketing_prompt(state))])
+    return {"marketing_code": _render_marketing(state['event_name'], response.content)}
@@ -0,0 +1,162 @@
+"""
+Batch mode: score a CSV/JSONL of event names from the command line.
+
+    python -m src.batch events.csv -o results.jsonl --concurrency 4
+
+Results are appended to the output JSONL one event at a time. That file is
+also the checkpoint: re-running the same command skips every row that
+already has a successful result, so a crash only costs the in-flight events.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict, deque
+from typing import Dict, Iterator, Tuple, Any
+
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.graph import build_graph, analyze_many
+from src.telemetry import TraceRecorder, percentile
+
+# --- INPUT ---
+
+def read_events(path: str) -> Iterator[Tuple[int, str]]:
+    """
+    Streams (row, event_name) pairs from a .csv or .jsonl file.
+    CSV: uses the `event_name` column, or the first column if there isn't one.
+    JSONL: each line is either {"event_name": ...} or a bare JSON string.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            if "event_name" in header:
+                column = header.index("event_name")
+            else:
+                # No header row we recognise: treat it as data
+                column = 0
+                if header and header[0].strip():
+                    yield 0, header[0].strip()
+            for row, record in enumerate(reader, start=1):
+                if len(record) > column and record[column].strip():
+                    yield row, record[column].strip()
+        else:
+            for row, line in enumerate(f):
+                line = line.strip()
+                if not line: continue
+                item = json.loads(line)
+                name = item.get("event_name", "") if isinstance(item, dict) else str(item)
+                if name.strip():
+                    yield row, name.strip()
+
+def load_checkpoint(output_path: str) -> set:
+    """
+    Rows that already have a successful result in the output file.
+    A half-written last line (crash mid-write) is ignored.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "error" not in record:
+                done.add(record["row"])
+    return done
+
+# --- RUNNER ---
+
+def _to_record(row: int, event_name: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    if "error" in result:
+        return {"row": row, "event_name": event_name, "error": result["error"]}
+    return {
+        "row": row,
+        "event_name": event_name,
+        "event_details": result.get("event_details", {}),
+        "search_queries": result.get("search_queries", []),
+        "risk_assessment": result.get("risk_assessment", {}),
+        "sources": {
+            "sops": result.get("knowledge_docs", []),
+            "memories": result.get("past_memories", []),
+        },
+    }
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 4) -> Dict[str, Any]:
+    """
+    Runs every not-yet-done row through the graph and appends results as they finish.
+    Returns a summary with throughput and per-stage latency percentiles.
+    """
+    done_rows = load_checkpoint(output_path)
+    if done_rows:
+        print(f"⏩ Resuming: {len(done_rows)} events already scored in {output_path}")
+
+    # Duplicate names are fine: each name maps to the queue of rows waiting on it
+    waiting: Dict[str, deque] = defaultdict(deque)
+    def todo() -> Iterator[str]:
+        for row, name in read_events(input_path):
+            if row in done_rows: continue
+            waiting[name].append(row)
+            yield name
+
+    timer = TraceRecorder()
+    app = build_graph()
+    completed = failed = 0
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async for name, result in analyze_many(todo(), concurrency=concurrency, app=app, config={"callbacks": [timer]}):
+            record = _to_record(waiting[name].popleft(), name, result)
+            out.write(json.dumps(record) + "\n")
+            # Flush per event: this line IS the checkpoint
+            out.flush()
+            os.fsync(out.fileno())
+
+            if "error" in record:
+                failed += 1
+                print(f"   ❌ Row {record['row']}: {record['error']}")
+            else:
+                completed += 1
+            if (completed + failed) % 10 == 0:
+                rate = (completed + failed) / (time.perf_counter() - start) * 60
+                print(f"   📈 {completed + failed} events processed ({rate:.1f} events/min)")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "completed": completed,
+        "failed": failed,
+        "skipped": len(done_rows),
+        "elapsed_seconds": elapsed,
+        "events_per_minute": (completed + failed) / elapsed * 60 if elapsed else 0.0,
+        "stages": {
+            stage: {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for stage, values in timer.durations.items()
+        },
+    }
+
+def print_summary(summary: Dict[str, Any]):
+    print("\n✅ BATCH COMPLETE")
+    print(f"   Scored: {summary['completed']} | Failed: {summary['failed']} | Skipped (checkpoint): {summary['skipped']}")
+    print(f"   Throughput: {summary['events_per_minute']:.1f} events/min over {summary['elapsed_seconds']:.1f}s")
+    print("\n⏱️ STAGE LATENCY (seconds)")
+    for stage, stats in sorted(summary["stages"].items()):
+        print(f"   {stage:<24} p50 {stats['p50']:7.2f} | p95 {stats['p95']:7.2f} | n={stats['count']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV/JSONL of events through the agent graph")
+    parser.add_argument("input", help="Input .csv (event_name column) or .jsonl file")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="Output JSONL (also the resume checkpoint)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Events analyzed in parallel")
+    args = parser.parse_args()
+
+    print(f"🚀 Batch scoring '{args.input}' -> '{args.output}' (concurrency={args.concurrency})")
+    print_summary(asyncio.run(run_batch(args.input, args.output, concurrency=args.concurrency)))
@@ -0,0 +1,216 @@
+"""
+End-to-end pipeline benchmark on the deterministic mock LLM backend.
+
+    python -m src.bench_pipeline --concurrency 1 2 4 8 --events 32
+
+Drives build_graph() through analyze_many at increasing concurrency, with the
+mock models (fixed latency + token rate) and the offline hashing embedder, so
+numbers only move when OUR code changes. For each level it reports
+throughput, per-node time, and where the non-model time goes: JSON parsing,
+retrieval, risk-context assembly, page rendering, and graph orchestration
+(time inside a run when no node is executing: state merging/copying,
+scheduling, sub-graph hand-offs). Every run is appended to a JSONL file
+tagged with the git commit, so results can be compared across commits.
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import shutil
+import subprocess
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, redirect_stdout
+from typing import Any, Dict, List
+
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.rag as rag
+import src.agents as agents
+from src.graph import build_graph, analyze_many
+from src.telemetry import TraceRecorder, percentile
+from src.mock_llm import MOCK_LATENCY_SECONDS, MOCK_TOKENS_PER_SECOND
+from src.bench_retrieval import HashingEmbeddings, isolated_knowledge_base, build_corpus, SCENARIOS
+
+# --- CONFIGURATION ---
+DEFAULT_CONCURRENCY = [1, 2, 4, 8]
+DEFAULT_EVENTS = 32
+DEFAULT_OUTPUT = os.path.join(rag.PROJECT_ROOT, "bench_pipeline.jsonl")
+
+# Functions in src/agents.py timed as their own bucket (looked up by the nodes at call time)
+STAGE_FUNCTIONS = {
+    "json_parsing": "clean_json_response",
+    "retrieval": "retrieve_context",
+    "context_assembly": "build_risk_context",
+    "rendering": "render_full_page",
+}
+
+class StageClock:
+    """
+    Accumulates wall time spent inside the STAGE_FUNCTIONS while installed.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def _wrap(self, stage: str, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[stage] += time.perf_counter() - start
+        return timed
+
+    @contextmanager
+    def installed(self):
+        originals = {name: getattr(agents, name) for name in STAGE_FUNCTIONS.values()}
+        for stage, name in STAGE_FUNCTIONS.items():
+            setattr(agents, name, self._wrap(stage, originals[name]))
+        try:
+            yield self
+        finally:
+            for name, fn in originals.items():
+                setattr(agents, name, fn)
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=rag.PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _covered_seconds(intervals: List[tuple]) -> float:
+    """
+    Length of the union of (start, end) intervals (parallel lanes overlap).
+    """
+    covered, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered
+
+def _analyze(spans: List[Dict[str, Any]], stage_seconds: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Folds the spans of one concurrency level into per-node times and a time breakdown.
+    """
+    runs = [s for s in spans if s["kind"] == "run" and not s.get("error")]
+    # Lane wrappers ("classify+memory+risk") contain the leaf nodes: count leaves only
+    leaves = [s for s in spans if s["kind"] == "node" and "+" not in s["name"]]
+    llm_seconds = sum(s["wall_seconds"] for s in spans if s["kind"] == "llm")
+
+    per_node = defaultdict(list)
+    for span in spans:
+        if span["kind"] == "node":
+            per_node[span["name"]].append(span["wall_seconds"])
+
+    by_trace = defaultdict(list)
+    for span in leaves:
+        by_trace[span["trace_id"]].append((span["timestamp"] - span["wall_seconds"], span["timestamp"]))
+    orchestration = sum(max(0.0, run["wall_seconds"] - _covered_seconds(by_trace[run["trace_id"]])) for run in runs)
+
+    node_seconds = sum(s["wall_seconds"] for s in leaves)
+    measured = sum(stage_seconds.values())
+    breakdown = {
+        "model": llm_seconds,
+        **{stage: stage_seconds.get(stage, 0.0) for stage in STAGE_FUNCTIONS},
+        "other_node_code": max(0.0, node_seconds - llm_seconds - measured),
+        "orchestration": orchestration,
+    }
+    total = sum(breakdown.values()) or 1.0
+    return {
+        "event_latency": {
+            "p50": percentile([r["wall_seconds"] for r in runs], 50),
+            "p95": percentile([r["wall_seconds"] for r in runs], 95),
+        },
+        "per_node_avg_seconds": {name: sum(v) / len(v) for name, v in sorted(per_node.items())},
+        "breakdown_seconds": breakdown,
+        "breakdown_share": {name: value / total for name, value in breakdown.items()},
+        "outside_model_share": 1 - breakdown["model"] / total,
+    }
+
+async def _run_level(app, events: List[str], concurrency: int) -> Dict[str, Any]:
+    recorder = TraceRecorder(sink_path=None)
+    clock = StageClock()
+    failed = 0
+    with clock.installed(), redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        async for _, result in analyze_many(events, concurrency=concurrency, app=app, config={"callbacks": [recorder]}):
+            failed += int("error" in result)
+        elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "events": len(events),
+        "failed": failed,
+        "elapsed_seconds": elapsed,
+        "events_per_second": len(events) / elapsed if elapsed else 0.0,
+        **_analyze(recorder.drain(), clock.seconds),
+    }
+
+def run_benchmark(concurrency_levels: List[int] = DEFAULT_CONCURRENCY, n_events: int = DEFAULT_EVENTS,
+                  latency_seconds: float = MOCK_LATENCY_SECONDS, tokens_per_second: float = MOCK_TOKENS_PER_SECOND,
+                  profile_mode: str = agents.PROFILE_MODE) -> Dict[str, Any]:
+    events = [SCENARIOS[i % len(SCENARIOS)]["event_name"] for i in range(n_events)]
+    saved_clients = (agents.llm, agents.creative_llm, agents.profile_llm)
+    # The mock serves any number of calls at once: keep the LLM scheduler's queueing out of the orchestration numbers
+    agents.use_llm_backend("mock", scheduled=False, latency_seconds=latency_seconds, tokens_per_second=tokens_per_second)
+    source_path = rag.DATA_PATH
+    root = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        with isolated_knowledge_base(root, HashingEmbeddings()):
+            with redirect_stdout(io.StringIO()):
+                build_corpus(source_path, rag.DATA_PATH, scale=1)
+                rag.ingest_knowledge_base()
+            app = build_graph(profile_mode=profile_mode)
+            levels = [asyncio.run(_run_level(app, events, c)) for c in concurrency_levels]
+    finally:
+        agents.llm, agents.creative_llm, agents.profile_llm = saved_clients
+        shutil.rmtree(root, ignore_errors=True)
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"events": n_events, "latency_seconds": latency_seconds, "tokens_per_second": tokens_per_second, "profile_mode": profile_mode},
+        "levels": levels,
+    }
+
+def print_report(results: Dict[str, Any]):
+    config = results["config"]
+    print(f"\n📊 PIPELINE BENCHMARK @ {results['commit']} ({config['events']} events, mock latency {config['latency_seconds']}s, "
+          f"{config['tokens_per_second']} tok/s, profile_mode={config['profile_mode']})")
+    print(f"   {'conc':>4} {'events/s':>9} {'p50 s':>7} {'p95 s':>7} {'outside model':>14}   breakdown")
+    for level in results["levels"]:
+        shares = " | ".join(f"{name} {share:.1%}" for name, share in level["breakdown_share"].items() if name != "model")
+        print(f"   {level['concurrency']:>4} {level['events_per_second']:9.2f} {level['event_latency']['p50']:7.3f} "
+              f"{level['event_latency']['p95']:7.3f} {level['outside_model_share']:14.1%}   {shares}")
+    print("\n⏱️ PER-NODE AVERAGE (seconds, highest concurrency)")
+    for name, seconds in results["levels"][-1]["per_node_avg_seconds"].items():
+        print(f"   {name:<24} {seconds:7.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the agent graph end to end on the mock LLM backend")
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY, help="Concurrency levels to sweep")
+    parser.add_argument("-n", "--events", type=int, default=DEFAULT_EVENTS, help="Events per concurrency level")
+    parser.add_argument("--latency", type=float, default=MOCK_LATENCY_SECONDS, help="Mock time to first token (seconds)")
+    parser.add_argument("--tps", type=float, default=MOCK_TOKENS_PER_SECOND, help="Mock tokens per second (0 = instant)")
+    parser.add_argument("--profile-mode", choices=["split", "combined"], default=agents.PROFILE_MODE)
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="JSONL file the run is appended to")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.concurrency, args.events, args.latency, args.tps, args.profile_mode)
+    print_report(results)
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(results) + "\n")
+    print(f"\n💾 Appended to {args.output}")
@@ -0,0 +1,300 @@
+"""
+Retrieval benchmark for the four canonical README scenarios.
+
+    python -m src.bench_retrieval --scales 1 10 100 1000 -o bench_retrieval.json
+
+Each scenario lists the SOP clauses and incident IDs it should surface.
+The knowledge base is rebuilt in a temp folder at every scale: the real files
+plus synthetic SOP/incident files that pad it to N x the current corpus. The
+whole run uses a deterministic hashing embedder, so it works offline and
+never calls Ollama. Reports recall@k, MRR and p50/p95/p99 latency for
+query_knowledge_base, query_knowledge_base_batch, retrieve_sop_guidelines,
+retrieve_past_events and retrieve_context in every retrieval mode.
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+from contextlib import contextmanager, redirect_stdout
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.rag as rag
+import src.incident_store as incident_store
+from src.tools import retrieve_sop_guidelines, retrieve_past_events, retrieve_context, _sop_query, _memory_query
+from src.lexical_index import tokenize
+from src.telemetry import percentile
+
+# --- CONFIGURATION ---
+STUB_EMBEDDING_DIMS = 256
+DEFAULT_SCALES = [1, 10, 100, 1000]
+DEFAULT_MODES = ["hybrid", "vector", "lexical"]
+DEFAULT_REPEATS = 5
+SOP_K = 4        # same k as src/tools.py
+MEMORY_K = 3
+
+# Labels: substrings that identify the expected chunk regardless of how the splitter cut the file.
+# event_details is what the classifier would extract (drives the incident store's structured filters).
+SCENARIOS = [
+    {
+        "name": "rooftop_rave",
+        "event_name": "Midnight Electronic Music Rave on the Library Rooftop with 500 people and fireworks",
+        "query_tags": ["noise ordinance", "fireworks pyrotechnics", "crowd control capacity", "rooftop"],
+        "event_details": {"type": "Social", "estimated_attendees": 500, "is_outdoors": True},
+        "expected_sops": ["3.1 Noise Ordinances", "1.3 Pyrotechnics", "1.1 Capacity Limits"],
+        "expected_memories": ["2021-ROOFTOP-JAZZ", "2023-SPRING-FLING"],
+    },
+    {
+        "name": "overnight_hackathon",
+        "event_name": "Annual Computer Science Hackathon with 300 students staying overnight in the Student Center, serving pizza and energy drinks",
+        "query_tags": ["hackathon wifi bandwidth", "overnight", "food safety", "indoor capacity"],
+        "event_details": {"type": "Academic", "estimated_attendees": 300, "is_outdoors": False},
+        "expected_sops": ["2.2 Food Safety"],
+        "expected_memories": ["2022-HACKATHON-FALL"],
+    },
+    {
+        "name": "spring_carnival",
+        "event_name": "Spring Carnival on the South Lawn with food trucks and a live band",
+        "query_tags": ["rain plan weather", "lawn protection generators", "food trucks", "outdoor amplified music"],
+        "event_details": {"type": "Social", "estimated_attendees": None, "is_outdoors": True},
+        "expected_sops": ["3.3 Weather Contingency", "3.2 Lawn Protection"],
+        "expected_memories": ["2023-CHARITY-GALA"],
+    },
+    {
+        "name": "chess_club",
+        "event_name": "Weekly Chess Club meeting in Room 304 with 15 members",
+        "query_tags": ["indoor room seating", "aisle width", "small group gathering"],
+        "event_details": {"type": "Social", "estimated_attendees": 15, "is_outdoors": False},
+        "expected_sops": ["1.2 Aisle Width"],
+        "expected_memories": [],  # low-risk: no precedent should be required
+    },
+]
+
+# --- STUB EMBEDDER ---
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embedder (feature hashing + L2 norm).
+    Lexically similar text lands close together, which is all a retrieval
+    benchmark needs to be meaningful offline.
+    """
+
+    def __init__(self, dims: int = STUB_EMBEDDING_DIMS):
+        self.dims = dims
+        self.model = f"hashing-{dims}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dims
+        for term in tokenize(text):
+            digest = int(hashlib.md5(term.encode()).hexdigest(), 16)
+            vector[digest % self.dims] += 1.0 if (digest >> 64) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+# --- SYNTHETIC CORPUS ---
+_TOPICS = ["Parking", "Signage", "Registration", "Accessibility", "Cleanup", "Ticketing", "Security", "Volunteers",
+           "Sponsorship", "Photography", "Merchandise", "Transport", "Decorations", "Seating", "Lighting", "Storage"]
+_ACTIONS = ["must be approved by", "requires a form signed by", "should be coordinated with", "is reviewed by", "needs notice to"]
+_OFFICES = ["Student Affairs", "Facilities", "Campus Police", "the Dean's Office", "Risk Management", "IT Services", "Housing"]
+# Shared domain words, so distractors compete with the real clauses
+_DOMAIN_WORDS = ["event", "attendees", "venue", "outdoor", "indoor", "students", "food", "safety", "music",
+                 "capacity", "weather", "equipment", "rules", "policy", "night", "campus", "lawn", "fire"]
+_OUTCOMES = ["Success", "Issue (Logistics)", "Failure (Budget)", "Issue (Communication)"]
+
+def _synthetic_sop(rng: random.Random, section: int) -> str:
+    lines = [f"SECTION {section}: {rng.choice(_TOPICS).upper()} PROCEDURES"]
+    for clause in range(1, 4):
+        words = " ".join(rng.sample(_DOMAIN_WORDS, 4))
+        lines.append(f"{section}.{clause} {rng.choice(_TOPICS)}: {rng.choice(_TOPICS)} for {words} {rng.choice(_ACTIONS)} {rng.choice(_OFFICES)} {rng.randint(2, 30)} days in advance.")
+    return "\n".join(lines)
+
+def _synthetic_incident(rng: random.Random, number: int) -> str:
+    words = " ".join(rng.sample(_DOMAIN_WORDS, 5))
+    return (f"EVENT ID: {rng.randint(2015, 2024)}-SYNTH-{number}\n"
+            f"Type: {rng.choice(['Social', 'Academic', 'Fundraiser', 'Performance', 'Workshop'])}\n"
+            f"Outcome: {rng.choice(_OUTCOMES)}\n"
+            f"Description: {rng.choice(_TOPICS)} problems with {words} delayed the start by {rng.randint(5, 90)} minutes.\n"
+            f"Lesson Learned: Confirm {rng.choice(_TOPICS).lower()} with {rng.choice(_OFFICES)} earlier.")
+
+def build_corpus(source_path: str, data_path: str, scale: int, seed: int = 7) -> int:
+    """
+    Copies the real knowledge base (`source_path`) into `data_path` and pads it with synthetic
+    SOP/incident files up to roughly `scale` x the real size (in characters).
+    Returns the number of characters written.
+    """
+    os.makedirs(data_path, exist_ok=True)
+    real_chars = {"rule": 0, "memory": 0}
+    for filename in os.listdir(source_path):
+        if not filename.endswith(".txt"): continue
+        shutil.copy(os.path.join(source_path, filename), os.path.join(data_path, filename))
+        real_chars[rag._file_category(filename)] += os.path.getsize(os.path.join(data_path, filename))
+
+    rng = random.Random(seed)
+    written = sum(real_chars.values())
+    for category, make, prefix in (("rule", _synthetic_sop, "synthetic_sops"), ("memory", _synthetic_incident, "synthetic_incident_log")):
+        target = real_chars[category] * (scale - 1)
+        blocks, size, file_no, n = [], 0, 0, 0
+        while size < target:
+            n += 1
+            block = make(rng, n + 3)
+            blocks.append(block)
+            size += len(block) + 2
+            # ~20 KB per file keeps ingestion batches realistic
+            if sum(len(b) for b in blocks) > 20000 or size >= target:
+                with open(os.path.join(data_path, f"{prefix}_{file_no:04d}.txt"), "w", encoding="utf-8") as f:
+                    f.write("\n\n".join(blocks))
+                file_no += 1
+                blocks = []
+        written += size
+    return written
+
+@contextmanager
+def isolated_knowledge_base(root: str, embedder: Embeddings):
+    """
+    Points src.rag at a scratch DB + data folder and the given embedder,
+    restoring the real configuration afterwards.
+    """
+    saved = {name: getattr(rag, name) for name in ("DB_PATH", "DATA_PATH", "RETRIEVAL_MODE", "get_embedding_function", "_vectorstore", "_lexical_index")}
+    saved_incident_store = incident_store._store
+    rag.DB_PATH = os.path.join(root, "chroma")
+    rag.DATA_PATH = os.path.join(root, "knowledge_base")
+    rag.get_embedding_function = lambda: embedder
+    rag._vectorstore = None
+    rag._lexical_index = None
+    incident_store._store = incident_store.IncidentStore(os.path.join(root, "incidents.db"), embedder)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(rag, name, value)
+        incident_store._store = saved_incident_store
+
+# --- SCORING ---
+
+def _rank_of(markers: List[str], results: List[str]) -> Dict[str, Optional[int]]:
+    """
+    1-based rank of the first result containing each marker (None = not retrieved).
+    """
+    return {marker: next((i + 1 for i, text in enumerate(results) if marker in text), None) for marker in markers}
+
+def _score(markers: List[str], results: List[str]) -> Optional[Dict[str, float]]:
+    if not markers:
+        return None
+    ranks = _rank_of(markers, results)
+    found = [r for r in ranks.values() if r is not None]
+    return {"recall": len(found) / len(markers), "rr": 1.0 / min(found) if found else 0.0}
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_lookups(repeats: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs every scenario through each retrieval entry point (single and batched).
+    Returns {entry_point: {"recall@k", "mrr", "p50_ms", "p95_ms", "p99_ms", "per_scenario"}}.
+    """
+    entry_points = {
+        "query_knowledge_base": lambda s: (
+            [r["content"] for r in rag.query_knowledge_base(_sop_query(s["query_tags"]), filters={"category": "rule"}, k=SOP_K)],
+            [r["content"] for r in rag.query_knowledge_base(_memory_query(s["query_tags"]), filters={"category": "memory"}, k=MEMORY_K)],
+        ),
+        "query_knowledge_base_batch": lambda s: tuple([r["content"] for r in results] for results in rag.query_knowledge_base_batch([
+            (_sop_query(s["query_tags"]), {"category": "rule"}, SOP_K),
+            (_memory_query(s["query_tags"]), {"category": "memory"}, MEMORY_K),
+        ])),
+        "retrieve_sop_guidelines": lambda s: (retrieve_sop_guidelines(s["query_tags"]), None),
+        "retrieve_past_events": lambda s: (None, retrieve_past_events(s["query_tags"], s["event_details"])),
+        "retrieve_context": lambda s: retrieve_context(s["query_tags"], s["event_details"]),
+    }
+
+    report = {}
+    for entry, lookup in entry_points.items():
+        latencies, scores, per_scenario = [], [], {}
+        for scenario in SCENARIOS:
+            for _ in range(repeats):
+                (sops, memories), seconds = _timed(lookup, scenario)
+                latencies.append(seconds)
+            scenario_scores = [sc for sc in (
+                _score(scenario["expected_sops"], sops) if sops is not None else None,
+                _score(scenario["expected_memories"], memories) if memories is not None else None,
+            ) if sc is not None]
+            scores.extend(scenario_scores)
+            per_scenario[scenario["name"]] = {
+                "recall": sum(sc["recall"] for sc in scenario_scores) / len(scenario_scores) if scenario_scores else None,
+                "rr": sum(sc["rr"] for sc in scenario_scores) / len(scenario_scores) if scenario_scores else None,
+            }
+        report[entry] = {
+            "recall@k": sum(sc["recall"] for sc in scores) / len(scores) if scores else None,
+            "mrr": sum(sc["rr"] for sc in scores) / len(scores) if scores else None,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "per_scenario": per_scenario,
+        }
+    return report
+
+def run_benchmark(scales: List[int] = DEFAULT_SCALES, modes: List[str] = DEFAULT_MODES, repeats: int = DEFAULT_REPEATS) -> Dict[str, Any]:
+    results = {"k": {"sops": SOP_K, "memories": MEMORY_K}, "repeats": repeats, "scales": {}}
+    embedder = HashingEmbeddings()
+    source_path = rag.DATA_PATH
+    for scale in scales:
+        root = tempfile.mkdtemp(prefix=f"bench_retrieval_{scale}x_")
+        try:
+            with isolated_knowledge_base(root, embedder):
+                chars = build_corpus(source_path, rag.DATA_PATH, scale)
+                _, ingest_seconds = _timed(rag.ingest_knowledge_base)   # also fills the incident store
+                chunks = rag.get_vectorstore()._collection.count()
+                print(f"📚 {scale}x corpus: {chunks} chunks ({chars / 1000:.0f} KB), ingested in {ingest_seconds:.1f}s")
+                by_mode = {}
+                for mode in modes:
+                    rag.RETRIEVAL_MODE = mode
+                    by_mode[mode] = run_lookups(repeats)
+                results["scales"][str(scale)] = {"chunks": chunks, "ingest_seconds": ingest_seconds, "modes": by_mode}
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+def print_report(results: Dict[str, Any]):
+    def fmt(value):
+        return "  n/a" if value is None else f"{value:5.2f}"
+    print(f"\n📊 RETRIEVAL BENCHMARK (k={results['k']['sops']} SOPs / {results['k']['memories']} memories, {results['repeats']} repeats)")
+    print(f"   {'scale':>6} {'chunks':>7} {'mode':<8} {'entry point':<26} {'recall':>6} {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for scale, data in results["scales"].items():
+        for mode, entries in data["modes"].items():
+            for entry, stats in entries.items():
+                print(f"   {scale + 'x':>6} {data['chunks']:>7} {mode:<8} {entry:<26} {fmt(stats['recall@k']):>6} {fmt(stats['mrr']):>6} "
+                      f"{stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark for knowledge base retrieval (offline, stub embedder)")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Corpus sizes as multiples of the real knowledge base")
+    parser.add_argument("--modes", nargs="+", default=DEFAULT_MODES, choices=["hybrid", "vector", "lexical"])
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Timed lookups per scenario")
+    parser.add_argument("-o", "--output", help="Write the full results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.scales, args.modes, args.repeats)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
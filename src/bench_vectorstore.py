@@ -0,0 +1,212 @@
+"""
+Vector backend benchmark: Chroma PersistentClient vs the mmap index.
+
+    python -m src.bench_vectorstore --sizes 2000 20000 --dim 1024
+
+Builds each backend from the same synthetic clustered embeddings (1024 dims
+like mxbai-embed-large), then measures every backend in a FRESH Python process,
+because that is what each extra Streamlit worker pays:
+  - cold start: imports, then opening the store and answering the first query
+  - RAM: resident set after the queries, split into private (anon) memory and
+    file-backed pages (shared with every other process through the page cache)
+  - query latency p50/p95, with and without a metadata filter
+  - recall@k against exact float32 search (Chroma's HNSW and quantization both lose a little)
+  - size on disk
+The files were just written, so the page cache is warm: the cold start is a
+new worker joining, not the first boot after a reboot.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- CONFIGURATION ---
+DEFAULT_SIZES = [2000, 20000]
+DEFAULT_DIM = 1024
+DEFAULT_QUERIES = 200
+DEFAULT_K = 4
+BACKENDS = ["chroma", "mmap-int8", "mmap-float16"]
+BUILD_BATCH = 5000   # rows per upsert for every backend (ingestion also writes in batches)
+COLLECTION_NAME = "campus_event_memory"
+SOURCE_FILES = [f"policy_{i}.txt" for i in range(6)] + ["incident_memory_log.txt", "user_feedback_log.txt"]
+MEMORY_FILTER = {"category": "memory"}
+
+def _rss_mb() -> Dict[str, float]:
+    """
+    Resident memory of this process in MB (Linux /proc; peak RSS elsewhere).
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        kb = lambda name: float(fields.get(name, "0 kB").split()[0])
+        return {"rss": kb("VmRSS") / 1024, "private": kb("RssAnon") / 1024, "file_backed": kb("RssFile") / 1024}
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        return {"rss": peak, "private": peak, "file_backed": 0.0}
+
+def _dir_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / (1024 * 1024)
+
+# --- SYNTHETIC DATA ---
+
+def make_corpus(n: int, dim: int, seed: int = 7):
+    """
+    Clustered unit vectors (topics) with short chunk-sized documents and rag-style metadata.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(8, n // 50), dim)).astype(np.float32)
+    assignment = rng.integers(0, len(centers), size=n)
+    vectors = centers[assignment] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{i:07d}" for i in range(n)]
+    metadatas = []
+    for i in range(n):
+        source = SOURCE_FILES[i % len(SOURCE_FILES)]
+        metadatas.append({"source_file": source, "category": "memory" if "log" in source else "rule"})
+    documents = [f"Chunk {i} about topic {assignment[i]}. " + "Campus event policy text. " * 24 for i in range(n)]
+    queries = centers[rng.integers(0, len(centers), size=DEFAULT_QUERIES)] + 0.6 * rng.normal(size=(DEFAULT_QUERIES, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return ids, vectors, documents, metadatas, queries
+
+def exact_top_k(vectors: np.ndarray, metadatas: List[Dict[str, Any]], queries: np.ndarray, k: int, filters=None) -> List[List[int]]:
+    rows = np.arange(len(vectors))
+    if filters:
+        rows = np.array([i for i, m in enumerate(metadatas) if all(m.get(f) == v for f, v in filters.items())])
+    scores = queries @ vectors[rows].T
+    return [rows[np.argsort(-row)[:k]].tolist() for row in scores]
+
+def build_backend(backend: str, path: str, ids, vectors, documents, metadatas) -> float:
+    start = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+        collection = chromadb.PersistentClient(path=path).get_or_create_collection(COLLECTION_NAME)
+        for i in range(0, len(ids), BUILD_BATCH):
+            collection.upsert(ids=ids[i:i + BUILD_BATCH], embeddings=vectors[i:i + BUILD_BATCH].tolist(),
+                              documents=documents[i:i + BUILD_BATCH], metadatas=metadatas[i:i + BUILD_BATCH])
+    else:
+        from src.mmap_store import MmapVectorStore
+        store = MmapVectorStore(path, dtype=backend.split("-", 1)[1])
+        for i in range(0, len(ids), BUILD_BATCH):
+            store.upsert(ids[i:i + BUILD_BATCH], vectors[i:i + BUILD_BATCH], documents[i:i + BUILD_BATCH], metadatas[i:i + BUILD_BATCH])
+    return time.perf_counter() - start
+
+# --- CHILD PROCESS (one backend, fresh interpreter) ---
+
+def measure_in_child(backend: str, path: str, queries_path: str, k: int) -> Dict[str, Any]:
+    process_start = time.perf_counter()
+    baseline = _rss_mb()
+    queries = np.load(queries_path)
+    if backend == "chroma":
+        import chromadb
+        imported = time.perf_counter()
+        collection = chromadb.PersistentClient(path=path).get_collection(COLLECTION_NAME)
+        def search(vector, filters):
+            return collection.query(query_embeddings=[vector.tolist()], n_results=k, where=filters, include=["documents", "metadatas"])["ids"][0]
+    else:
+        from src.mmap_store import MmapVectorStore
+        imported = time.perf_counter()
+        store = MmapVectorStore(path, dtype=backend.split("-", 1)[1])
+        def search(vector, filters):
+            return [doc.id for doc in store.similarity_search_by_vector(vector, k=k, filter=filters)]
+
+    first_ids = search(queries[0], None)
+    first_query = time.perf_counter()
+    results = {"all": [first_ids], "filtered": []}
+    latencies = {"all": [], "filtered": []}
+    for label, filters in (("all", None), ("filtered", MEMORY_FILTER)):
+        for i, vector in enumerate(queries):
+            if label == "all" and i == 0: continue
+            start = time.perf_counter()
+            ids = search(vector, filters)
+            latencies[label].append(time.perf_counter() - start)
+            results[label].append(ids)
+    after = _rss_mb()
+    return {
+        "import_seconds": imported - process_start,
+        "open_and_first_query_seconds": first_query - imported,
+        "rss_mb": after["rss"],
+        "private_mb": after["private"] - baseline["private"],
+        "file_backed_mb": after["file_backed"] - baseline["file_backed"],
+        "latency_ms": {label: {"p50": float(np.percentile(v, 50)) * 1000, "p95": float(np.percentile(v, 95)) * 1000}
+                       for label, v in latencies.items()},
+        "ids": results,
+    }
+
+# --- DRIVER ---
+
+def run_benchmark(sizes: List[int] = DEFAULT_SIZES, dim: int = DEFAULT_DIM, k: int = DEFAULT_K, backends: List[str] = BACKENDS) -> Dict[str, Any]:
+    report = {"dim": dim, "k": k, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "sizes": []}
+    for n in sizes:
+        root = tempfile.mkdtemp(prefix="bench_vectorstore_")
+        try:
+            ids, vectors, documents, metadatas, queries = make_corpus(n, dim)
+            queries_path = os.path.join(root, "queries.npy")
+            np.save(queries_path, queries)
+            truth = {"all": exact_top_k(vectors, metadatas, queries, k),
+                     "filtered": exact_top_k(vectors, metadatas, queries, k, MEMORY_FILTER)}
+            position = {doc_id: i for i, doc_id in enumerate(ids)}
+            entry = {"n": n, "backends": {}}
+            for backend in backends:
+                path = os.path.join(root, backend)
+                build_seconds = build_backend(backend, path, ids, vectors, documents, metadatas)
+                child = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", backend, path, queries_path, "-k", str(k)],
+                                       capture_output=True, text=True, check=True)
+                stats = json.loads(child.stdout.strip().splitlines()[-1])
+                found = stats.pop("ids")
+                stats["recall_at_k"] = {
+                    label: float(np.mean([len({position[i] for i in got} & set(want)) / len(want) for got, want in zip(found[label], truth[label])]))
+                    for label in truth
+                }
+                stats["build_seconds"] = build_seconds
+                stats["disk_mb"] = _dir_size_mb(path)
+                entry["backends"][backend] = stats
+                print(f"   ✅ {backend} @ {n} chunks measured")
+            report["sizes"].append(entry)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return report
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n📊 VECTOR BACKENDS (dim {report['dim']}, k={report['k']}; fresh process per backend)")
+    print(f"   {'chunks':>7} {'backend':<13} {'disk MB':>8} {'import s':>9} {'open+1st s':>10} {'private MB':>10} {'shared MB':>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'filt p50':>8} {'recall':>6}")
+    for entry in report["sizes"]:
+        for backend, s in entry["backends"].items():
+            print(f"   {entry['n']:>7} {backend:<13} {s['disk_mb']:8.1f} {s['import_seconds']:9.2f} {s['open_and_first_query_seconds']:10.3f} "
+                  f"{s['private_mb']:10.1f} {s['file_backed_mb']:9.1f} {s['latency_ms']['all']['p50']:7.2f} {s['latency_ms']['all']['p95']:7.2f} "
+                  f"{s['latency_ms']['filtered']['p50']:8.2f} {s['recall_at_k']['all']:6.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare RAM, cold start and latency of the Chroma and mmap vector backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Corpus sizes (chunks)")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="Embedding dimensions")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="Results per query")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("-o", "--output", help="Write the full report as JSON")
+    parser.add_argument("--child", nargs=3, metavar=("BACKEND", "PATH", "QUERIES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_in_child(*args.child, k=args.k)))
+        sys.exit(0)
+
+    report = run_benchmark(args.sizes, args.dim, args.k, args.backends)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.output}")
@@ -0,0 +1,157 @@
+"""
+Token-budgeted context assembly for the Risk Agent.
+Instead of json.dumps-ing every retrieved chunk (escaped newlines, repeated
+splitter overlap, one header per chunk), we drop duplicate chunks and overlap,
+group by source and trim to a budget, keeping the most relevant chunks first.
+
+    python -m src.context     # self-check
+"""
+import re
+import json
+import math
+from typing import Dict, List, Tuple
+
+# --- CONFIGURATION ---
+RISK_CONTEXT_TOKEN_BUDGET = 1200
+SOP_BUDGET_SHARE = 0.6          # the rest goes to memories (unused budget flows over)
+MIN_OVERLAP_CHARS = 20          # shortest suffix/prefix match treated as splitter overlap
+MAX_OVERLAP_CHARS = 200         # the splitter uses 100; leave headroom for whitespace
+
+_HEADER_RE = re.compile(r"^\[(RULE SOURCE|HISTORY LOG): (.*?)\]\n", re.S)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for Llama-style tokenizers).
+    """
+    return math.ceil(len(text) / 4)
+
+def _parse_block(block: str) -> Tuple[str, str]:
+    """
+    Splits "[RULE SOURCE: file]\\ncontent" into (file, content).
+    """
+    match = _HEADER_RE.match(block)
+    if not match:
+        return "unknown", block
+    return match.group(2), block[match.end():]
+
+def _normalize(content: str) -> str:
+    # Drop indentation and blank lines (feedback memories are indented f-strings)
+    lines = [re.sub(r"\s+", " ", line).strip() for line in content.splitlines()]
+    return "\n".join(line for line in lines if line)
+
+def _strip_overlap(previous: str, current: str) -> str:
+    """
+    Removes the start of `current` that repeats the end of `previous`
+    (the 100-char overlap added by RecursiveCharacterTextSplitter).
+    """
+    limit = min(len(previous), len(current), MAX_OVERLAP_CHARS)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:].lstrip()
+    return current
+
+def _dedupe(blocks: List[str], seen_chunks: set) -> List[Tuple[str, str]]:
+    """
+    Returns (source, content) pairs in rank order with splitter overlap between
+    chunks of the same source and exact duplicate chunks removed.
+    Individual lines are never dropped: field lines like "Outcome: Success"
+    repeat across incidents and each incident needs its own.
+    """
+    last_by_source: Dict[str, str] = {}
+    cleaned = []
+    for block in blocks:
+        source, content = _parse_block(block)
+        content = _normalize(content)
+        if not content or content in seen_chunks:
+            continue
+        seen_chunks.add(content)
+        previous = last_by_source.get(source)
+        last_by_source[source] = content
+        if previous is not None:
+            content = _strip_overlap(previous, content)
+        if content:
+            cleaned.append((source, content))
+    return cleaned
+
+def _fit(items: List[Tuple[str, str]], budget: int) -> Tuple[List[Tuple[str, str]], int]:
+    """
+    Keeps the highest-ranked items that fit the budget; the first item that
+    doesn't fit is cut at a line boundary. Returns (kept, tokens_used).
+    """
+    kept, used = [], 0
+    for source, content in items:
+        cost = estimate_tokens(content)
+        if used + cost <= budget:
+            kept.append((source, content))
+            used += cost
+            continue
+        partial = []
+        for line in content.splitlines():
+            if used + estimate_tokens("\n".join(partial + [line])) > budget:
+                break
+            partial.append(line)
+        if partial:
+            kept.append((source, "\n".join(partial)))
+            used += estimate_tokens("\n".join(partial))
+        break
+    return kept, used
+
+def _render(label: str, items: List[Tuple[str, str]]) -> str:
+    # One header per source instead of one per chunk
+    grouped: Dict[str, List[str]] = {}
+    for source, content in items:
+        grouped.setdefault(source, []).append(content)
+    if not grouped:
+        return "None found."
+    return "\n".join(f"[{label}: {source}]\n" + "\n".join(chunks) for source, chunks in grouped.items())
+
+def build_risk_context(sops: List[str], memories: List[str], token_budget: int = RISK_CONTEXT_TOKEN_BUDGET) -> Tuple[str, str, Dict[str, int]]:
+    """
+    Returns (sops_context, memories_context, stats) for RISK_ANALYSIS_PROMPT.
+    Inputs are the formatted blocks from retrieve_context, already ordered by
+    relevance (best first), so rank order decides what survives trimming.
+    """
+    seen_chunks: set = set()
+    sop_items = _dedupe(sops, seen_chunks)
+    memory_items = _dedupe(memories, seen_chunks)
+
+    sop_budget = int(token_budget * SOP_BUDGET_SHARE)
+    kept_sops, sop_used = _fit(sop_items, sop_budget)
+    kept_memories, memory_used = _fit(memory_items, token_budget - sop_used)
+    # Give whatever the memories didn't need back to the SOPs
+    kept_sops, sop_used = _fit(sop_items, token_budget - memory_used)
+
+    sops_context = _render("RULE SOURCE", kept_sops)
+    memories_context = _render("HISTORY LOG", kept_memories)
+
+    before = estimate_tokens(json.dumps(sops)) + estimate_tokens(json.dumps(memories))
+    after = estimate_tokens(sops_context) + estimate_tokens(memories_context)
+    stats = {
+        "tokens_before": before,
+        "tokens_after": after,
+        "tokens_saved": before - after,
+        "chunks_in": len(sops) + len(memories),
+        "chunks_kept": len(kept_sops) + len(kept_memories),
+    }
+    return sops_context, memories_context, stats
+
+def _self_check():
+    """
+    Two feedback incidents with the same type and outcome must both keep every field.
+    """
+    def memory(name: str, description: str) -> str:
+        return (f"[HISTORY LOG: user_feedback_log.txt]\n    EVENT ID: {name}\n    Type: User Feedback\n"
+                f"    Outcome: Success\n    Description: {description}\n    Lesson Learned: Keep doing it.\n")
+
+    memories = [memory("ROOFTOP PARTY", "Went well."), memory("CHESS NIGHT", "Quiet and fine."),
+                memory("ROOFTOP PARTY", "Went well.")]
+    _, memories_context, stats = build_risk_context([], memories)
+    incidents = memories_context.split("EVENT ID: ")[1:]
+    assert len(incidents) == 2, f"expected the duplicate chunk to be dropped, got {len(incidents)} incidents"
+    for incident in incidents:
+        for field in ("Type: User Feedback", "Outcome: Success", "Lesson Learned: Keep doing it."):
+            assert field in incident, f"'{field}' missing from: {incident!r}"
+    print(f"✅ Context self-check passed ({stats['chunks_in']} chunks in, {stats['chunks_kept']} kept)")
+
+if __name__ == "__main__":
+    _self_check()
@@ -0,0 +1,145 @@
+"""
+On-disk cache for query embeddings.
+Routine events re-embed the exact same query strings over and over, so we
+keep the vectors in a small SQLite file and only call Ollama on a miss.
+"""
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import List, Dict, Any
+
+from langchain_core.embeddings import Embeddings
+
+def normalize_text(text: str) -> str:
+    """
+    Collapses whitespace and case so trivially different strings share a key.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+class EmbeddingCache:
+    """
+    SQLite-backed LRU store of vectors keyed by (model, normalized text).
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                vector BLOB,
+                last_used REAL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\n{normalize_text(text)}".encode()).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        """
+        Returns {key: vector} for every text already cached, and bumps their LRU stamp.
+        """
+        keys = [self.make_key(model, t) for t in texts]
+        found = {}
+        with self._lock:
+            for key in set(keys):
+                row = self._conn.execute('SELECT vector FROM embeddings WHERE key = ?', (key,)).fetchone()
+                if row:
+                    found[key] = array("f", row[0]).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?', [(now, k) for k in found])
+                self._conn.commit()
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [(self.make_key(model, t), model, array("f", v).tobytes(), now) for t, v in zip(texts, vectors)]
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)', rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # LRU: drop the least recently used rows once we go over the cap
+        count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute('''
+                DELETE FROM embeddings WHERE key IN (
+                    SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?
+                )
+            ''', (overflow,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": size,
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM embeddings')
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+class CachedEmbeddings(Embeddings):
+    """
+    Drop-in Embeddings wrapper: serves cached vectors and only sends misses
+    to the underlying model (in one batched call).
+    """
+
+    def __init__(self, embedder: Embeddings, cache: EmbeddingCache, model: str):
+        self.embedder = embedder
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        found = self.cache.get_many(self.model, texts)
+        keys = [EmbeddingCache.make_key(self.model, t) for t in texts]
+
+        # Embed each missing key once, even if it appears several times
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embedder.embed_documents(list(missing.values()))
+            self.cache.put_many(self.model, list(missing.values()), vectors)
+            found.update(zip(missing.keys(), vectors))
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def uncached(embeddings: Embeddings) -> Embeddings:
+    """
+    The model behind a CachedEmbeddings (or the embedder itself).
+    Stored documents are embedded once at ingestion; caching their vectors
+    would only evict the query vectors the cache exists for.
+    """
+    return embeddings.embedder if isinstance(embeddings, CachedEmbeddings) else embeddings
@@ -0,0 +1,120 @@
+"""
+Deterministic fast path for routine events.
+Inputs like "Weekly Chess Club meeting in Room 304 with 15 members" don't
+need two LLM round-trips to work out that they are a small indoor social.
+Plain keyword parsing fills event_details + search_queries when it is
+confident; anything ambiguous or risky still goes to the LLM agents.
+"""
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# --- CONFIGURATION ---
+FAST_PATH_ENABLED = True
+FAST_PATH_MAX_ATTENDEES = 100   # bigger events always get the full LLM analysis
+
+# Anything that hints at real risk is never fast-pathed
+RISK_KEYWORDS = [
+    "alcohol", "beer", "wine", "bar", "party", "rave", "concert", "festival", "fireworks",
+    "pyro", "bonfire", "fire", "candle", "generator", "overnight", "midnight", "late night",
+    "rooftop", "food truck", "bbq", "grill", "dj", "amplified", "carnival", "protest",
+]
+
+TYPE_KEYWORDS = {
+    "Academic": ["lecture", "seminar", "study", "talk", "colloquium", "review session", "office hours", "reading group", "journal club"],
+    "Workshop": ["workshop", "training", "bootcamp", "tutorial", "clinic"],
+    "Fundraiser": ["fundraiser", "charity", "bake sale", "donation"],
+    "Performance": ["recital", "performance", "open mic", "screening", "play"],
+    "Social": ["club", "meeting", "meetup", "social", "mixer", "game night", "board game", "chess", "book club", "coffee"],
+}
+
+INDOOR_KEYWORDS = ["room", "hall", "auditorium", "library", "classroom", "lab", "lounge", "center", "centre", "ballroom", "office", "studio", "building"]
+OUTDOOR_KEYWORDS = ["lawn", "quad", "field", "park", "outdoor", "outside", "courtyard", "garden", "stadium", "beach", "plaza"]
+
+_ATTENDEES_RE = re.compile(r"(\d[\d,]*)\s*(?:\+\s*)?(?:people|persons|attendees|members|students|guests|participants|players)", re.I)
+_HOURS_RE = re.compile(r"(\d+)\s*(?:-\s*)?(?:hours?|hrs?|h)\b", re.I)
+_VENUE_RE = re.compile(r"\b(?:in|at)\s+(?:the\s+)?([Rr]oom\s+\w+|[A-Z][\w']*(?:\s+[A-Z0-9][\w']*)*)")
+
+# Fraction of requests served without the LLM agents
+_stats = {"requests": 0, "fast": 0}
+_stats_lock = threading.Lock()
+
+def _has_keyword(text: str, keywords: List[str]) -> Optional[str]:
+    for keyword in keywords:
+        if re.search(r"\b%s\b" % re.escape(keyword), text):
+            return keyword
+    return None
+
+def parse_facts(event_name: str) -> Dict[str, Any]:
+    """
+    The hard facts stated in the description: attendee count (None if not
+    given) and setting (is_outdoors None when neither or both are mentioned).
+    """
+    text = event_name.lower()
+    attendees_match = _ATTENDEES_RE.search(event_name)
+    indoor = _has_keyword(text, INDOOR_KEYWORDS)
+    outdoor = _has_keyword(text, OUTDOOR_KEYWORDS)
+    return {
+        "attendees": int(attendees_match.group(1).replace(",", "")) if attendees_match else None,
+        "is_outdoors": None if bool(indoor) == bool(outdoor) else bool(outdoor),
+    }
+
+def fast_classify(event_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns {"event_details": ..., "search_queries": ...} for routine low-risk
+    events, or None when the LLM agents should decide.
+    """
+    text = event_name.lower()
+    if _has_keyword(text, RISK_KEYWORDS):
+        return None
+
+    facts = parse_facts(event_name)
+    attendees, outdoor = facts["attendees"], facts["is_outdoors"]
+    if attendees is None or attendees > FAST_PATH_MAX_ATTENDEES:
+        return None
+
+    event_type = next((t for t, words in TYPE_KEYWORDS.items() if _has_keyword(text, words)), None)
+    # Need a clear type and an unambiguous setting to be confident
+    if event_type is None or outdoor is None:
+        return None
+
+    hours_match = _HOURS_RE.search(event_name)
+    venue_match = _VENUE_RE.search(event_name)
+
+    requirements = {
+        "Academic": ["projector", "tables"],
+        "Workshop": ["projector", "tables"],
+        "Fundraiser": ["tables"],
+        "Performance": ["stage"],
+        "Social": ["tables"],
+    }[event_type]
+    vibes = {"Academic": "professional", "Workshop": "professional"}.get(event_type, "casual")
+
+    details = {
+        "type": event_type,
+        "estimated_attendees": attendees,
+        "is_outdoors": bool(outdoor),
+        "duration_hours": int(hours_match.group(1)) if hours_match else 2,
+        "vibes": vibes,
+        "venue_requirements": requirements,
+    }
+    if venue_match:
+        details["venue"] = venue_match.group(1).strip()
+
+    queries = [f"{event_type.lower()} event", "outdoor weather" if outdoor else "indoor room capacity", "small group gathering"]
+    if attendees > 50:
+        queries.append("fire exits")
+    if _has_keyword(text, ["food", "pizza", "snacks", "lunch", "dinner", "breakfast"]):
+        queries.append("food safety")
+
+    return {"event_details": details, "search_queries": queries}
+
+def record_fast_path(hit: bool):
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["fast"] += int(hit)
+
+def get_fast_path_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        requests, fast = _stats["requests"], _stats["fast"]
+    return {"requests": requests, "fast": fast, "fast_fraction": fast / requests if requests else 0.0}
@@ -4,6 +4,9 @@ import os
 # Ensure the parent directory is in the path so we can run this file directly
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import asyncio
+from typing import List, Dict, Any, Tuple, Optional, Iterable, AsyncIterator
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from src.state import AgentState
 from src.agents import (
@@ -11,48 +14,270 @@ from src.agents import (
     classification_agent,
     memory_retrieval_node,
     risk_analysis_agent,
-    marketing_agent
+    marketing_agent,
+    ainference_agent,
+    aclassification_agent,
+    amemory_retrieval_node,
+    arisk_analysis_agent,
+    amarketing_agent,
+    fast_path_agent,
+    profile_agent,
+    aprofile_agent,
+    PROFILE_MODE
 )
+from src.fast_path import FAST_PATH_ENABLED
+from src.llm_scheduler import request_scope
 
-def build_graph():
+# --- NODE REGISTRY ---
+# Each node declares its sync/async functions and which state fields it reads and writes.
+# The graph layout is derived from these, so two nodes that don't depend on
+# each other's output run side by side instead of queueing.
+NODE_SPECS: List[Dict[str, Any]] = [
+    {"name": "inference", "fn": inference_agent, "afn": ainference_agent, "reads": {"event_name"}, "writes": {"event_details"}},
+    {"name": "classify", "fn": classification_agent, "afn": aclassification_agent, "reads": {"event_details"}, "writes": {"search_queries"}},
+    {"name": "memory", "fn": memory_retrieval_node, "afn": amemory_retrieval_node, "reads": {"search_queries", "event_details"}, "writes": {"knowledge_docs", "past_memories"}},
+    {"name": "risk", "fn": risk_analysis_agent, "afn": arisk_analysis_agent, "reads": {"event_details", "knowledge_docs", "past_memories"}, "writes": {"risk_assessment"}},
+    {"name": "marketing", "fn": marketing_agent, "afn": amarketing_agent, "reads": {"event_name", "event_details"}, "writes": {"marketing_code"}},
+]
+
+# Combined mode: one Profile node replaces Inference + Classification
+COMBINED_PROFILE_SPEC: Dict[str, Any] = {
+    "name": "profile", "fn": profile_agent, "afn": aprofile_agent,
+    "reads": {"event_name"}, "writes": {"event_details", "search_queries"},
+}
+
+# Fields the rule-based fast path fills on its own
+FAST_PATH_WRITES = {"event_details", "search_queries"}
+
+def node_specs(profile_mode: str = PROFILE_MODE) -> List[Dict[str, Any]]:
     """
-    Constructs the Event Intelligence Agent Graph.
-    Flow: Inference -> Classify -> Memory -> Risk -> Marketing -> END
+    Node registry for the chosen profile mode ("split" or "combined").
     """
-    # 1. Initialize the Graph with our typed State
-    workflow = StateGraph(AgentState)
+    if profile_mode == "split":
+        return NODE_SPECS
+    if profile_mode == "combined":
+        return [COMBINED_PROFILE_SPEC] + [spec for spec in NODE_SPECS if spec["name"] not in ("inference", "classify")]
+    raise ValueError(f"Unknown profile_mode '{profile_mode}' (expected 'split' or 'combined')")
 
-    # 2. Add Nodes (Register the agent functions)
-    workflow.add_node("inference", inference_agent)
-    workflow.add_node("classify", classification_agent)
-    workflow.add_node("memory", memory_retrieval_node)
-    workflow.add_node("risk", risk_analysis_agent)
-    workflow.add_node("marketing", marketing_agent)
+def node_dependencies(specs: List[Dict[str, Any]]) -> Dict[str, set]:
+    """
+    Maps each node to the nodes that produce a field it reads.
+    """
+    producers = {}
+    for spec in specs:
+        for field in spec["writes"]:
+            producers[field] = spec["name"]
+    return {
+        spec["name"]: {producers[f] for f in spec["reads"] if f in producers and producers[f] != spec["name"]}
+        for spec in specs
+    }
 
-    # 3. Define the Edges (The Logic Flow)
+def plan_parallel_lanes(specs: List[Dict[str, Any]]) -> Tuple[List[str], List[List[str]]]:
+    """
+    Splits the nodes into a sequential head (nodes every other node waits on)
+    and independent lanes that can run concurrently after it.
+    A lane is a connected group of dependent nodes, kept in declaration order.
+    """
+    deps = node_dependencies(specs)
+    order = [spec["name"] for spec in specs]
     
-    # Start at Inference (Input: Event Name -> Output: Event Details)
-    workflow.set_entry_point("inference")
+    # Transitive dependencies of each node
+    ancestors = {}
+    for name in order:
+        ancestors[name] = set(deps[name])
+        for dep in deps[name]:
+            ancestors[name] |= ancestors.get(dep, set())
     
-    # Inference -> Classification (Output: Search Queries)
-    workflow.add_edge("inference", "classify")
+    head = []
+    for name in order:
+        others = [n for n in order if n != name and n not in head]
+        if deps[name] <= set(head) and others and all(name in ancestors[n] for n in others):
+            head.append(name)
+        else:
+            break
+    rest = [name for name in order if name not in head]
     
-    # Classification -> Memory Retrieval (Output: SOPs & Past Events)
-    workflow.add_edge("classify", "memory")
+    # Union nodes that depend on each other (ignoring the shared head)
+    lane_of = {name: name for name in rest}
+    def find(name):
+        while lane_of[name] != name:
+            name = lane_of[name]
+        return name
+    for name in rest:
+        for dep in deps[name]:
+            if dep in lane_of:
+                lane_of[find(name)] = find(dep)
     
-    # Memory -> Risk Analysis (Output: Risk Score & Mitigation)
-    workflow.add_edge("memory", "risk")
+    lanes: Dict[str, List[str]] = {}
+    for name in rest:
+        lanes.setdefault(find(name), []).append(name)
+    return head, list(lanes.values())
+
+def _node_runnable(spec: Dict[str, Any]) -> RunnableLambda:
+    """
+    One node, two entry points: app.invoke runs `fn`, app.ainvoke awaits `afn`.
+    Model calls inside the node are tagged with the event for the LLM scheduler's fairness.
+    """
+    fn, afn = spec["fn"], spec.get("afn")
+
+    def run(state):
+        with request_scope(state.get("event_name")):
+            return fn(state)
+
+    async def arun(state):
+        with request_scope(state.get("event_name")):
+            return await afn(state)
+
+    return RunnableLambda(run, afunc=arun if afn else None, name=spec["name"])
+
+def _chain(workflow: StateGraph, names: List[str], specs_by_name: Dict[str, Dict[str, Any]]):
+    for name in names:
+        workflow.add_node(name, _node_runnable(specs_by_name[name]))
+    for prev, nxt in zip(names, names[1:]):
+        workflow.add_edge(prev, nxt)
+
+def _lane_node(names: List[str], specs_by_name: Dict[str, Dict[str, Any]]):
+    """
+    Wraps a multi-node lane in its own compiled sub-graph.
+    LangGraph waits for every node in a step before starting the next one,
+    so a lane has to be ONE node to truly overlap with its siblings.
+    """
+    lane = StateGraph(AgentState)
+    _chain(lane, names, specs_by_name)
+    lane.set_entry_point(names[0])
+    lane.add_edge(names[-1], END)
+    lane_app = lane.compile()
+    writes = set().union(*(specs_by_name[n]["writes"] for n in names))
+    
+    def run_lane(state: AgentState) -> AgentState:
+        result = lane_app.invoke(state)
+        # Only hand back what this lane produced, so parallel lanes never collide
+        return {k: v for k, v in result.items() if k in writes}
     
-    # Risk -> Marketing (Output: HTML Landing Page)
-    workflow.add_edge("risk", "marketing")
+    async def arun_lane(state: AgentState) -> AgentState:
+        result = await lane_app.ainvoke(state)
+        return {k: v for k, v in result.items() if k in writes}
     
-    # Marketing -> End
-    workflow.add_edge("marketing", END)
+    return RunnableLambda(run_lane, afunc=arun_lane, name="+".join(names))
+
+def _add_layout(workflow: StateGraph, specs: List[Dict[str, Any]], added: set) -> List[str]:
+    """
+    Adds the head chain and parallel lanes for `specs` to the workflow.
+    Nodes already present (shared between routes) are reused.
+    Returns the node(s) this layout starts from.
+    """
+    specs_by_name = {spec["name"]: spec for spec in specs}
+    head, lanes = plan_parallel_lanes(specs)
+    
+    def add(name, runnable):
+        if name not in added:
+            workflow.add_node(name, runnable)
+            added.add(name)
+    
+    # Sequential head (e.g. Input: Event Name -> Output: Event Details)
+    for name in head:
+        add(name, _node_runnable(specs_by_name[name]))
+    for prev, nxt in zip(head, head[1:]):
+        workflow.add_edge(prev, nxt)
+    
+    # Fan out: every independent lane starts as soon as the head is done
+    # and all of them join at END.
+    lane_names = []
+    for lane in lanes:
+        if len(lane) == 1:
+            name = lane[0]
+            add(name, _node_runnable(specs_by_name[name]))
+        else:
+            name = "+".join(lane)
+            add(name, _lane_node(lane, specs_by_name))
+        lane_names.append(name)
+        if head:
+            workflow.add_edge(head[-1], name)
+        workflow.add_edge(name, END)
+    
+    return [head[0]] if head else lane_names
+
+def build_graph(fast_path: bool = FAST_PATH_ENABLED, profile_mode: str = PROFILE_MODE):
+    """
+    Constructs the Event Intelligence Agent Graph.
+    Flow: [Fast Path] -> Inference -> (Classify -> Memory -> Risk) || Marketing -> END
+    With profile_mode="combined", Inference + Classify become one Profile call:
+          [Fast Path] -> Profile -> (Memory -> Risk) || Marketing -> END
+    When the rule-based fast path is confident it has already filled
+    event_details + search_queries, so those LLM nodes are skipped:
+          Fast Path -> (Memory -> Risk) || Marketing -> END
+    """
+    specs = node_specs(profile_mode)
+
+    # 1. Initialize the Graph with our typed State
+    workflow = StateGraph(AgentState)
+    added = set()
+
+    # 2. Full LLM route
+    llm_entry = _add_layout(workflow, specs, added)
+
+    if not fast_path:
+        workflow.set_entry_point(llm_entry[0])
+        return workflow.compile()
+
+    # 3. Fast route: same layout, minus the nodes whose output the rules provide
+    fast_entry = _add_layout(workflow, [spec for spec in specs if not spec["writes"] <= FAST_PATH_WRITES], added)
+
+    workflow.add_node("fast_path", RunnableLambda(fast_path_agent, name="fast_path"))
+    workflow.set_entry_point("fast_path")
+    
+    def route_after_fast_path(state: AgentState) -> List[str]:
+        return fast_entry if state.get("search_queries") else llm_entry
+    
+    workflow.add_conditional_edges("fast_path", route_after_fast_path, llm_entry + fast_entry)
 
     # 4. Compile the Graph
     app = workflow.compile()
     return app
 
+async def analyze_many(event_names: Iterable[str], concurrency: int = 4, app=None, config: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Analyzes many events concurrently against the local Ollama server.
+    At most `concurrency` graphs run at once; (event_name, result) pairs are
+    yielded as each one completes. A failed event yields {"error": ...}
+    instead of stopping the whole batch.
+    Names are pulled from `event_names` lazily, so it can be a huge generator.
+
+        async for name, result in analyze_many(names, concurrency=8): ...
+    """
+    app = app or build_graph()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run_one(event_name: str):
+        async with semaphore:
+            try:
+                return event_name, await app.ainvoke({"event_name": event_name}, config=config)
+            except Exception as e:
+                return event_name, {"event_name": event_name, "error": str(e)}
+    
+    names = iter(event_names)
+    pending = set()
+    
+    def top_up():
+        # Only `concurrency` tasks exist at a time; the rest stay in the iterator
+        for event_name in names:
+            pending.add(asyncio.create_task(run_one(event_name)))
+            if len(pending) >= concurrency:
+                break
+    
+    try:
+        top_up()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                yield task.result()
+            top_up()
+    finally:
+        # Consumer stopped early: don't leave graphs running in the background
+        for task in pending:
+            task.cancel()
+
 # --- EXECUTABLE BLOCK FOR TESTING ---
 if __name__ == "__main__":
     print("🚀 Booting Agentic Event Intelligence System...")
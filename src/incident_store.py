@@ -0,0 +1,451 @@
+"""
+Structured incident memory.
+Every past event is one row (event id, type, outcome, attendee count,
+indoor/outdoor, venue, lesson, real date) in the SQLite catalog started by
+init_knowledge_db.py, with indexes on type, outcome and date. Questions like
+"failures at outdoor events >500 people in the last 2 years" become an
+indexed SQL query, and similarity search only scores the rows that pass
+those filters.
+"""
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.rag as rag
+from src.rag import PROJECT_ROOT, DATA_PATH
+from src.embedding_cache import uncached
+from src.fast_path import OUTDOOR_KEYWORDS
+from src.lexical_index import LexicalIndex
+
+# --- CONFIGURATION ---
+INCIDENT_DB_PATH = os.path.join(PROJECT_ROOT, "knowledge_base.db")  # same catalog as init_knowledge_db.py
+INCIDENT_LOG_FILE = "incident_memory_log.txt"
+
+# Free-text outcomes ("Failure (Safety Issue)", "Critical Failure") -> one indexed value
+OUTCOMES = ["success", "issue", "failure", "critical"]
+SEASON_MONTHS = {"WINTER": 1, "SPRING": 4, "SUMMER": 7, "FALL": 10, "AUTUMN": 10}
+# Incidents comparable to a new event: same type and setting, similar size
+# (old lessons still apply, so there is no recency cutoff unless one is configured)
+EVENT_LOOKBACK_YEARS: Optional[float] = None
+EVENT_SIZE_RATIO = 2.0           # attendees within [n / ratio, n * ratio]
+EVENT_MATCH_BONUS_RANKS = 3      # an incident matching every profile field moves up this many places
+
+_ATTENDEES_RE = re.compile(r"(\d[\d,]*)\s*(?:\+\s*)?(?:confirmed\s+)?(?:people|persons|attendees|members|students|guests|participants)", re.I)
+_VENUE_RE = re.compile(r"\b(?:in|at|to) the ((?:[A-Z][\w']*\s)+(?:ballroom|hall|lawn|quad|center|centre|auditorium|rooftop|gym))", re.I)
+
+def normalize_outcome(outcome: str) -> str:
+    lowered = (outcome or "").lower()
+    if "critical" in lowered:
+        return "critical"
+    if "fail" in lowered:
+        return "failure"
+    if "success" in lowered:
+        return "success"
+    return "issue"
+
+def _event_date(event_id: str) -> Optional[str]:
+    """
+    "2023-SPRING-FLING" -> "2023-04-01" (year + season when the ID carries them).
+    """
+    match = re.match(r"(\d{4})\b", event_id or "")
+    if not match:
+        return None
+    month = next((m for season, m in SEASON_MONTHS.items() if season in event_id.upper().split("-")), 1)
+    return f"{match.group(1)}-{month:02d}-01"
+
+def parse_incident_log(text: str) -> List[Dict[str, Any]]:
+    """
+    Splits the incident log format (EVENT ID / Type / Outcome / Description /
+    Lesson Learned blocks) into structured incidents.
+    """
+    incidents = []
+    for block in re.split(r"\n\s*\n(?=\s*EVENT ID:)", text):
+        fields = dict(re.findall(r"^\s*(EVENT ID|Type|Outcome|Description|Lesson Learned):\s*(.*)$", block, re.M))
+        if "EVENT ID" not in fields:
+            continue
+        prose = f"{fields['EVENT ID'].replace('-', ' ')} {fields.get('Description', '')} {fields.get('Lesson Learned', '')}"
+        attendees = _ATTENDEES_RE.search(prose)
+        venue = _VENUE_RE.search(fields.get("Description", ""))
+        incidents.append({
+            "event_id": fields["EVENT ID"].strip(),
+            "event_type": fields.get("Type", "").strip() or None,
+            "outcome": fields.get("Outcome", "").strip(),
+            "attendees": int(attendees.group(1).replace(",", "")) if attendees else None,
+            "is_outdoors": any(re.search(r"\b%s\b" % k, prose.lower()) for k in OUTDOOR_KEYWORDS + ["rooftop"]),
+            "venue": venue.group(1).strip() if venue else None,
+            "description": fields.get("Description", "").strip(),
+            "lesson": fields.get("Lesson Learned", "").strip(),
+            "occurred_at": _event_date(fields["EVENT ID"]),
+        })
+    return incidents
+
+def _to_text(incident: Dict[str, Any]) -> str:
+    # What gets embedded: the same fields the prose memory log carries (stored rows keep the logged outcome in outcome_detail)
+    return (f"EVENT ID: {incident['event_id']}\nType: {incident.get('event_type') or ''}\nOutcome: {incident.get('outcome_detail') or incident.get('outcome') or ''}\n"
+            f"Description: {incident.get('description') or ''}\nLesson Learned: {incident.get('lesson') or ''}")
+
+class IncidentStore:
+    """
+    One row per incident, indexed on type, outcome and date, with the
+    incident's embedding stored alongside (float32 BLOB) and an in-memory
+    BM25 index over the same text for lexical/hybrid retrieval.
+    """
+
+    def __init__(self, path: str = INCIDENT_DB_PATH, embedder=None):
+        self._embedder = embedder
+        self._lock = threading.Lock()
+        self._lexical: Optional[LexicalIndex] = None   # rebuilt on the next lexical search after a write
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS incidents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id TEXT,
+                event_type TEXT,
+                outcome TEXT,
+                outcome_detail TEXT,
+                attendees INTEGER,
+                is_outdoors INTEGER,
+                venue TEXT,
+                description TEXT,
+                lesson TEXT,
+                occurred_at TEXT,
+                logged_at REAL,
+                vector BLOB,
+                source_file TEXT,
+                UNIQUE (event_id, lesson)
+            );
+        ''')
+        # Catalogs created before rows tracked the file they were parsed from
+        if "source_file" not in {r["name"] for r in self._conn.execute("PRAGMA table_info(incidents)")}:
+            self._conn.execute("ALTER TABLE incidents ADD COLUMN source_file TEXT")
+        self._conn.executescript('''
+            CREATE INDEX IF NOT EXISTS idx_incidents_type ON incidents (event_type);
+            CREATE INDEX IF NOT EXISTS idx_incidents_outcome_date ON incidents (outcome, occurred_at);
+            CREATE INDEX IF NOT EXISTS idx_incidents_date ON incidents (occurred_at);
+            CREATE INDEX IF NOT EXISTS idx_incidents_source ON incidents (source_file);
+        ''')
+        self._conn.commit()
+
+    @property
+    def embedder(self):
+        # Built on first use, so plain SQL queries never touch the embedding model
+        if self._embedder is None:
+            self._embedder = rag.get_embedding_function()
+        return self._embedder
+
+    # --- writing ---
+
+    def add_many(self, incidents: Sequence[Dict[str, Any]], embed: bool = True) -> int:
+        """
+        Inserts (or replaces, by event_id + lesson) incidents. With embed=True all of them
+        are embedded in one batched call; otherwise vectors are filled lazily by search().
+        Incidents without occurred_at are stored undated (NULL), so since/until
+        filters leave them out. source_file records where an incident came from
+        (a knowledge base file, or the feedback log), so sync_file() can replace it.
+        """
+        if not incidents:
+            return 0
+        vectors = uncached(self.embedder).embed_documents([_to_text(i) for i in incidents]) if embed else [None] * len(incidents)
+        now = time.time()
+        rows = [(
+            i["event_id"],
+            i.get("event_type"),
+            normalize_outcome(i.get("outcome", "")),
+            i.get("outcome"),
+            i.get("attendees"),
+            None if i.get("is_outdoors") is None else int(bool(i["is_outdoors"])),
+            i.get("venue"),
+            i.get("description"),
+            i.get("lesson"),
+            i.get("occurred_at"),       # unknown dates stay NULL: never "today"
+            now,
+            np.asarray(v, dtype=np.float32).tobytes() if v is not None else None,
+            i.get("source_file"),
+        ) for i, v in zip(incidents, vectors)]
+        with self._lock:
+            self._conn.executemany('''
+                INSERT OR REPLACE INTO incidents
+                (event_id, event_type, outcome, outcome_detail, attendees, is_outdoors, venue, description, lesson, occurred_at, logged_at, vector, source_file)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            self._conn.commit()
+            self._lexical = None
+        return len(rows)
+
+    def add(self, incident: Dict[str, Any], embed: bool = True):
+        self.add_many([incident], embed=embed)
+
+    def sync_file(self, source_file: str, incidents: Sequence[Dict[str, Any]], embed: bool = True) -> int:
+        """
+        Makes `source_file`'s rows exactly `incidents`: upserts them, then
+        deletes the file's rows that are no longer listed (edited or removed entries).
+        """
+        incidents = [{**i, "source_file": source_file} for i in incidents]
+        self.add_many(incidents, embed=embed)
+        keep = {(i["event_id"], i.get("lesson")) for i in incidents}
+        with self._lock:
+            rows = self._conn.execute('SELECT id, event_id, lesson FROM incidents WHERE source_file = ?', (source_file,)).fetchall()
+            stale = [(r["id"],) for r in rows if (r["event_id"], r["lesson"]) not in keep]
+            if stale:
+                self._conn.executemany('DELETE FROM incidents WHERE id = ?', stale)
+                self._conn.commit()
+                self._lexical = None
+        return len(incidents)
+
+    def import_log(self, path: str = os.path.join(DATA_PATH, INCIDENT_LOG_FILE), embed: bool = True) -> int:
+        with open(path, "r", encoding="utf-8") as f:
+            return self.sync_file(os.path.basename(path), parse_incident_log(f.read()), embed=embed)
+
+    def remove_files(self, source_files: Sequence[str]) -> int:
+        """
+        Deletes every incident parsed from the given files. Returns the number of rows deleted.
+        """
+        source_files = list(source_files)
+        if not source_files:
+            return 0
+        with self._lock:
+            deleted = self._conn.execute(f"DELETE FROM incidents WHERE source_file IN ({', '.join('?' * len(source_files))})",
+                                         source_files).rowcount
+            self._conn.commit()
+            self._lexical = None
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM incidents')
+            self._conn.commit()
+            self._lexical = None
+
+    # --- reading ---
+
+    @staticmethod
+    def _where(event_type: Optional[str] = None, outcome: Union[str, Sequence[str], None] = None,
+               min_attendees: Optional[int] = None, max_attendees: Optional[int] = None,
+               is_outdoors: Optional[bool] = None, venue: Optional[str] = None,
+               since: Optional[str] = None, until: Optional[str] = None) -> Tuple[str, list]:
+        clauses, params = [], []
+        if event_type:
+            # "Social" also matches compound log types like "Social / Concert"
+            clauses.append("(event_type = ? OR event_type LIKE ?)"); params.extend([event_type, f"{event_type} /%"])
+        if outcome:
+            outcomes = [outcome] if isinstance(outcome, str) else list(outcome)
+            clauses.append(f"outcome IN ({', '.join('?' * len(outcomes))})"); params.extend(outcomes)
+        if min_attendees is not None:
+            clauses.append("attendees >= ?"); params.append(min_attendees)
+        if max_attendees is not None:
+            clauses.append("attendees <= ?"); params.append(max_attendees)
+        if is_outdoors is not None:
+            clauses.append("is_outdoors = ?"); params.append(int(is_outdoors))
+        if venue:
+            clauses.append("venue LIKE ?"); params.append(f"%{venue}%")
+        if since:
+            clauses.append("occurred_at >= ?"); params.append(since)
+        if until:
+            clauses.append("occurred_at <= ?"); params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        incident = {key: row[key] for key in row.keys() if key not in ("vector", "id")}
+        if incident.get("is_outdoors") is not None:
+            incident["is_outdoors"] = bool(incident["is_outdoors"])
+        return incident
+
+    def query(self, limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        """
+        Indexed structured lookup, newest first (undated incidents last). Filters:
+        event_type, outcome (one value or a list), min_attendees, max_attendees,
+        is_outdoors, venue (substring), since / until (YYYY-MM-DD; undated
+        incidents never match a date filter).
+        """
+        where, params = self._where(**filters)
+        sql = f"SELECT * FROM incidents{where} ORDER BY occurred_at DESC"
+        if limit:
+            sql += " LIMIT ?"; params.append(limit)
+        with self._lock:
+            return [self._row(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def _lexical_index(self) -> LexicalIndex:
+        with self._lock:
+            if self._lexical is None:
+                rows = self._conn.execute("SELECT * FROM incidents").fetchall()
+                index = LexicalIndex()
+                index.add([str(r["id"]) for r in rows], [_to_text(self._row(r)) for r in rows], [{"row": r["id"]} for r in rows])
+                self._lexical = index
+            return self._lexical
+
+    def _vector_ranking(self, rows: List[sqlite3.Row], text: str, query_vector: Optional[List[float]]) -> List[Tuple[int, float]]:
+        # Rows imported with embed=False get their vectors now, in one batch
+        missing = [r for r in rows if r["vector"] is None]
+        vectors = {r["id"]: np.frombuffer(r["vector"], dtype=np.float32) for r in rows if r["vector"] is not None}
+        if missing:
+            fresh = uncached(self.embedder).embed_documents([_to_text(self._row(r)) for r in missing])
+            with self._lock:
+                self._conn.executemany('UPDATE incidents SET vector = ? WHERE id = ?',
+                                       [(np.asarray(v, dtype=np.float32).tobytes(), r["id"]) for r, v in zip(missing, fresh)])
+                self._conn.commit()
+            vectors.update({r["id"]: np.asarray(v, dtype=np.float32) for r, v in zip(missing, fresh)})
+
+        matrix = np.stack([vectors[r["id"]] for r in rows])
+        query = np.asarray(query_vector if query_vector is not None else self.embedder.embed_query(text), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+        return [(int(i), float(scores[i])) for i in np.argsort(-scores)]
+
+    def _lexical_ranking(self, rows: List[sqlite3.Row], text: str, k: int) -> List[Tuple[int, float]]:
+        # BM25 restricted to the rows that passed the SQL filters; no embedding call
+        position = {r["id"]: i for i, r in enumerate(rows)}
+        hits = self._lexical_index().search(text, k=k, filters={"row": {"$in": set(position)}})
+        return [(position[int(doc_id)], score) for doc_id, score in hits]
+
+    def search(self, text: str, k: int = 3, query_vector: Optional[List[float]] = None, mode: Optional[str] = None,
+               **filters) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Similarity search over ONLY the rows that pass the structured filters.
+        Returns (incident, score) pairs, best first: cosine similarity in
+        "vector" mode, BM25 in "lexical" mode (never embeds), the RRF score
+        in "hybrid" mode. mode defaults to rag.RETRIEVAL_MODE.
+        query_vector skips embedding `text` (e.g. when it was batched with other queries).
+        """
+        mode = mode or rag.RETRIEVAL_MODE
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM incidents{where}", params).fetchall()
+        if not rows:
+            return []
+
+        if mode == "lexical":
+            ranked = self._lexical_ranking(rows, text, k)
+        elif mode == "vector":
+            ranked = self._vector_ranking(rows, text, query_vector)[:k]
+        else:
+            # Hybrid: reciprocal-rank fusion, as in rag._ranked_search
+            candidates = max(k, rag.HYBRID_CANDIDATES)
+            fused: Dict[int, float] = {}
+            for ranking in (self._vector_ranking(rows, text, query_vector)[:candidates], self._lexical_ranking(rows, text, candidates)):
+                for rank, (i, _) in enumerate(ranking):
+                    fused[i] = fused.get(i, 0.0) + 1.0 / (rag.RRF_K + rank + 1)
+            ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self._row(rows[i]), score) for i, score in ranked]
+
+    def search_for_event(self, text: str, event_details: Optional[Dict[str, Any]], k: int = 3,
+                         query_vector: Optional[List[float]] = None, mode: Optional[str] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Incidents relevant to a profiled event, comparable ones first. The
+        profile (type, indoor/outdoor and size from event_details, plus recency
+        if EVENT_LOOKBACK_YEARS is set) is a preference, not a cutoff: each
+        relevance candidate moves up by EVENT_MATCH_BONUS_RANKS times the share
+        of profile fields it matches. Extracted types are loose ("Social" vs a
+        logged "Performance"), so hard filters would drop the precedents that matter.
+        """
+        mode = mode or rag.RETRIEVAL_MODE
+        if query_vector is None and mode != "lexical":
+            query_vector = self.embedder.embed_query(text)
+        candidates = self.search(text, k=k + EVENT_MATCH_BONUS_RANKS, query_vector=query_vector, mode=mode)
+        groups = event_filter_groups(event_details)
+        if not groups:
+            return candidates[:k]
+
+        # One indexed lookup per profile field, restricted to the candidates
+        keys = [(incident["event_id"], incident["lesson"]) for incident, _ in candidates]
+        matching = [self._matching_keys(keys, **filters) for filters in groups.values()]
+        def adjusted_rank(item):
+            rank, (incident, _) = item
+            matched = sum((incident["event_id"], incident["lesson"]) in found for found in matching)
+            return rank - EVENT_MATCH_BONUS_RANKS * matched / len(groups)
+        return [result for _, result in sorted(enumerate(candidates), key=adjusted_rank)[:k]]
+
+    def _matching_keys(self, keys: List[Tuple[str, str]], **filters) -> set:
+        if not keys:
+            return set()
+        where, params = self._where(**filters)
+        candidates = " OR ".join(["(event_id = ? AND lesson IS ?)"] * len(keys))
+        sql = f"SELECT event_id, lesson FROM incidents{where}{' AND' if where else ' WHERE'} ({candidates})"
+        with self._lock:
+            return {(r["event_id"], r["lesson"]) for r in self._conn.execute(sql, params + [v for key in keys for v in key]).fetchall()}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM incidents').fetchone()[0]
+
+    def source_files(self) -> set:
+        with self._lock:
+            return {r[0] for r in self._conn.execute('SELECT DISTINCT source_file FROM incidents WHERE source_file IS NOT NULL')}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_incident_store() -> IncidentStore:
+    """
+    Process-wide store (one SQLite connection, shared like the vector store).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IncidentStore()
+        return _store
+
+def years_ago(years: float) -> str:
+    return (datetime.now() - timedelta(days=365.25 * years)).strftime("%Y-%m-%d")
+
+def event_filter_groups(event_details: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    The search() filters an event's profile implies, by field
+    ("attendees", "date", "setting", "type"); fields the profile lacks are left out.
+    """
+    details = event_details or {}
+    groups: Dict[str, Dict[str, Any]] = {}
+    attendees = details.get("estimated_attendees")
+    if isinstance(attendees, (int, float)) and attendees > 0:
+        groups["attendees"] = {"min_attendees": int(attendees / EVENT_SIZE_RATIO), "max_attendees": int(attendees * EVENT_SIZE_RATIO)}
+    if EVENT_LOOKBACK_YEARS:
+        groups["date"] = {"since": years_ago(EVENT_LOOKBACK_YEARS)}
+    if isinstance(details.get("is_outdoors"), bool):
+        groups["setting"] = {"is_outdoors": details["is_outdoors"]}
+    if details.get("type"):
+        groups["type"] = {"event_type": details["type"]}
+    return groups
+
+# `python -m src.incident_store import` loads the incident log;
+# `python -m src.incident_store query --outcome failure critical --outdoors --min-attendees 500 --years 2`
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Structured incident memory")
+    parser.add_argument("command", choices=["import", "query", "search"])
+    parser.add_argument("text", nargs="?", help="Search text (search only)")
+    parser.add_argument("--type", dest="event_type")
+    parser.add_argument("--outcome", nargs="+", choices=OUTCOMES)
+    parser.add_argument("--min-attendees", type=int)
+    parser.add_argument("--outdoors", action="store_true", default=None)
+    parser.add_argument("--years", type=float, help="Only incidents from the last N years")
+    parser.add_argument("--no-embed", action="store_true", help="Import without embedding (vectors filled on first search)")
+    parser.add_argument("--mode", choices=["hybrid", "vector", "lexical"], help="Search ranking (default: rag.RETRIEVAL_MODE)")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    store = get_incident_store()
+    if args.command == "import":
+        print(f"✅ Imported {store.import_log(embed=not args.no_embed)} incidents into {INCIDENT_DB_PATH}")
+    else:
+        filters = {"event_type": args.event_type, "outcome": args.outcome, "min_attendees": args.min_attendees,
+                   "is_outdoors": args.outdoors, "since": years_ago(args.years) if args.years else None}
+        start = time.perf_counter()
+        if args.command == "query":
+            results = [(incident, None) for incident in store.query(**filters)]
+        else:
+            results = store.search(args.text or "", k=args.k, mode=args.mode, **filters)
+        print(f"⏱️ {len(results)} incidents in {(time.perf_counter() - start) * 1000:.2f}ms")
+        for incident, score in results:
+            prefix = f"[{score:.2f}] " if score is not None else ""
+            print(f"   {prefix}{incident['occurred_at'] or 'undated'} {incident['event_id']} ({incident['outcome']}, {incident['attendees'] or '?'} people): {incident['lesson']}")
@@ -1,8 +1,16 @@
 import sqlite3
 import os
+import sys
+
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag import DATA_PATH
+from src.incident_store import IncidentStore, INCIDENT_DB_PATH, INCIDENT_LOG_FILE
 
 # Configuration
-DB_NAME = "knowledge_base.db"
+# Resolved against the project root (not the cwd), so this fills the catalog the app reads
+DB_NAME = INCIDENT_DB_PATH
 
 # These are the exact files you uploaded. 
 # We are creating "index cards" for them in the database.
@@ -58,6 +66,12 @@ def create_database():
     # Save changes and close
     conn.commit()
     conn.close()
+
+    # Structured rows for every past incident (indexed by type, outcome and date).
+    # Vectors are filled in on the first similarity search, so this works without Ollama.
+    store = IncidentStore(DB_NAME)
+    imported = store.import_log(os.path.join(DATA_PATH, INCIDENT_LOG_FILE), embed=False)
+    print(f"   > Structured incidents: {imported}")
     print(f"✅ Success! Database '{DB_NAME}' is ready.")
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+"""
+In-process BM25 inverted index over the knowledge base chunks.
+The SOPs are full of exact terms ("aisle width", "fireworks", "decibel")
+that a dense embedding can rank below looser matches. This index scores
+them lexically, needs no embedding call, and is persisted next to the
+Chroma collection so it survives restarts.
+"""
+import os
+import re
+import json
+import math
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# --- CONFIGURATION ---
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with", "regarding",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased alphanumeric terms without stopwords; a trailing plural "s" is
+    dropped so "generators" matches "generator".
+    """
+    terms = []
+    for term in _TOKEN_RE.findall(text.lower()):
+        if term in STOPWORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+def matches_filter(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluates the subset of Chroma `where` filters this repo uses:
+    plain equality ({"category": "rule"}), "$eq"/"$in", and "$and"/"$or".
+    """
+    if not filters:
+        return True
+    for key, condition in filters.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition): return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition): return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if "$eq" in condition and value != condition["$eq"]: return False
+            if "$ne" in condition and value == condition["$ne"]: return False
+            if "$in" in condition and value not in condition["$in"]: return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+class LexicalIndex:
+    """
+    Postings (term -> {doc_id: term frequency}) plus the stored chunks, so a
+    hit can be returned without touching Chroma.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()   # one writer at a time: snapshot -> file -> replace
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    # --- writing ---
+
+    def add(self, ids: Iterable[str], contents: Iterable[str], metadatas: Iterable[Dict[str, Any]]):
+        with self._lock:
+            for doc_id, content, metadata in zip(ids, contents, metadatas):
+                self._remove(doc_id)
+                counts = Counter(tokenize(content))
+                for term, tf in counts.items():
+                    self.postings[term][doc_id] = tf
+                length = sum(counts.values())
+                self.docs[doc_id] = {"content": content, "metadata": dict(metadata or {}), "length": length}
+                self.total_length += length
+
+    def remove(self, ids: Iterable[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self.total_length -= doc["length"]
+        for term in set(tokenize(doc["content"])):
+            postings = self.postings.get(term)
+            if postings is None: continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+
+    def clear(self):
+        with self._lock:
+            self.postings.clear()
+            self.docs.clear()
+            self.total_length = 0
+
+    # --- reading ---
+
+    def search(self, query: str, k: int = 4, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """
+        Returns up to k (doc_id, bm25_score) pairs, best first, among the
+        chunks whose metadata matches `filters`.
+        """
+        with self._lock:
+            n_docs = len(self.docs)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings: continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    length = self.docs[doc_id]["length"]
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            hits = []
+            for doc_id, score in ranked:
+                if matches_filter(self.docs[doc_id]["metadata"], filters):
+                    hits.append((doc_id, score))
+                    if len(hits) >= k: break
+            return hits
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            doc = self.docs.get(doc_id)
+            return {"content": doc["content"], "metadata": dict(doc["metadata"])} if doc else None
+
+    # --- persistence ---
+
+    def save(self):
+        """
+        Writes chunks AND postings, so loading never re-tokenizes the corpus.
+        Safe to call from several threads (ingestion and the memory writer):
+        saves are serialized, so the last one to finish wrote the newest snapshot.
+        """
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                payload = json.dumps({"docs": self.docs, "postings": self.postings})
+            # Unique temp file in the same folder, so even another process can't interleave with this write
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(self.path) or ".",
+                                             prefix=os.path.basename(self.path) + ".", suffix=".tmp", delete=False) as f:
+                f.write(payload)
+            try:
+                os.replace(f.name, self.path)
+            except OSError:
+                os.remove(f.name)
+                raise
+
+    def load(self) -> bool:
+        """
+        Reads the persisted index. False if there is no usable file.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            docs, postings = payload["docs"], payload["postings"]
+        except (OSError, TypeError, KeyError, json.JSONDecodeError):
+            return False
+        with self._lock:
+            self.docs = docs
+            self.postings = defaultdict(dict, postings)
+            self.total_length = sum(doc["length"] for doc in docs.values())
+        return True
@@ -0,0 +1,290 @@
+"""
+Priority scheduler in front of the shared Ollama server.
+The JSON agents (inference, classification, profile, risk) make short calls;
+the marketing agent generates a long HTML page. Ollama serves a fixed number
+of requests at once (OLLAMA_NUM_PARALLEL) and queues the rest FIFO, so under
+load a risk call can sit behind several page generations. Here every model
+call first takes a slot from this scheduler, which:
+  - never hands out more than LLM_SLOTS at once (the queueing happens here,
+    where priorities apply, instead of inside Ollama)
+  - serves the "json" class before "creative", and caps each class
+    (creative leaves at least one slot free for JSON calls by default)
+  - round-robins between requests (events) within a class, so one event
+    with many calls doesn't starve the others
+  - lets a waiter that has aged past MAX_WAIT_SECONDS jump ahead of higher
+    priority classes (no starvation of page generation)
+Queue depth, running calls and wait times per class are in get_scheduler_stats().
+"""
+import os
+import time
+import asyncio
+import itertools
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from src.telemetry import percentile
+
+# --- CONFIGURATION ---
+LLM_SLOTS = int(os.environ.get("LLM_SCHEDULER_SLOTS", os.environ.get("OLLAMA_NUM_PARALLEL", "2")))
+PRIORITY_CLASSES = ["json", "creative"]     # highest priority first
+CLASS_LIMITS = {
+    "json": LLM_SLOTS,
+    "creative": max(1, LLM_SLOTS - 1),
+}
+MAX_WAIT_SECONDS = 15.0
+WAIT_SAMPLES = 500
+# Runnable methods that return a new runnable around the client; their results are wrapped too
+DERIVING_METHODS = {"bind", "bind_tools", "with_structured_output", "with_config", "with_retry", "with_types", "with_listeners", "with_fallbacks"}
+
+# The request (event) the current model call belongs to; set by the graph nodes
+_request_key: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_request_key", default=None)
+
+@contextmanager
+def request_scope(key: Optional[str]):
+    """
+    Tags every model call made inside the block with `key` (for fairness).
+    """
+    token = _request_key.set(key)
+    try:
+        yield
+    finally:
+        _request_key.reset(token)
+
+class _Ticket:
+    __slots__ = ("cls", "key", "enqueued", "granted", "event", "loop", "future")
+
+    def __init__(self, cls: str, key: str):
+        self.cls, self.key = cls, key
+        self.enqueued = time.perf_counter()
+        self.granted = False
+        self.event = self.loop = self.future = None
+
+class LLMScheduler:
+    """
+    Slot allocator shared by threads and asyncio tasks.
+    """
+
+    def __init__(self, slots: int = LLM_SLOTS, limits: Optional[Dict[str, int]] = None, max_wait_seconds: float = MAX_WAIT_SECONDS):
+        self.slots = slots
+        self.limits = dict(limits or CLASS_LIMITS)
+        self.max_wait_seconds = max_wait_seconds
+        self._lock = threading.Lock()
+        # class -> request key -> tickets; key order is the round-robin order
+        self._waiting: Dict[str, "OrderedDict[str, deque]"] = {cls: OrderedDict() for cls in PRIORITY_CLASSES}
+        self._running = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._granted = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._aged = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._waits = {cls: deque(maxlen=WAIT_SAMPLES) for cls in PRIORITY_CLASSES}
+        self._anonymous = itertools.count()
+
+    # --- dispatch ---
+
+    def _depth(self, cls: str) -> int:
+        return sum(len(tickets) for tickets in self._waiting[cls].values())
+
+    def _next(self) -> Optional[_Ticket]:
+        """
+        Picks the next ticket to run (lock held), or None if nothing may start.
+        """
+        if sum(self._running.values()) >= self.slots:
+            return None
+        eligible = [cls for cls in PRIORITY_CLASSES if self._waiting[cls] and self._running[cls] < self.limits.get(cls, self.slots)]
+        if not eligible:
+            return None
+        now = time.perf_counter()
+        # Aged waiters first (oldest head of its class), then strict priority
+        heads = {cls: next(iter(self._waiting[cls].values()))[0] for cls in eligible}
+        aged = [cls for cls in eligible if now - heads[cls].enqueued >= self.max_wait_seconds]
+        cls = min(aged, key=lambda c: heads[c].enqueued) if aged else eligible[0]
+        if aged and cls != eligible[0]:
+            self._aged[cls] += 1
+        # Round-robin: take from the first request, then move it to the back
+        key, tickets = next(iter(self._waiting[cls].items()))
+        ticket = tickets.popleft()
+        if tickets:
+            self._waiting[cls].move_to_end(key)
+        else:
+            del self._waiting[cls][key]
+        ticket.granted = True
+        self._running[cls] += 1
+        self._granted[cls] += 1
+        self._waits[cls].append(now - ticket.enqueued)
+        return ticket
+
+    def _dispatch(self):
+        """
+        Grants as many tickets as there are free slots (lock held).
+        """
+        while True:
+            ticket = self._next()
+            if ticket is None:
+                return
+            if ticket.event is not None:
+                ticket.event.set()
+            else:
+                ticket.loop.call_soon_threadsafe(lambda f=ticket.future: f.done() or f.set_result(None))
+
+    def _enqueue(self, ticket: _Ticket):
+        self._waiting[ticket.cls].setdefault(ticket.key, deque()).append(ticket)
+        self._dispatch()
+
+    def _withdraw(self, ticket: _Ticket):
+        # Lock held: a waiter gave up (cancelled) before being granted
+        tickets = self._waiting[ticket.cls].get(ticket.key)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._waiting[ticket.cls][ticket.key]
+
+    def _ticket(self, cls: str) -> _Ticket:
+        if cls not in self._waiting:
+            raise ValueError(f"Unknown priority class '{cls}' (expected one of {PRIORITY_CLASSES})")
+        key = _request_key.get()
+        return _Ticket(cls, key if key is not None else f"anonymous-{next(self._anonymous)}")
+
+    # --- acquire / release ---
+
+    def acquire(self, cls: str) -> _Ticket:
+        ticket = self._ticket(cls)
+        ticket.event = threading.Event()
+        with self._lock:
+            self._enqueue(ticket)
+        ticket.event.wait()
+        return ticket
+
+    async def aacquire(self, cls: str) -> _Ticket:
+        ticket = self._ticket(cls)
+        ticket.loop = asyncio.get_running_loop()
+        ticket.future = ticket.loop.create_future()
+        with self._lock:
+            self._enqueue(ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if ticket.granted:
+                    self._running[ticket.cls] -= 1
+                    self._dispatch()
+                else:
+                    self._withdraw(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: _Ticket):
+        with self._lock:
+            self._running[ticket.cls] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, cls: str):
+        ticket = self.acquire(cls)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            classes = {
+                cls: {
+                    "queued": self._depth(cls),
+                    "running": self._running[cls],
+                    "limit": self.limits.get(cls, self.slots),
+                    "granted": self._granted[cls],
+                    "aged_promotions": self._aged[cls],
+                    "avg_wait_seconds": sum(self._waits[cls]) / len(self._waits[cls]) if self._waits[cls] else 0.0,
+                    "p95_wait_seconds": percentile(list(self._waits[cls]), 95),
+                    "max_wait_seconds": max(self._waits[cls], default=0.0),
+                }
+                for cls in PRIORITY_CLASSES
+            }
+        return {"slots": self.slots, "classes": classes}
+
+class ScheduledChatModel:
+    """
+    Wraps a chat model so invoke/ainvoke/stream/astream/batch/abatch run inside
+    scheduler slots. bind(), with_structured_output() etc. return a wrapped
+    runnable with the same priority. Everything else is passed through.
+    """
+
+    def __init__(self, model, priority: str, scheduler: Optional[LLMScheduler] = None):
+        self.client = model
+        self.priority = priority
+        self.scheduler = scheduler or get_scheduler()
+
+    def invoke(self, *args, **kwargs):
+        with self.scheduler.slot(self.priority):
+            return self.client.invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        ticket = await self.scheduler.aacquire(self.priority)
+        try:
+            return await self.client.ainvoke(*args, **kwargs)
+        finally:
+            self.scheduler.release(ticket)
+
+    def stream(self, *args, **kwargs):
+        # The slot is held for the whole generation, not just the first token
+        with self.scheduler.slot(self.priority):
+            yield from self.client.stream(*args, **kwargs)
+
+    async def astream(self, *args, **kwargs):
+        ticket = await self.scheduler.aacquire(self.priority)
+        try:
+            async for chunk in self.client.astream(*args, **kwargs):
+                yield chunk
+        finally:
+            self.scheduler.release(ticket)
+
+    def batch(self, inputs, config=None, **kwargs):
+        # One slot per input (the client's own batch would run them all unscheduled)
+        configs = config if isinstance(config, list) else [config] * len(inputs)
+        return_exceptions = kwargs.pop("return_exceptions", False)
+        def run(item, item_config):
+            try:
+                return self.invoke(item, item_config, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+        if not inputs:
+            return []
+        with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+            # copy_context: worker threads keep the caller's request_scope
+            futures = [pool.submit(contextvars.copy_context().run, run, item, item_config) for item, item_config in zip(inputs, configs)]
+            return [future.result() for future in futures]
+
+    async def abatch(self, inputs, config=None, **kwargs):
+        configs = config if isinstance(config, list) else [config] * len(inputs)
+        return_exceptions = kwargs.pop("return_exceptions", False)
+        return await asyncio.gather(*(self.ainvoke(item, item_config, **kwargs) for item, item_config in zip(inputs, configs)),
+                                    return_exceptions=return_exceptions)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if name in DERIVING_METHODS:
+            def derive(*args, **kwargs):
+                return ScheduledChatModel(attribute(*args, **kwargs), self.priority, self.scheduler)
+            return derive
+        # `model` (the model name) and other plain attributes come from the wrapped client
+        return attribute
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> LLMScheduler:
+    """
+    Process-wide scheduler: every client in this process shares the same slots.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    return get_scheduler().stats()
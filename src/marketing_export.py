@@ -0,0 +1,266 @@
+"""
+Bulk landing-page export: one page per event in a CSV/JSONL.
+
+    python -m src.marketing_export events.csv -o marketing_pages --concurrency 4
+
+Pages are generated concurrently. The model's HTML body is stored in a
+content-addressed object directory keyed by the event (name + details), the
+marketing prompt and the creative model, so re-exporting a calendar only calls
+creative_llm for events that changed. A first-level row cache maps each input
+row (whitespace-normalized name + any given details, prompt and model
+versions) to its inferred details and body key, so unchanged rows skip the
+inference call too. Full pages are re-wrapped in the current shell on every
+run (that part is cheap) and listed in index.json.
+
+Input is the same as src/batch.py. A batch results JSONL works too: records that
+already carry `event_details` skip the inference step.
+"""
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage
+
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.agents as agents
+from src.batch import read_events
+from src.fast_path import fast_classify
+from src.prompts import MARKETING_PROMPT, INFERENCE_PROMPT
+from src.telemetry import percentile
+from src.llm_scheduler import request_scope
+from src.marketing_renderer import render_full_page, clean_body
+
+# --- CONFIGURATION ---
+DEFAULT_OUTPUT_DIR = "marketing_pages"
+OBJECTS_DIRNAME = "objects"
+ROWS_DIRNAME = "rows"
+PAGES_DIRNAME = "pages"
+INDEX_FILENAME = "index.json"
+
+def marketing_prompt_version() -> str:
+    return hashlib.sha256(MARKETING_PROMPT.encode()).hexdigest()[:16]
+
+def artifact_key(event_name: str, event_details: Dict[str, Any]) -> str:
+    """
+    Content address of a page body: what the creative model was asked, and by which prompt/model.
+    """
+    payload = json.dumps({
+        "event_name": event_name,
+        "event_details": event_details,
+        "prompt": marketing_prompt_version(),
+        "model": getattr(agents.creative_llm, "model", type(agents.creative_llm).__name__),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def row_key(event_name: str, event_details: Optional[Dict[str, Any]]) -> str:
+    """
+    Cache key of an input row, computable before any model call. Covers what
+    inference depends on too (its prompt and model), since a hit skips it.
+    """
+    payload = json.dumps({
+        "event_name": " ".join(event_name.split()),
+        "event_details": event_details,
+        "prompt": marketing_prompt_version(),
+        "inference_prompt": hashlib.sha256(INFERENCE_PROMPT.encode()).hexdigest()[:16],
+        "model": getattr(agents.creative_llm, "model", type(agents.creative_llm).__name__),
+        "inference_model": getattr(agents.llm, "model", type(agents.llm).__name__),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def page_filename(event_name: str, key: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", event_name.lower()).strip("-")[:60] or "event"
+    return f"{slug}-{key[:8]}.html"
+
+def read_export_events(path: str) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    (event_name, event_details or None) pairs. Details come from JSONL
+    records that have them (e.g. src.batch output); failed records are skipped.
+    """
+    if path.lower().endswith(".csv"):
+        for _, name in read_events(path):
+            yield name, None
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line: continue
+            item = json.loads(line)
+            if isinstance(item, dict):
+                if "error" in item or not str(item.get("event_name", "")).strip():
+                    continue
+                yield item["event_name"].strip(), item.get("event_details") or None
+            elif str(item).strip():
+                yield str(item).strip(), None
+
+class ArtifactStore:
+    """
+    objects/<key[:2]>/<key>.html holds the generated body and
+    rows/<key[:2]>/<key>.json an input row's {event_details, key}; writes are atomic.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, OBJECTS_DIRNAME), exist_ok=True)
+        os.makedirs(os.path.join(root, PAGES_DIRNAME), exist_ok=True)
+
+    def _path(self, key: str, dirname: str = OBJECTS_DIRNAME, ext: str = "html") -> str:
+        return os.path.join(self.root, dirname, key[:2], f"{key}.{ext}")
+
+    def _read(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, path: str, text: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._read(self._path(key))
+
+    def put(self, key: str, body: str):
+        self._write(self._path(key), body)
+
+    def get_row(self, key: str) -> Optional[Dict[str, Any]]:
+        text = self._read(self._path(key, ROWS_DIRNAME, "json"))
+        return json.loads(text) if text else None
+
+    def put_row(self, key: str, row: Dict[str, Any]):
+        self._write(self._path(key, ROWS_DIRNAME, "json"), json.dumps(row))
+
+    def write_page(self, filename: str, html: str) -> str:
+        path = os.path.join(self.root, PAGES_DIRNAME, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        return path
+
+async def _event_details(event_name: str) -> Dict[str, Any]:
+    # Routine events are profiled by rules; the rest need the inference agent
+    fast = fast_classify(event_name)
+    if fast:
+        return fast["event_details"]
+    with request_scope(event_name):
+        return (await agents.ainference_agent({"event_name": event_name}))["event_details"]
+
+async def _generate_body(event_name: str, event_details: Dict[str, Any]) -> str:
+    state = {"event_name": event_name, "event_details": event_details}
+    with request_scope(event_name):
+        response = await agents.creative_llm.ainvoke([HumanMessage(content=agents._marketing_prompt(state))])
+    return clean_body(response.content)
+
+async def export_pages(events: List[Tuple[str, Optional[Dict[str, Any]]]], output_dir: str = DEFAULT_OUTPUT_DIR,
+                       concurrency: int = 4, force: bool = False) -> Dict[str, Any]:
+    """
+    Writes one page per event and returns a summary (cache hits, throughput, latency).
+    force=True ignores cached rows and bodies.
+    """
+    store = ArtifactStore(output_dir)
+    semaphore = asyncio.Semaphore(concurrency)
+    in_flight: Dict[str, asyncio.Task] = {}   # same key twice in one run -> one generation
+    rows_in_flight: Dict[str, asyncio.Task] = {}   # same row twice in one run -> one inference
+    generation_seconds: List[float] = []
+    counts = {"cache_hits": 0, "generated": 0, "failed": 0}
+
+    async def body_for(key: str, event_name: str, details: Dict[str, Any]) -> Tuple[str, bool]:
+        cached = None if force else store.get(key)
+        if cached is not None:
+            return cached, True
+        if key not in in_flight:
+            async def generate():
+                start = time.perf_counter()
+                body = await _generate_body(event_name, details)
+                generation_seconds.append(time.perf_counter() - start)
+                store.put(key, body)
+                return body
+            in_flight[key] = asyncio.ensure_future(generate())
+            return await in_flight[key], False
+        return await in_flight[key], True
+
+    async def resolve_row(rkey: str, event_name: str, details: Optional[Dict[str, Any]]) -> Tuple[str, str, bool]:
+        """
+        (artifact key, body, cached) for an input row; infers details only on a row cache miss.
+        """
+        row = None if force else store.get_row(rkey)
+        body = store.get(row["key"]) if row else None
+        if body is not None:
+            return row["key"], body, True
+        details = details or await _event_details(event_name)
+        if "error" in details:
+            raise ValueError(f"inference failed: {details['error']}")
+        key = artifact_key(event_name, details)
+        body, hit = await body_for(key, event_name, details)
+        store.put_row(rkey, {"event_details": details, "key": key})
+        return key, body, hit
+
+    async def export_one(event_name: str, details: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                rkey = row_key(event_name, details)
+                if rkey not in rows_in_flight:
+                    rows_in_flight[rkey] = asyncio.ensure_future(resolve_row(rkey, event_name, details))
+                    key, body, hit = await rows_in_flight[rkey]
+                else:
+                    key, body, _ = await rows_in_flight[rkey]
+                    hit = True
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"   ❌ {event_name}: {e}")
+                return {"event_name": event_name, "error": str(e)}
+        counts["cache_hits" if hit else "generated"] += 1
+        filename = page_filename(event_name, key)
+        store.write_page(filename, render_full_page(event_name, body))
+        done = sum(counts.values())
+        if done % 10 == 0:
+            print(f"   📈 {done}/{len(events)} pages ({counts['cache_hits']} from cache)")
+        return {"event_name": event_name, "key": key, "page": f"{PAGES_DIRNAME}/{filename}", "cached": hit}
+
+    start = time.perf_counter()
+    entries = await asyncio.gather(*(export_one(name, details) for name, details in events))
+    elapsed = time.perf_counter() - start
+
+    with open(os.path.join(output_dir, INDEX_FILENAME), "w", encoding="utf-8") as f:
+        json.dump({"prompt_version": marketing_prompt_version(), "pages": entries}, f, indent=2)
+
+    return {
+        **counts,
+        "events": len(events),
+        "elapsed_seconds": elapsed,
+        "pages_per_minute": len(events) / elapsed * 60 if elapsed else 0.0,
+        "generated_per_minute": counts["generated"] / elapsed * 60 if elapsed else 0.0,
+        "generation_latency": {"p50": percentile(generation_seconds, 50), "p95": percentile(generation_seconds, 95)},
+    }
+
+def print_summary(summary: Dict[str, Any], output_dir: str):
+    hit_rate = summary["cache_hits"] / summary["events"] if summary["events"] else 0.0
+    print("\n✅ EXPORT COMPLETE")
+    print(f"   Pages: {summary['events'] - summary['failed']} | Generated: {summary['generated']} | "
+          f"Cache hits: {summary['cache_hits']} ({hit_rate:.0%}) | Failed: {summary['failed']}")
+    print(f"   Throughput: {summary['pages_per_minute']:.1f} pages/min ({summary['generated_per_minute']:.1f} generated/min) "
+          f"over {summary['elapsed_seconds']:.1f}s")
+    print(f"   Generation latency: p50 {summary['generation_latency']['p50']:.2f}s | p95 {summary['generation_latency']['p95']:.2f}s")
+    print(f"📂 Pages and index.json in '{output_dir}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate landing pages for a CSV/JSONL of events")
+    parser.add_argument("input", help="Input .csv (event_name column) or .jsonl (names, or src.batch results)")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT_DIR, help="Artifact directory (cache + pages)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Pages generated in parallel")
+    parser.add_argument("--force", action="store_true", help="Regenerate even when a cached body exists")
+    args = parser.parse_args()
+
+    events = list(read_export_events(args.input))
+    print(f"🎨 Exporting {len(events)} landing pages from '{args.input}' -> '{args.output}' (concurrency={args.concurrency})")
+    print_summary(asyncio.run(export_pages(events, args.output, concurrency=args.concurrency, force=args.force)), args.output)
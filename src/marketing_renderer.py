@@ -1,96 +1,396 @@
 """
 This file holds the beautiful HTML/CSS Structure.
-The LLM only injects content into the {content_body} placeholder.
+The LLM only injects content into the body of a precompiled page shell.
+
+The shell (head, nav, footer) and its stylesheet are built once at import.
+There are no CDN fetches: the Tailwind utilities the page actually uses are
+generated from the table below and inlined minified, icons are drawn with
+emoji glyphs instead of the Font Awesome webfont, and the font falls back to
+the system stack when Outfit isn't installed. Classes in the body that
+the startup stylesheet doesn't cover get a small per-page <style> in the tail.
+"""
+import re
+import html
+from typing import Iterable, List, Optional, Set, Tuple
+
+from .prompts import MARKETING_PROMPT
+
+# --- CONFIGURATION ---
+BREAKPOINTS = {"sm": 640, "md": 768, "lg": 1024, "xl": 1280}
+STATE_VARIANTS = {"hover": ":hover", "focus": ":focus"}
+SPACING_UNIT_REM = 0.25
+FONT_STACK = "'Outfit',system-ui,-apple-system,'Segoe UI',Roboto,sans-serif"
+FENCES = ("```html", "```")
+
+COLORS = {
+    "white": "#ffffff", "black": "#000000",
+    "gray-100": "#f3f4f6", "gray-200": "#e5e7eb", "gray-300": "#d1d5db", "gray-400": "#9ca3af", "gray-500": "#6b7280",
+    "gray-600": "#4b5563", "gray-700": "#374151", "gray-800": "#1f2937", "gray-900": "#111827",
+    "slate-800": "#1e293b", "slate-900": "#0f172a",
+    "pink-300": "#f9a8d4", "pink-400": "#f472b6", "pink-500": "#ec4899", "pink-600": "#db2777",
+    "purple-300": "#d8b4fe", "purple-400": "#c084fc", "purple-500": "#a855f7", "purple-600": "#9333ea",
+    "violet-400": "#a78bfa", "violet-500": "#8b5cf6", "violet-600": "#7c3aed",
+    "indigo-400": "#818cf8", "indigo-500": "#6366f1", "indigo-600": "#4f46e5",
+    "blue-400": "#60a5fa", "blue-500": "#3b82f6", "blue-600": "#2563eb", "cyan-400": "#22d3ee",
+    "green-400": "#4ade80", "green-500": "#22c55e", "yellow-400": "#facc15", "yellow-500": "#eab308",
+    "orange-400": "#fb923c", "orange-500": "#f97316", "red-400": "#f87171", "red-500": "#ef4444",
+}
+
+FONT_SIZES = {
+    "xs": (0.75, 1), "sm": (0.875, 1.25), "base": (1, 1.5), "lg": (1.125, 1.75), "xl": (1.25, 1.75),
+    "2xl": (1.5, 2), "3xl": (1.875, 2.25), "4xl": (2.25, 2.5), "5xl": (3, None), "6xl": (3.75, None), "7xl": (4.5, None),
+}
+
+STATIC_UTILITIES = {
+    "block": "display:block", "inline-block": "display:inline-block", "inline": "display:inline",
+    "flex": "display:flex", "inline-flex": "display:inline-flex", "grid": "display:grid", "hidden": "display:none",
+    "flex-col": "flex-direction:column", "flex-row": "flex-direction:row", "flex-wrap": "flex-wrap:wrap", "flex-1": "flex:1 1 0%",
+    "items-center": "align-items:center", "items-start": "align-items:flex-start", "items-end": "align-items:flex-end",
+    "justify-between": "justify-content:space-between", "justify-center": "justify-content:center",
+    "justify-around": "justify-content:space-around", "justify-start": "justify-content:flex-start", "justify-end": "justify-content:flex-end",
+    "text-center": "text-align:center", "text-left": "text-align:left", "text-right": "text-align:right",
+    "mx-auto": "margin-left:auto;margin-right:auto", "m-auto": "margin:auto",
+    "font-light": "font-weight:300", "font-normal": "font-weight:400", "font-medium": "font-weight:500",
+    "font-semibold": "font-weight:600", "font-bold": "font-weight:700", "font-extrabold": "font-weight:800",
+    "tracking-tight": "letter-spacing:-0.025em", "tracking-wide": "letter-spacing:0.025em", "tracking-wider": "letter-spacing:0.05em",
+    "tracking-widest": "letter-spacing:0.1em", "leading-tight": "line-height:1.25", "leading-relaxed": "line-height:1.625",
+    "uppercase": "text-transform:uppercase", "italic": "font-style:italic", "underline": "text-decoration-line:underline",
+    "bg-clip-text": "-webkit-background-clip:text;background-clip:text", "text-transparent": "color:transparent",
+    "bg-gradient-to-r": "background-image:linear-gradient(to right,var(--tw-gradient-stops))",
+    "bg-gradient-to-l": "background-image:linear-gradient(to left,var(--tw-gradient-stops))",
+    "bg-gradient-to-b": "background-image:linear-gradient(to bottom,var(--tw-gradient-stops))",
+    "bg-gradient-to-t": "background-image:linear-gradient(to top,var(--tw-gradient-stops))",
+    "bg-gradient-to-br": "background-image:linear-gradient(to bottom right,var(--tw-gradient-stops))",
+    "border": "border-width:1px", "border-2": "border-width:2px", "border-t": "border-top-width:1px", "border-b": "border-bottom-width:1px",
+    "rounded": "border-radius:0.25rem", "rounded-md": "border-radius:0.375rem", "rounded-lg": "border-radius:0.5rem",
+    "rounded-xl": "border-radius:0.75rem", "rounded-2xl": "border-radius:1rem", "rounded-3xl": "border-radius:1.5rem", "rounded-full": "border-radius:9999px",
+    "shadow": "box-shadow:0 1px 3px rgba(0,0,0,.1),0 1px 2px rgba(0,0,0,.06)", "shadow-lg": "box-shadow:0 10px 15px -3px rgba(0,0,0,.1),0 4px 6px -4px rgba(0,0,0,.1)",
+    "shadow-xl": "box-shadow:0 20px 25px -5px rgba(0,0,0,.1),0 8px 10px -6px rgba(0,0,0,.1)", "shadow-2xl": "box-shadow:0 25px 50px -12px rgba(0,0,0,.25)",
+    "transition": "transition-property:color,background-color,border-color,opacity,box-shadow,transform;transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms",
+    "transition-all": "transition-property:all;transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms",
+    "transform": "", "scale-105": "transform:scale(1.05)", "scale-110": "transform:scale(1.1)",
+    "w-full": "width:100%", "h-full": "height:100%", "w-auto": "width:auto", "min-h-screen": "min-height:100vh",
+    "max-w-md": "max-width:28rem", "max-w-lg": "max-width:32rem", "max-w-xl": "max-width:36rem", "max-w-2xl": "max-width:42rem",
+    "max-w-3xl": "max-width:48rem", "max-w-4xl": "max-width:56rem", "max-w-5xl": "max-width:64rem", "max-w-6xl": "max-width:72rem",
+    "relative": "position:relative", "absolute": "position:absolute", "fixed": "position:fixed", "inset-0": "inset:0",
+    "overflow-hidden": "overflow:hidden", "object-cover": "object-fit:cover", "cursor-pointer": "cursor:pointer",
+    "list-disc": "list-style-type:disc", "list-inside": "list-style-position:inside",
+}
+
+# Font Awesome names -> glyphs; anything else gets the generic sparkle
+ICON_GLYPHS = {
+    "music": "🎵", "users": "👥", "user": "👤", "user-friends": "👥", "star": "⭐", "calendar": "📅", "calendar-alt": "📅",
+    "calendar-days": "📅", "clock": "🕒", "map-marker": "📍", "map-marker-alt": "📍", "location-dot": "📍", "map-pin": "📍",
+    "ticket": "🎟️", "ticket-alt": "🎟️", "utensils": "🍽️", "pizza-slice": "🍕", "glass-cheers": "🥂", "champagne-glasses": "🥂",
+    "microphone": "🎤", "microphone-alt": "🎤", "guitar": "🎸", "drum": "🥁", "trophy": "🏆", "medal": "🏅", "laptop": "💻",
+    "laptop-code": "💻", "code": "💻", "lightbulb": "💡", "graduation-cap": "🎓", "book": "📖", "book-open": "📖", "heart": "❤️",
+    "fire": "🔥", "bolt": "⚡", "rocket": "🚀", "camera": "📷", "gift": "🎁", "sun": "☀️", "moon": "🌙", "tree": "🌳",
+    "leaf": "🍃", "paint-brush": "🎨", "palette": "🎨", "handshake": "🤝", "coffee": "☕", "mug-hot": "☕", "chess": "♞",
+    "chess-knight": "♞", "wifi": "📶", "film": "🎬", "futbol": "⚽", "basketball-ball": "🏀", "running": "🏃",
+    "globe": "🌍", "bullhorn": "📣", "info-circle": "ℹ️", "check": "✔️", "check-circle": "✅", "shield-alt": "🛡️",
+}
+
+BASE_CSS = f"""
+*,::before,::after {{ box-sizing: border-box; border: 0 solid #e5e7eb; }}
+html {{ line-height: 1.5; -webkit-text-size-adjust: 100%; }}
+body {{ margin: 0; font-family: {FONT_STACK}; background-color: #0f172a; color: white; overflow-x: hidden; }}
+h1,h2,h3,h4,h5,h6 {{ font-size: inherit; font-weight: inherit; margin: 0; }}
+p,ul,ol,figure,blockquote {{ margin: 0; }}
+a {{ color: inherit; text-decoration: inherit; }}
+button {{ font-family: inherit; font-size: 100%; cursor: pointer; }}
+img,svg,video {{ display: block; max-width: 100%; height: auto; }}
+.container {{ width: 100%; }}
+@media (min-width: 640px) {{ .container {{ max-width: 640px; }} }}
+@media (min-width: 768px) {{ .container {{ max-width: 768px; }} }}
+@media (min-width: 1024px) {{ .container {{ max-width: 1024px; }} }}
+@media (min-width: 1280px) {{ .container {{ max-width: 1280px; }} }}
+
+/* ICONS (offline stand-in for the Font Awesome webfont) */
+.fa,.fas,.far,.fab,.fa-solid,.fa-regular,.fa-brands {{ display: inline-block; font-style: normal; line-height: 1; }}
+.fa::before,.fas::before,.far::before,.fab::before,.fa-solid::before,.fa-regular::before,.fa-brands::before {{ content: "\\2726"; }}
+
+/* DYNAMIC BACKGROUND */
+.bg-glow {{
+    position: fixed; top: 0; left: 0; width: 100vw; height: 100vh; z-index: -1;
+    background:
+        radial-gradient(circle at 15% 50%, rgba(76, 29, 149, 0.4), transparent 25%),
+        radial-gradient(circle at 85% 30%, rgba(236, 72, 153, 0.4), transparent 25%);
+}}
+
+/* GLASSMORPHISM CARD */
+.glass-card {{
+    background: rgba(255, 255, 255, 0.05);
+    backdrop-filter: blur(16px);
+    -webkit-backdrop-filter: blur(16px);
+    border: 1px solid rgba(255, 255, 255, 0.1);
+    border-radius: 20px;
+    box-shadow: 0 4px 30px rgba(0, 0, 0, 0.1);
+}}
+
+/* NEON BUTTON */
+.btn-neon {{
+    background: linear-gradient(45deg, #ec4899, #8b5cf6);
+    border: none;
+    color: white;
+    padding: 12px 30px;
+    border-radius: 50px;
+    font-weight: bold;
+    transition: all 0.3s ease;
+    box-shadow: 0 0 15px rgba(236, 72, 153, 0.5);
+}}
+.btn-neon:hover {{
+    transform: translateY(-2px);
+    box-shadow: 0 0 25px rgba(139, 92, 246, 0.7);
+}}
+
+/* ANIMATIONS */
+@keyframes float {{
+    0% {{ transform: translateY(0px); }}
+    50% {{ transform: translateY(-10px); }}
+    100% {{ transform: translateY(0px); }}
+}}
+.animate-float {{ animation: float 6s ease-in-out infinite; }}
+
+.fade-in {{ animation: fadeIn 1.5s ease-out; }}
+@keyframes fadeIn {{ from {{ opacity: 0; transform: translateY(20px); }} to {{ opacity: 1; transform: translateY(0); }} }}
+"""
+
+SHELL_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title}</title>
+<style>{stylesheet}</style>
+</head>
+<body>
+<div class="bg-glow"></div>
+
+<!-- NAVIGATION -->
+<nav class="flex justify-between items-center p-6 glass-card m-4">
+    <div class="text-2xl font-bold tracking-wider bg-clip-text text-transparent bg-gradient-to-r from-pink-500 to-violet-500">
+        EVENT.AI
+    </div>
+    <button class="btn-neon text-sm">Pre-Register</button>
+</nav>
+
+<!-- DYNAMIC CONTENT FROM AGENT -->
+<main class="container mx-auto px-4 py-8 fade-in">
+"""
+
+SHELL_TAIL = """
+</main>
+
+<!-- FOOTER -->
+<footer class="text-center text-gray-500 py-10 mt-10 border-t border-gray-800">
+    <p>Powered by Agentic Event Intelligence System &copy; 2024</p>
+</footer>
+{extra_styles}</body>
+</html>
 """
 
-def get_glass_styles():
-    return """
-    <script src="https://cdn.tailwindcss.com"></script>
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
-    <link href="https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;700&display=swap" rel="stylesheet">
-    <style>
-        body { font-family: 'Outfit', sans-serif; background-color: #0f172a; color: white; overflow-x: hidden; }
-        
-        /* DYNAMIC BACKGROUND */
-        .bg-glow {
-            position: fixed; top: 0; left: 0; width: 100vw; height: 100vh; z-index: -1;
-            background: 
-                radial-gradient(circle at 15% 50%, rgba(76, 29, 149, 0.4), transparent 25%),
-                radial-gradient(circle at 85% 30%, rgba(236, 72, 153, 0.4), transparent 25%);
-        }
-
-        /* GLASSMORPHISM CARD */
-        .glass-card {
-            background: rgba(255, 255, 255, 0.05);
-            backdrop-filter: blur(16px);
-            -webkit-backdrop-filter: blur(16px);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: 20px;
-            box-shadow: 0 4px 30px rgba(0, 0, 0, 0.1);
-        }
-
-        /* NEON BUTTON */
-        .btn-neon {
-            background: linear-gradient(45deg, #ec4899, #8b5cf6);
-            border: none;
-            color: white;
-            padding: 12px 30px;
-            border-radius: 50px;
-            font-weight: bold;
-            transition: all 0.3s ease;
-            box-shadow: 0 0 15px rgba(236, 72, 153, 0.5);
-        }
-        .btn-neon:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 0 25px rgba(139, 92, 246, 0.7);
-        }
-
-        /* ANIMATIONS */
-        @keyframes float {
-            0% { transform: translateY(0px); }
-            50% { transform: translateY(-10px); }
-            100% { transform: translateY(0px); }
-        }
-        .animate-float { animation: float 6s ease-in-out infinite; }
-        
-        .fade-in { animation: fadeIn 1.5s ease-out; }
-        @keyframes fadeIn { from { opacity: 0; transform: translateY(20px); } to { opacity: 1; transform: translateY(0); } }
-    </style>
+# --- STYLESHEET COMPILER ---
+
+def minify_css(css: str) -> str:
     """
+    Drops comments and the whitespace CSS doesn't need.
+    """
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+def _spacing(value: str) -> Optional[str]:
+    if value == "px":
+        return "1px"
+    if re.fullmatch(r"\d+(\.5)?", value):
+        return f"{float(value) * SPACING_UNIT_REM:g}rem"
+    return None
+
+def _color(name: str) -> Optional[str]:
+    color, _, alpha = name.partition("/")
+    hex_value = COLORS.get(color)
+    if hex_value is None:
+        return None
+    if not alpha:
+        return hex_value
+    r, g, b = (int(hex_value[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({r},{g},{b},{int(alpha) / 100:g})"
+
+SPACING_PROPERTIES = {
+    "p": ["padding"], "px": ["padding-left", "padding-right"], "py": ["padding-top", "padding-bottom"],
+    "pt": ["padding-top"], "pb": ["padding-bottom"], "pl": ["padding-left"], "pr": ["padding-right"],
+    "m": ["margin"], "mx": ["margin-left", "margin-right"], "my": ["margin-top", "margin-bottom"],
+    "mt": ["margin-top"], "mb": ["margin-bottom"], "ml": ["margin-left"], "mr": ["margin-right"],
+    "gap": ["gap"], "gap-x": ["column-gap"], "gap-y": ["row-gap"], "w": ["width"], "h": ["height"],
+}
+
+def utility_rule(name: str) -> Optional[Tuple[str, str]]:
+    """
+    (pseudo-element, declarations) for one Tailwind utility or icon class, or None if unknown.
+    """
+    if name in STATIC_UTILITIES:
+        return "", STATIC_UTILITIES[name]
+    if name.startswith("fa-") and name[3:] in ICON_GLYPHS:
+        return "::before", f'content:"{ICON_GLYPHS[name[3:]]}"'
+    if name.startswith("text-") and name[5:] in FONT_SIZES:
+        size, line_height = FONT_SIZES[name[5:]]
+        return "", f"font-size:{size:g}rem;line-height:{f'{line_height:g}rem' if line_height else '1'}"
+    match = re.fullmatch(r"grid-cols-(\d+)", name)
+    if match:
+        return "", f"grid-template-columns:repeat({match.group(1)},minmax(0,1fr))"
+    match = re.fullmatch(r"col-span-(\d+)", name)
+    if match:
+        return "", f"grid-column:span {match.group(1)}/span {match.group(1)}"
+    match = re.fullmatch(r"duration-(\d+)", name)
+    if match:
+        return "", f"transition-duration:{match.group(1)}ms"
+    match = re.fullmatch(r"opacity-(\d+)", name)
+    if match:
+        return "", f"opacity:{int(match.group(1)) / 100:g}"
+    match = re.fullmatch(r"(p[xytblr]?|m[xytblr]?|gap(?:-[xy])?|w|h)-(.+)", name)
+    if match and match.group(1) in SPACING_PROPERTIES and _spacing(match.group(2)):
+        value = _spacing(match.group(2))
+        return "", ";".join(f"{prop}:{value}" for prop in SPACING_PROPERTIES[match.group(1)])
+    match = re.fullmatch(r"(text|bg|border|from|via|to)-(.+)", name)
+    if match and _color(match.group(2)):
+        kind, value = match.group(1), _color(match.group(2))
+        if kind == "text":
+            return "", f"color:{value}"
+        if kind == "bg":
+            return "", f"background-color:{value}"
+        if kind == "border":
+            return "", f"border-color:{value}"
+        if kind == "from":
+            return "", f"--tw-gradient-from:{value};--tw-gradient-to:rgba(255,255,255,0);--tw-gradient-stops:var(--tw-gradient-from),var(--tw-gradient-to)"
+        if kind == "via":
+            return "", f"--tw-gradient-stops:var(--tw-gradient-from),{value},var(--tw-gradient-to)"
+        return "", f"--tw-gradient-to:{value}"
+    return None
+
+def _selector(class_name: str) -> str:
+    return "." + re.sub(r"([:/.\[\]%])", r"\\\1", class_name)
+
+def build_stylesheet(classes: Iterable[str]) -> str:
+    """
+    Purged utility CSS: one rule per known class in `classes`, base rules
+    first, then hover/focus, then each breakpoint in ascending order
+    (the cascade order Tailwind itself emits).
+    """
+    base, states, media = [], [], {bp: [] for bp in BREAKPOINTS}
+    for class_name in sorted(set(classes)):
+        *variants, utility = class_name.split(":")
+        rule = utility_rule(utility)
+        if rule is None or not rule[1] or any(v not in BREAKPOINTS and v not in STATE_VARIANTS for v in variants):
+            continue
+        pseudo, declarations = rule
+        selector = _selector(class_name) + "".join(STATE_VARIANTS.get(v, "") for v in variants) + pseudo
+        css = f"{selector}{{{declarations}}}"
+        breakpoint = next((v for v in variants if v in BREAKPOINTS), None)
+        if breakpoint:
+            media[breakpoint].append(css)
+        elif any(v in STATE_VARIANTS for v in variants):
+            states.append(css)
+        else:
+            base.append(css)
+    css = "".join(base + states)
+    for breakpoint, rules in media.items():
+        if rules:
+            css += f"@media (min-width:{BREAKPOINTS[breakpoint]}px){{{''.join(rules)}}}"
+    return css
+
+def extract_classes(markup: str) -> Set[str]:
+    classes = set()
+    for match in re.finditer(r"""class\s*=\s*["']([^"']*)["']""", markup):
+        classes.update(match.group(1).split())
+    return classes
+
+def clean_body(content_html: str) -> str:
+    # Remove markdown backticks if the LLM accidentally added them
+    for fence in FENCES:
+        content_html = content_html.replace(fence, "")
+    return content_html
+
+# --- PRECOMPILED SHELL ---
+
+class PageShell:
+    """
+    The static page around the agent's content, compiled once: the head
+    (with the inlined stylesheet) is split around the title, and the tail
+    only varies by the extra styles a given body needs.
+    """
+
+    def __init__(self):
+        # Purge against what the page can contain: the shell itself plus the
+        # vocabulary the marketing prompt asks the model to use
+        vocabulary = extract_classes(SHELL_HEAD + SHELL_TAIL) | set(re.findall(r"[\w:/.-]+", MARKETING_PROMPT))
+        self.classes = {c for c in vocabulary if utility_rule(c.split(":")[-1])}
+        self.stylesheet = minify_css(BASE_CSS) + build_stylesheet(self.classes)
+        self._head_prefix, self._head_suffix = SHELL_HEAD.replace("{stylesheet}", self.stylesheet).split("{title}")
+        self._tail_prefix, self._tail_suffix = SHELL_TAIL.split("{extra_styles}")
+
+    def head(self, title: str) -> str:
+        return self._head_prefix + html.escape(title) + self._head_suffix
+
+    def tail(self, body_html: str = "") -> str:
+        extra = build_stylesheet(c for c in extract_classes(body_html) if c not in self.classes)
+        return self._tail_prefix + (f"<style>{extra}</style>\n" if extra else "") + self._tail_suffix
+
+SHELL = PageShell()
+
+def get_glass_styles() -> str:
+    return f"<style>{SHELL.stylesheet}</style>"
 
 def render_full_page(title: str, body_content: str) -> str:
     """
     Wraps the LLM-generated content in the beautiful template.
     """
-    return f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{title}</title>
-        {get_glass_styles()}
-    </head>
-    <body>
-        <div class="bg-glow"></div>
-        
-        <!-- NAVIGATION -->
-        <nav class="flex justify-between items-center p-6 glass-card m-4">
-            <div class="text-2xl font-bold tracking-wider bg-clip-text text-transparent bg-gradient-to-r from-pink-500 to-violet-500">
-                EVENT.AI
-            </div>
-            <button class="btn-neon text-sm">Pre-Register</button>
-        </nav>
-
-        <!-- DYNAMIC CONTENT FROM AGENT -->
-        <main class="container mx-auto px-4 py-8 fade-in">
-            {body_content}
-        </main>
-
-        <!-- FOOTER -->
-        <footer class="text-center text-gray-500 py-10 mt-10 border-t border-gray-800">
-            <p>Powered by Agentic Event Intelligence System &copy; 2024</p>
-        </footer>
-    </body>
-    </html>
-    """
\ No newline at end of file
+    return SHELL.head(title) + body_content + SHELL.tail(body_content)
+
+class PageAssembler:
+    """
+    Builds the page while the marketing agent is still writing it.
+    feed() takes raw model tokens and returns the HTML that is safe to emit
+    (a trailing partial ``` fence is held back until it resolves);
+    snapshot() is the whole page so far, closed, for live previews.
+    """
+
+    def __init__(self, title: str):
+        self.title = title
+        self._body: List[str] = []
+        self._held = ""
+
+    def _partial_fence(self, text: str) -> int:
+        for n in range(min(len(text), len(FENCES[0]) - 1), 0, -1):
+            if FENCES[0].startswith(text[-n:]):
+                return n
+        return 0
+
+    def head(self) -> str:
+        return SHELL.head(self.title)
+
+    def feed(self, text: str) -> str:
+        pending = self._held + text
+        hold = self._partial_fence(pending)
+        self._held = pending[len(pending) - hold:] if hold else ""
+        ready = clean_body(pending[:len(pending) - hold])
+        self._body.append(ready)
+        return ready
+
+    def close(self) -> str:
+        """
+        Flushes anything held back and returns the tail.
+        """
+        rest = clean_body(self._held)
+        self._held = ""
+        self._body.append(rest)
+        return rest + SHELL.tail(self.body)
+
+    @property
+    def body(self) -> str:
+        return "".join(self._body)
+
+    def snapshot(self) -> str:
+        body = self.body
+        return SHELL.head(self.title) + body + SHELL.tail(body)
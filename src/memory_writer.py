@@ -0,0 +1,256 @@
+"""
+Write-behind queue for feedback memories.
+add_memory_log() used to embed, write and then run a similarity search on
+the caller's thread, twice paying an embedding round-trip per entry. Now it
+appends the entry to a local journal (fsync'd, so it survives a crash) and
+returns. A background thread batches queued entries, skips IDs the
+collection already holds, embeds the rest in one call, upserts them, and
+confirms the write by reading the IDs back. Committed entries are then
+compacted out of the journal. On startup, leftover journal lines are
+replayed.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from typing import Any, Dict, List, Optional
+
+import src.rag as rag
+from src.embedding_cache import uncached
+
+# --- CONFIGURATION ---
+MEMORY_JOURNAL_FILENAME = "memory_journal.jsonl"
+MEMORY_BATCH_SIZE = 32
+MEMORY_FLUSH_INTERVAL_SECONDS = 0.5   # how long the writer waits to fill a batch
+MEMORY_RETRY_SECONDS = 5.0            # back-off after a failed commit (e.g. Ollama down)
+
+def memory_content(entry: Dict[str, Any]) -> str:
+    # Same text the synchronous add_memory_log used to store
+    return f"""
+    EVENT ID: {entry['event_name'].upper()}
+    Type: {entry.get('event_type') or "User Feedback"}
+    Outcome: {entry['outcome']}
+    Description: {entry['description']}
+    Lesson Learned: {entry['lesson_learned']}
+    """
+
+def memory_id(entry: Dict[str, Any]) -> str:
+    # Deterministic, so replaying the journal after a crash is idempotent
+    return rag.generate_doc_id(memory_content(entry))
+
+class MemoryWriter:
+    """
+    Journal + background committer. submit() is cheap and durable; flush()
+    blocks until everything submitted so far is in the vector store.
+    """
+
+    def __init__(self, journal_path: Optional[str] = None, batch_size: int = MEMORY_BATCH_SIZE,
+                 flush_interval: float = MEMORY_FLUSH_INTERVAL_SECONDS):
+        self.journal_path = journal_path or os.path.join(rag.DB_PATH, MEMORY_JOURNAL_FILENAME)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.committed = 0
+        self.failed_attempts = 0
+        self.last_error: Optional[str] = None
+        self._pending: Dict[str, Dict[str, Any]] = {}   # id -> entry, in submission order
+        self._in_flight = 0
+        self._flushing = 0
+        self._journal_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        self._pending.update(self._read_journal())
+        if self._pending:
+            print(f"📒 Replaying {len(self._pending)} journaled memories")
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    # --- journal ---
+
+    def _read_journal(self) -> Dict[str, Dict[str, Any]]:
+        entries = {}
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # half-written last line from a crash
+                    entries[record["id"]] = record["entry"]
+        except OSError:
+            pass
+        return entries
+
+    def _append_journal(self, doc_id: str, entry: Dict[str, Any]):
+        with self._journal_lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"id": doc_id, "entry": entry}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _compact_journal(self, committed_ids: set):
+        """
+        Drops committed entries from the journal (atomic rewrite).
+        """
+        with self._journal_lock:
+            remaining = {i: e for i, e in self._read_journal().items() if i not in committed_ids}
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for doc_id, entry in remaining.items():
+                    f.write(json.dumps({"id": doc_id, "entry": entry}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    # --- public API ---
+
+    def submit(self, entry: Dict[str, Any]) -> str:
+        """
+        Journals one entry and queues it. Returns its document ID.
+        """
+        doc_id = memory_id(entry)
+        self._append_journal(doc_id, entry)
+        with self._cond:
+            self._pending[doc_id] = entry
+            self._cond.notify_all()
+        return doc_id
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until every submitted entry is committed. False on timeout
+        (entries stay journaled and keep retrying in the background).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._in_flight:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": len(self._pending) + self._in_flight,
+                "committed": self.committed,
+                "failed_attempts": self.failed_attempts,
+                "last_error": self.last_error,
+            }
+
+    def close(self, timeout: float = 5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # --- background commit ---
+
+    def _take_batch(self) -> List[tuple]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return []
+            # Give a burst of feedback a moment to pile up into one batch (flush() cuts it short)
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._pending) < self.batch_size and not self._flushing and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = list(self._pending.items())[:self.batch_size]
+            for doc_id, _ in batch:
+                del self._pending[doc_id]
+            self._in_flight = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            try:
+                self._commit(batch)
+                with self._cond:
+                    self.committed += len(batch)
+                    self.last_error = None
+            except Exception as e:
+                print(f"   ❌ Memory write failed ({len(batch)} queued, retrying in {MEMORY_RETRY_SECONDS:.0f}s): {e}")
+                with self._cond:
+                    self.failed_attempts += 1
+                    self.last_error = str(e)
+                    # Back to the front of the queue; they are still in the journal
+                    self._pending = {**dict(batch), **self._pending}
+                    self._in_flight = 0
+                    self._cond.notify_all()
+                    self._cond.wait(MEMORY_RETRY_SECONDS)
+                continue
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _commit(self, batch: List[tuple]):
+        db = rag.get_vectorstore()
+        ids = [doc_id for doc_id, _ in batch]
+        # Real existence check: which of THESE ids are already stored (e.g. journal replay)
+        existing = set(db.get(ids=ids, include=[])["ids"])
+        todo = [(doc_id, entry) for doc_id, entry in batch if doc_id not in existing]
+
+        if todo:
+            contents = [memory_content(entry) for _, entry in todo]
+            metadatas = [{
+                "category": "memory",
+                "source_file": "user_feedback_log.txt",
+                "timestamp": entry["logged_at"],
+            } for _, entry in todo]
+            vectors = uncached(db.embeddings).embed_documents(contents)   # one bulk call, bypassing the query cache
+            db._collection.upsert(ids=[i for i, _ in todo], embeddings=vectors, documents=contents, metadatas=metadatas)
+
+            stored = set(db.get(ids=[i for i, _ in todo], include=[])["ids"])
+            missing = [i for i, _ in todo if i not in stored]
+            if missing:
+                raise RuntimeError(f"{len(missing)} memories not found after upsert")
+
+            lexical = rag.get_lexical_index()
+            lexical.add([i for i, _ in todo], contents, metadatas)
+            lexical.save()
+            rag._bump_feedback_revision()
+
+            from src.incident_store import get_incident_store
+            get_incident_store().add_many([{
+                "event_id": entry["event_name"].upper(),
+                "event_type": entry.get("event_type"),
+                "outcome": entry["outcome"],
+                "attendees": entry.get("attendees"),
+                "is_outdoors": entry.get("is_outdoors"),
+                "venue": entry.get("venue"),
+                "description": entry["description"],
+                "lesson": entry["lesson_learned"],
+                "occurred_at": entry.get("occurred_at"),   # when the event happened, if known (logged_at is when feedback came in)
+                "source_file": "user_feedback_log.txt",    # not a knowledge base file, so ingestion never drops it
+            } for _, entry in todo], embed=False)
+
+        self._compact_journal(set(ids))
+        print(f"✅ {len(todo)} memories committed ({len(batch) - len(todo)} already stored)")
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_memory_writer() -> MemoryWriter:
+    """
+    Process-wide writer (one journal, one background thread).
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MemoryWriter()
+            atexit.register(_writer.close)
+        return _writer
@@ -0,0 +1,520 @@
+"""
+Compact vector store: quantized embeddings in memory-mapped .npy files.
+An alternative to the Chroma PersistentClient for read-heavy deployments
+(select it with VECTOR_BACKEND=mmap). Every Streamlit worker maps the same
+read-only files, so the vectors live once in the OS page cache instead of
+once per process, and opening the store is a few stats + JSON loads.
+
+Layout of the index directory:
+    segments/<name>/vectors.npy    (n, dim) int8 or float16, unit-normalized before quantizing
+    segments/<name>/scales.npy     (n,) float32 per-row dequantization scale (int8 only)
+    segments/<name>/docs.json      ids, documents, metadatas of the segment's rows
+    generations/<number>.json      segment names (oldest first), deleted ids, dtype, dim
+    CURRENT                        number of the live generation
+
+Segments are immutable. A write adds one segment holding only its own rows
+(ingesting N batches writes each row once, not the whole index per batch)
+and publishes a new generation: a row is live when no later segment has the
+same id and the id isn't deleted. When MERGE_FACTOR segments of the same
+size tier pile up at the tail they are merged (each row is rewritten
+O(log n) times), and once COMPACT_DEAD_FRACTION of the stored rows are
+shadowed or deleted everything is rewritten into one segment.
+
+Publishing is atomic: a segment is written to a temp directory and renamed,
+the generation file is complete before CURRENT is switched with os.replace,
+and readers work from one snapshot (generation) per call, so vectors and
+metadata always come from the same generation.
+
+Search is brute-force cosine: the metadata filter becomes a boolean mask
+(vectorized per field), the surviving rows are scored in blocks and the
+top-k is taken with argpartition.
+"""
+import os
+import json
+import math
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+# --- CONFIGURATION ---
+MMAP_DTYPES = ("int8", "float16")
+SEARCH_BLOCK_ROWS = 2048      # rows dequantized per matmul (keeps the float32 copy cache-sized)
+MERGE_FACTOR = 8              # same-tier segments at the tail that get merged into one
+COMPACT_DEAD_FRACTION = 0.3   # full rewrite once this share of stored rows is shadowed/deleted
+KEEP_GENERATIONS = 2          # older generations (and segments only they use) are deleted
+SEGMENTS_DIRNAME = "segments"
+GENERATIONS_DIRNAME = "generations"
+CURRENT_FILENAME = "CURRENT"
+LOCK_FILENAME = "LOCK"
+VECTORS_FILENAME = "vectors.npy"
+SCALES_FILENAME = "scales.npy"
+DOCS_FILENAME = "docs.json"
+LEGACY_SIDECAR_FILENAME = "sidecar.json"   # single-file layout of earlier versions (migrated on open)
+
+def quantize(vectors: np.ndarray, dtype: str):
+    """
+    Unit-normalizes rows, then stores them as int8 (with a per-row scale) or float16.
+    Returns (quantized, scales); scales is None for float16.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    peak = np.abs(vectors).max(axis=1)
+    scales = np.where(peak == 0, 1.0, peak / 127.0).astype(np.float32)
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales
+
+class _Segment:
+    """
+    One immutable batch of rows: vectors mapped read-only, documents and metadata in memory.
+    """
+
+    def __init__(self, path: str):
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, DOCS_FILENAME), "r", encoding="utf-8") as f:
+            docs = json.load(f)
+        self.ids, self.documents, self.metadatas = docs["ids"], docs["documents"], docs["metadatas"]
+        self.vectors = np.load(os.path.join(path, VECTORS_FILENAME), mmap_mode="r")
+        scales_path = os.path.join(path, SCALES_FILENAME)
+        self.scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def column(self, field: str) -> np.ndarray:
+        # One object array per filtered field, built once per segment
+        if field not in self._columns:
+            self._columns[field] = np.array([m.get(field) for m in self.metadatas], dtype=object)
+        return self._columns[field]
+
+class _Snapshot:
+    """
+    One generation: its segments, which of their rows are live, and where each
+    live id is. Never modified after it is built, so a reader holding it sees
+    vectors and metadata from the same generation.
+    """
+
+    def __init__(self, generation: int, segments: List[_Segment], deleted: Set[str], dtype: str, dim: int,
+                 positions: Dict[str, Tuple[int, int]], live: List[np.ndarray]):
+        self.generation, self.segments, self.deleted, self.dtype, self.dim = generation, segments, deleted, dtype, dim
+        self.positions, self.live = positions, live
+        self.live_count = len(positions)
+        self.stored_count = sum(len(segment) for segment in segments)
+
+    @classmethod
+    def empty(cls, dtype: str) -> "_Snapshot":
+        return cls(0, [], set(), dtype, 0, {}, [])
+
+    @classmethod
+    def build(cls, generation: int, segments: List[_Segment], deleted: Set[str], dtype: str, dim: int,
+              base: Optional["_Snapshot"] = None) -> "_Snapshot":
+        """
+        Resolves liveness. When `base` is an earlier generation whose segments
+        are a prefix of these (appends and deletes since), only the new rows
+        and deletions are applied; otherwise every segment is scanned.
+        """
+        names = [segment.name for segment in segments]
+        appended = segments[len(base.segments):] if base is not None else []
+        incremental = base is not None and names[:len(base.segments)] == [s.name for s in base.segments]
+        if incremental:
+            # Ids dropped from `deleted` must have been re-added by an appended segment
+            readded = base.deleted - deleted
+            incremental = not readded or readded <= {doc_id for segment in appended for doc_id in segment.ids}
+
+        if not incremental:
+            positions, live = {}, []
+            for si, segment in enumerate(segments):
+                live.append(np.zeros(len(segment), dtype=bool))
+                for row, doc_id in enumerate(segment.ids):
+                    positions[doc_id] = (si, row)
+            for doc_id in deleted:
+                positions.pop(doc_id, None)
+            for si, row in positions.values():
+                live[si][row] = True
+            return cls(generation, segments, deleted, dtype, dim, positions, live)
+
+        # Copy-on-write: only the liveness arrays of segments that lose a row are copied
+        positions, live, copied = base.positions.copy(), list(base.live), set()
+        def kill(doc_id: str):
+            location = positions.pop(doc_id, None)
+            if location is not None:
+                si, row = location
+                if si not in copied:
+                    live[si] = live[si].copy()
+                    copied.add(si)
+                live[si][row] = False
+        for doc_id in deleted - base.deleted:
+            kill(doc_id)
+        for si in range(len(base.segments), len(segments)):
+            live.append(np.ones(len(segments[si]), dtype=bool))
+            copied.add(si)
+            for row, doc_id in enumerate(segments[si].ids):
+                kill(doc_id)
+                positions[doc_id] = (si, row)
+        return cls(generation, segments, deleted, dtype, dim, positions, live)
+
+class MmapVectorStore:
+    """
+    Implements the subset of the LangChain Chroma wrapper that src/rag.py and
+    src/memory_writer.py use (embeddings, get, delete, similarity_search*,
+    add_documents, and `_collection.upsert/count`), so the rest of the code
+    doesn't care which backend it has.
+    """
+
+    def __init__(self, path: str, embedding_function=None, dtype: str = "int8"):
+        if dtype not in MMAP_DTYPES:
+            raise ValueError(f"Unknown mmap dtype '{dtype}' (expected one of {MMAP_DTYPES})")
+        self.path = path
+        self.embeddings = embedding_function
+        self.dtype = dtype
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._snap: Optional[_Snapshot] = None
+        self._current_key = None
+        self._segments: Dict[str, _Segment] = {}
+        os.makedirs(os.path.join(path, SEGMENTS_DIRNAME), exist_ok=True)
+        os.makedirs(os.path.join(path, GENERATIONS_DIRNAME), exist_ok=True)
+        if os.path.exists(os.path.join(path, LEGACY_SIDECAR_FILENAME)):
+            self._migrate_legacy()
+
+    @property
+    def _collection(self):
+        # Chroma-compatible alias: rag's bulk paths call db._collection.upsert()/count()
+        return self
+
+    # --- paths ---
+
+    def _current_path(self) -> str:
+        return os.path.join(self.path, CURRENT_FILENAME)
+
+    def _generation_path(self, generation: int) -> str:
+        return os.path.join(self.path, GENERATIONS_DIRNAME, f"{generation:010d}.json")
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.path, SEGMENTS_DIRNAME, name)
+
+    # --- reading ---
+
+    def _segment(self, name: str) -> _Segment:
+        segment = self._segments.get(name)
+        if segment is None:
+            segment = self._segments[name] = _Segment(self._segment_path(name))
+        return segment
+
+    def _open(self, key) -> _Snapshot:
+        if key is None:
+            return _Snapshot.empty(self.dtype)
+        with open(self._current_path(), "r", encoding="utf-8") as f:
+            generation = int(f.read().strip())
+        with open(self._generation_path(generation), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        segments = [self._segment(name) for name in meta["segments"]]
+        self._segments = {segment.name: segment for segment in segments}
+        return _Snapshot.build(generation, segments, set(meta["deleted"]), meta["dtype"], meta["dim"], base=self._snap)
+
+    def _snapshot(self) -> _Snapshot:
+        """
+        The current generation; reopened only when CURRENT was switched (by any process).
+        """
+        for attempt in range(3):
+            try:
+                st = os.stat(self._current_path())
+                key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                key = None
+            snap = self._snap
+            if snap is not None and key == self._current_key:
+                return snap
+            with self._read_lock:
+                if self._snap is not None and key == self._current_key:
+                    return self._snap
+                try:
+                    snap = self._open(key)
+                except FileNotFoundError:
+                    # A writer retired the generation we were opening: read CURRENT again
+                    if attempt == 2:
+                        raise
+                    continue
+                self._snap, self._current_key = snap, key
+                return snap
+
+    # --- writing ---
+
+    @contextmanager
+    def _locked(self):
+        # One writer at a time: threads via the lock, processes via flock (where available)
+        with self._write_lock:
+            with open(os.path.join(self.path, LOCK_FILENAME), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _write_segment(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+                       vectors: np.ndarray, scales: Optional[np.ndarray]) -> _Segment:
+        name = f"{time.time_ns():020d}-{os.getpid()}"
+        final_path = self._segment_path(name)
+        tmp_path = f"{final_path}.tmp"
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, VECTORS_FILENAME), vectors)
+        if scales is not None:
+            np.save(os.path.join(tmp_path, SCALES_FILENAME), scales)
+        with open(os.path.join(tmp_path, DOCS_FILENAME), "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f)
+        os.rename(tmp_path, final_path)
+        return self._segment(name)
+
+    def _merge(self, segments: List[_Segment], live: Dict[str, np.ndarray]) -> Optional[_Segment]:
+        """
+        One segment with the live rows of `segments` (in order), or None if none are live.
+        Quantized rows are copied as they are.
+        """
+        ids, documents, metadatas, vectors, scales = [], [], [], [], []
+        for segment in segments:
+            rows = np.flatnonzero(live[segment.name])
+            if not len(rows):
+                continue
+            ids += [segment.ids[i] for i in rows]
+            documents += [segment.documents[i] for i in rows]
+            metadatas += [segment.metadatas[i] for i in rows]
+            vectors.append(np.asarray(segment.vectors[rows]))
+            if segment.scales is not None:
+                scales.append(np.asarray(segment.scales[rows]))
+        if not ids:
+            return None
+        return self._write_segment(ids, documents, metadatas, np.concatenate(vectors), np.concatenate(scales) if scales else None)
+
+    def _commit(self, snap: _Snapshot, segments: List[_Segment], deleted: Set[str], dtype: str, dim: int):
+        """
+        Merges the tail / compacts if due, then publishes the result as the next generation.
+        """
+        staged = _Snapshot.build(snap.generation, segments, deleted, dtype, dim, base=snap)
+        # Merging moves live rows but never changes which ids are live
+        live = {segment.name: alive for segment, alive in zip(staged.segments, staged.live)}
+
+        if staged.stored_count and staged.live_count < (1 - COMPACT_DEAD_FRACTION) * staged.stored_count:
+            merged = self._merge(segments, live)
+            segments, deleted = ([merged] if merged else []), set()
+        else:
+            tier = lambda segment: int(math.log(max(len(segment), 1), MERGE_FACTOR))
+            while True:
+                run = 1
+                while run < len(segments) and tier(segments[-1 - run]) == tier(segments[-1]):
+                    run += 1
+                if run < MERGE_FACTOR:
+                    break
+                merged = self._merge(segments[-run:], live)
+                segments = segments[:-run] + ([merged] if merged else [])
+                if merged is None or len(segments) < MERGE_FACTOR:
+                    break
+                live[merged.name] = np.ones(len(merged), dtype=bool)
+
+        self._publish(snap.generation + 1, segments, deleted, dtype, dim)
+
+    def _publish(self, generation: int, segments: List[_Segment], deleted: Set[str], dtype: str, dim: int):
+        def _write_json(path: str, payload: Any):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, path)
+
+        _write_json(self._generation_path(generation),
+                    {"segments": [segment.name for segment in segments], "deleted": sorted(deleted), "dtype": dtype, "dim": dim})
+        _write_json(self._current_path(), generation)   # the switch readers see
+        self._retire(generation)
+
+    def _retire(self, generation: int):
+        """
+        Deletes generations older than KEEP_GENERATIONS and the segments only they used
+        (plus temp files of writers that crashed). Called with the write lock held.
+        """
+        generations_dir = os.path.join(self.path, GENERATIONS_DIRNAME)
+        referenced = set()
+        for filename in os.listdir(generations_dir):
+            path = os.path.join(generations_dir, filename)
+            if not filename.endswith(".json") or int(filename[:-5]) <= generation - KEEP_GENERATIONS:
+                os.remove(path)
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                referenced.update(json.load(f)["segments"])
+        segments_dir = os.path.join(self.path, SEGMENTS_DIRNAME)
+        for name in os.listdir(segments_dir):
+            if name not in referenced:
+                # Readers that still map these files keep them until they unmap (POSIX)
+                shutil.rmtree(os.path.join(segments_dir, name), ignore_errors=True)
+
+    def _migrate_legacy(self):
+        # vectors.npy / scales.npy / sidecar.json at the top level -> one segment
+        with self._locked():
+            sidecar_path = os.path.join(self.path, LEGACY_SIDECAR_FILENAME)
+            if not os.path.exists(sidecar_path):
+                return
+            if not os.path.exists(self._current_path()):
+                with open(sidecar_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                segments = []
+                if state["ids"]:
+                    vectors = np.load(os.path.join(self.path, VECTORS_FILENAME))
+                    scales = np.load(os.path.join(self.path, SCALES_FILENAME)) if state["dtype"] == "int8" else None
+                    segments = [self._write_segment(state["ids"], state["documents"], state["metadatas"], vectors, scales)]
+                self._publish(1, segments, set(), state["dtype"], state["dim"])
+            for filename in (LEGACY_SIDECAR_FILENAME, VECTORS_FILENAME, SCALES_FILENAME):
+                path = os.path.join(self.path, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict[str, Any]]):
+        if not ids:
+            return
+        with self._locked():
+            snap = self._snapshot()
+            dtype = snap.dtype if snap.stored_count else self.dtype
+            vectors, scales = quantize(embeddings, dtype)
+            if snap.stored_count and vectors.shape[1] != snap.dim:
+                raise ValueError(f"Embedding size {vectors.shape[1]} doesn't match the index ({snap.dim})")
+            added = self._write_segment(list(ids), list(documents), [dict(m or {}) for m in metadatas], vectors, scales)
+            self._commit(snap, snap.segments + [added], snap.deleted - set(ids), dtype, int(vectors.shape[1]))
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> List[str]:
+        contents = [doc.page_content for doc in documents]
+        self.upsert(ids, self.embeddings.embed_documents(contents), contents, [doc.metadata for doc in documents])
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None):
+        with self._locked():
+            snap = self._snapshot()
+            drop = {doc_id for doc_id in (ids or []) if doc_id in snap.positions}
+            if not drop:
+                return
+            self._commit(snap, snap.segments, snap.deleted | drop, snap.dtype, snap.dim)
+
+    def compact(self):
+        """
+        Rewrites every live row into one segment (drops shadowed and deleted rows).
+        """
+        with self._locked():
+            snap = self._snapshot()
+            live = {segment.name: alive for segment, alive in zip(snap.segments, snap.live)}
+            merged = self._merge(snap.segments, live)
+            self._publish(snap.generation + 1, [merged] if merged else [], set(), snap.dtype, snap.dim)
+
+    def reset(self):
+        with self._locked():
+            for dirname in (SEGMENTS_DIRNAME, GENERATIONS_DIRNAME):
+                shutil.rmtree(os.path.join(self.path, dirname), ignore_errors=True)
+                os.makedirs(os.path.join(self.path, dirname), exist_ok=True)
+            for filename in (CURRENT_FILENAME, LEGACY_SIDECAR_FILENAME, VECTORS_FILENAME, SCALES_FILENAME):
+                path = os.path.join(self.path, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+            self._snap, self._current_key, self._segments = None, None, {}
+
+    # --- reads ---
+
+    def count(self) -> int:
+        return self._snapshot().live_count
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snapshot()
+        return {"generation": snap.generation, "segments": len(snap.segments), "live_rows": snap.live_count, "stored_rows": snap.stored_count}
+
+    def _mask(self, segment: _Segment, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Chroma `where` syntax (equality, $eq, $ne, $in, $and, $or) as a boolean row mask.
+        """
+        mask = np.ones(len(segment), dtype=bool)
+        for key, condition in (filters or {}).items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._mask(segment, sub)
+            elif key == "$or":
+                mask &= np.logical_or.reduce([self._mask(segment, sub) for sub in condition]) if condition else False
+            else:
+                column = segment.column(key)
+                if isinstance(condition, dict):
+                    for op, value in condition.items():
+                        if op == "$eq":
+                            mask &= column == value
+                        elif op == "$ne":
+                            mask &= column != value
+                        elif op == "$in":
+                            mask &= np.isin(column, list(value))
+                        else:
+                            raise ValueError(f"Unsupported filter operator: {op}")
+                else:
+                    mask &= column == condition
+        return mask
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        snap = self._snapshot()
+        if ids is not None:
+            locations = [snap.positions[doc_id] for doc_id in ids if doc_id in snap.positions]
+        else:
+            locations = [(si, int(row)) for si, segment in enumerate(snap.segments)
+                         for row in np.flatnonzero(snap.live[si] & self._mask(segment, where))]
+        include = ["documents", "metadatas"] if include is None else include
+        return {
+            "ids": [snap.segments[si].ids[row] for si, row in locations],
+            "documents": [snap.segments[si].documents[row] for si, row in locations] if "documents" in include else None,
+            "metadatas": [snap.segments[si].metadatas[row] for si, row in locations] if "metadatas" in include else None,
+        }
+
+    def _search(self, snap: _Snapshot, vector: List[float], k: int, filters: Optional[Dict[str, Any]]) -> List[Tuple[int, int, float]]:
+        """
+        [(segment index, row, cosine similarity)] best first, over live rows matching `filters`.
+        """
+        if not snap.live_count or k <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        hits_segment, hits_row, hits_score = [], [], []
+        for si, segment in enumerate(snap.segments):
+            mask = snap.live[si] & self._mask(segment, filters) if filters else snap.live[si]
+            rows = None if mask.all() else np.flatnonzero(mask)
+            n = len(segment) if rows is None else len(rows)
+            if n == 0:
+                continue
+            scores = np.empty(n, dtype=np.float32)
+            for start in range(0, n, SEARCH_BLOCK_ROWS):
+                block = slice(start, min(start + SEARCH_BLOCK_ROWS, n))
+                index = block if rows is None else rows[block]
+                scores[block] = segment.vectors[index].astype(np.float32) @ query
+                if segment.scales is not None:
+                    scores[block] *= segment.scales[index]
+            top = np.argpartition(-scores, min(k, n) - 1)[:k]
+            hits_segment.append(np.full(len(top), si))
+            hits_row.append(top if rows is None else rows[top])
+            hits_score.append(scores[top])
+
+        if not hits_score:
+            return []
+        segments, rows, scores = np.concatenate(hits_segment), np.concatenate(hits_row), np.concatenate(hits_score)
+        best = np.argsort(-scores)[:k]
+        return [(int(segments[i]), int(rows[i]), float(scores[i])) for i in best]
+
+    def search(self, vector: List[float], k: int = 4, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """
+        [(id, cosine similarity)] best first, only over rows matching `filters`.
+        """
+        snap = self._snapshot()
+        return [(snap.segments[si].ids[row], score) for si, row, score in self._search(snap, vector, k, filters)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        snap = self._snapshot()
+        return [Document(id=snap.segments[si].ids[row], page_content=snap.segments[si].documents[row], metadata=snap.segments[si].metadatas[row])
+                for si, row, _ in self._search(snap, embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k, filter=filter)
@@ -0,0 +1,174 @@
+"""
+Deterministic stand-in for the Ollama chat models.
+Recognises which agent is calling from the prompt and returns canned JSON
+(or HTML for the marketing agent) derived from the event name, with a
+configurable time-to-first-token and generation speed. Use it to benchmark
+orchestration overhead or run the graph without a live Ollama:
+
+    LLM_BACKEND=mock streamlit run main.py
+"""
+import re
+import json
+import time
+import asyncio
+import hashlib
+from typing import Any, Dict, Iterator, AsyncIterator, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# --- CONFIGURATION ---
+MOCK_LATENCY_SECONDS = 0.05      # time to first token
+MOCK_TOKENS_PER_SECOND = 200.0   # 0 = the whole response arrives instantly
+CHARS_PER_TOKEN = 4
+
+_OUTDOOR_WORDS = ["lawn", "quad", "rooftop", "outdoor", "park", "field", "carnival", "festival"]
+_TAGS_BY_WORD = {
+    "rooftop": "rooftop safety", "fireworks": "pyrotechnics", "rave": "late night noise", "midnight": "late night noise",
+    "overnight": "overnight supervision", "pizza": "food safety", "food": "food safety", "hackathon": "wifi bandwidth",
+    "lawn": "lawn protection", "carnival": "outdoor weather", "band": "amplified sound", "alcohol": "alcohol service",
+}
+
+def _event_name(prompt: str) -> str:
+    match = re.search(r'(?:event name: |Event Name is: )"(.*?)"', prompt)
+    return match.group(1) if match else prompt[:80]
+
+def _event_details(name: str) -> Dict[str, Any]:
+    lowered = name.lower()
+    digest = int(hashlib.md5(name.encode()).hexdigest(), 16)
+    attendees = re.search(r"(\d[\d,]*)\s*(?:people|students|members|guests|attendees)", lowered)
+    return {
+        "type": ["Social", "Academic", "Fundraiser", "Performance", "Workshop"][digest % 5],
+        "estimated_attendees": int(attendees.group(1).replace(",", "")) if attendees else 50 + digest % 450,
+        "is_outdoors": any(word in lowered for word in _OUTDOOR_WORDS),
+        "duration_hours": 1 + digest % 6,
+        "vibes": ["formal", "casual", "energetic", "professional"][(digest >> 8) % 4],
+        "venue_requirements": ["stage", "open space"] if digest % 2 else ["projector", "tables"],
+    }
+
+def _queries(name: str) -> List[str]:
+    lowered = name.lower()
+    tags = [tag for word, tag in _TAGS_BY_WORD.items() if word in lowered]
+    tags += ["crowd control", "fire exits", "event capacity"]
+    return list(dict.fromkeys(tags))[:5]
+
+def _queries_from_details(prompt: str) -> List[str]:
+    # The classification prompt only carries the inferred profile, not the name
+    match = re.search(r"event details: (\{.*?\})\n", prompt)
+    details = json.loads(match.group(1)) if match else {}
+    tags = [f"{str(details.get('type', 'campus')).lower()} event"]
+    tags.append("outdoor weather" if details.get("is_outdoors") else "indoor room capacity")
+    if details.get("estimated_attendees", 0) > 100:
+        tags += ["crowd control", "fire exits"]
+    if details.get("vibes") == "energetic":
+        tags.append("late night noise")
+    return tags
+
+def canned_response(prompt: str) -> str:
+    """
+    The reply each agent would get, keyed off its prompt template.
+    """
+    if "Step 2:" in prompt:
+        name = _event_name(prompt)
+        return json.dumps({"event_details": _event_details(name), "queries": _queries(name)})
+    if "semantic search tags" in prompt:
+        return json.dumps({"queries": _queries_from_details(prompt)})
+    if "Risk Officer" in prompt:
+        digest = int(hashlib.md5(prompt.encode()).hexdigest(), 16)
+        score = digest % 101
+        level = "Low" if score <= 20 else "Medium" if score <= 60 else "High"
+        return json.dumps({
+            "score": score,
+            "level": level,
+            "reasoning": "Mock assessment: capacity and noise rules were checked against the retrieved SOPs and past incidents.",
+            "mitigation_plan": "Confirm fire exits and a rain plan with Facilities before the event.",
+        })
+    if "Content Designer" in prompt:
+        name = _event_name(prompt)
+        cards = "".join(
+            f'<div class="glass-card p-8"><i class="fas fa-{icon} text-4xl mb-4 text-pink-500"></i><h3 class="text-2xl font-bold">{title}</h3><p>Join us for {title.lower()}.</p></div>'
+            for icon, title in (("music", "Great Vibes"), ("users", "Community"), ("star", "Memories"))
+        )
+        return (f'<section class="text-center py-20"><h1 class="text-6xl font-bold mb-4">{name}</h1>'
+                f'<p class="text-xl text-gray-300 mb-8">The campus event you do not want to miss.</p></section>'
+                f'<div class="grid grid-cols-1 md:grid-cols-3 gap-8 my-16">{cards}</div>'
+                f'<div class="text-center"><div class="glass-card inline-block px-10 py-6">Friday · 7 PM · Student Union</div></div>')
+    return json.dumps(_event_details(_event_name(prompt)))
+
+class MockChatModel(BaseChatModel):
+    """
+    Chat model that answers from canned_response() after a simulated delay:
+    latency_seconds before the first token, then tokens_per_second.
+    """
+    model: str = "mock"
+    latency_seconds: float = MOCK_LATENCY_SECONDS
+    tokens_per_second: float = MOCK_TOKENS_PER_SECOND
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+
+    def _reply(self, messages: List[BaseMessage]):
+        prompt = "\n".join(str(m.content) for m in messages)
+        text = canned_response(prompt)
+        usage = {
+            "input_tokens": len(prompt) // CHARS_PER_TOKEN,
+            "output_tokens": len(text) // CHARS_PER_TOKEN,
+            "total_tokens": (len(prompt) + len(text)) // CHARS_PER_TOKEN,
+        }
+        return text, usage
+
+    def _generation_seconds(self, text: str) -> float:
+        if not self.tokens_per_second:
+            return self.latency_seconds
+        return self.latency_seconds + len(text) / CHARS_PER_TOKEN / self.tokens_per_second
+
+    def _pieces(self, text: str) -> List[str]:
+        return [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text, usage = self._reply(messages)
+        time.sleep(self._generation_seconds(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        text, usage = self._reply(messages)
+        await asyncio.sleep(self._generation_seconds(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        text, usage = self._reply(messages)
+        time.sleep(self.latency_seconds)
+        pieces = self._pieces(text)
+        for i, piece in enumerate(pieces):
+            time.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage if i == len(pieces) - 1 else None))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        text, usage = self._reply(messages)
+        await asyncio.sleep(self.latency_seconds)
+        pieces = self._pieces(text)
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage if i == len(pieces) - 1 else None))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+def mock_llms(latency_seconds: float = MOCK_LATENCY_SECONDS, tokens_per_second: float = MOCK_TOKENS_PER_SECOND) -> Dict[str, MockChatModel]:
+    """
+    The three clients agents.py needs, all backed by the mock.
+    """
+    settings = {"latency_seconds": latency_seconds, "tokens_per_second": tokens_per_second}
+    return {
+        "llm": MockChatModel(model="mock-json", **settings),
+        "creative_llm": MockChatModel(model="mock-creative", **settings),
+        "profile_llm": MockChatModel(model="mock-profile", **settings),
+    }
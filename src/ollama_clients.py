@@ -0,0 +1,112 @@
+"""
+Shared Ollama client layer.
+Every model the app talks to (JSON agents, creative agent, embedder) is built
+here with a pooled HTTP client and a long keep_alive, so requests reuse open
+connections and Ollama keeps the weights loaded between analyses. At boot,
+warm_models() loads all of them in parallel with a tiny request and records
+readiness for the sidebar.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+import httpx
+from langchain_ollama import ChatOllama, OllamaEmbeddings
+
+# --- CONFIGURATION ---
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_HOST")  # None = ollama's default (localhost:11434)
+# Seconds Ollama keeps a model loaded after a request (-1 = forever)
+OLLAMA_KEEP_ALIVE = int(os.environ.get("OLLAMA_KEEP_ALIVE_SECONDS", 30 * 60))
+OLLAMA_MAX_CONNECTIONS = 16
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = 8
+OLLAMA_KEEPALIVE_EXPIRY_SECONDS = 300
+OLLAMA_CONNECT_TIMEOUT_SECONDS = 5
+WARMUP_TEXT = "ok"
+
+# Readiness of each warmed model, keyed by its display label
+_readiness: Dict[str, Dict[str, Any]] = {}
+_readiness_lock = threading.Lock()
+
+_embedders: Dict[str, OllamaEmbeddings] = {}
+_embedders_lock = threading.Lock()
+
+def _client_kwargs() -> Dict[str, Any]:
+    """
+    httpx settings for one pooled client. A fresh dict per model, because
+    langchain_ollama merges auth headers into it in place.
+    """
+    return {
+        "limits": httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        # Generations can legitimately take minutes; only connecting should fail fast
+        "timeout": httpx.Timeout(None, connect=OLLAMA_CONNECT_TIMEOUT_SECONDS),
+    }
+
+def chat_model(model: str, **kwargs) -> ChatOllama:
+    """
+    ChatOllama with a pooled client and the shared keep_alive.
+    Extra kwargs (temperature, format, ...) are passed straight through.
+    """
+    return ChatOllama(
+        model=model,
+        base_url=OLLAMA_BASE_URL,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        client_kwargs=_client_kwargs(),
+        **kwargs,
+    )
+
+def embeddings_model(model: str) -> OllamaEmbeddings:
+    """
+    One OllamaEmbeddings per model name for the whole process, so the vector
+    store, the result cache and ingestion share the same connection pool.
+    """
+    with _embedders_lock:
+        if model not in _embedders:
+            _embedders[model] = OllamaEmbeddings(
+                model=model,
+                base_url=OLLAMA_BASE_URL,
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                client_kwargs=_client_kwargs(),
+            )
+        return _embedders[model]
+
+def _set_readiness(label: str, **fields):
+    with _readiness_lock:
+        _readiness[label] = {**_readiness.get(label, {}), **fields}
+
+def _warm_one(label: str, client):
+    start = time.perf_counter()
+    try:
+        if isinstance(client, OllamaEmbeddings):
+            client.embed_query(WARMUP_TEXT)
+        else:
+            # One generated token is enough to load the weights and open a connection
+            client.invoke(WARMUP_TEXT, options={"num_predict": 1})
+        _set_readiness(label, status="ready", seconds=time.perf_counter() - start, error=None)
+    except Exception as e:
+        _set_readiness(label, status="error", seconds=time.perf_counter() - start, error=str(e))
+
+def warm_models(models: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Sends a tiny request to every {label: client} in parallel so Ollama loads
+    the weights before the first real analysis. Never raises: failures are
+    recorded in the readiness table. `timeout` bounds the whole call, not each
+    model; models still loading after it stay "warming". Returns get_model_readiness().
+    """
+    for label, client in models.items():
+        _set_readiness(label, model=client.model, status="warming", seconds=None, error=None)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, len(models)))
+    futures = [pool.submit(_warm_one, label, client) for label, client in models.items()]
+    wait(futures, timeout=timeout)   # one deadline for all; _warm_one records its own errors
+    pool.shutdown(wait=False)
+    return get_model_readiness()
+
+def get_model_readiness() -> Dict[str, Dict[str, Any]]:
+    with _readiness_lock:
+        return {label: dict(state) for label, state in _readiness.items()}
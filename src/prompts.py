@@ -28,6 +28,29 @@ Return strictly JSON:
 }}
 """
 
+# --- COMBINED PROFILE PROMPT (Inference + Classification in one call) ---
+PROFILE_PROMPT = """
+You are an expert Event Planner and University Risk Analyst.
+Analyze the event name: "{event_name}".
+
+Step 1: Infer the likely details. If ambiguous, make a conservative estimate based on standard university events.
+Step 2: Generate 3-5 specific semantic search tags to find relevant safety rules and past memories in the database.
+Focus on high-risk factors (e.g., "alcohol", "crowd control", "electrical", "late night", "outdoor weather").
+
+Return strictly JSON:
+{{
+    "event_details": {{
+        "type": "Social | Academic | Fundraiser | Performance | Workshop",
+        "estimated_attendees": integer,
+        "is_outdoors": boolean,
+        "duration_hours": integer,
+        "vibes": "formal | casual | energetic | professional",
+        "venue_requirements": ["stage", "projector", "open space", "tables"]
+    }},
+    "queries": ["tag1", "tag2", "tag3", "tag4"]
+}}
+"""
+
 RISK_ANALYSIS_PROMPT = """
 You are a University Risk Officer. Analyze this event plan against institutional rules and history.
 
@@ -35,10 +58,10 @@ Event Details:
 {event_details_json}
 
 Relevant Standard Operating Procedures (SOPs):
-{sops_json}
+{sops_context}
 
 Historical Lessons Learned (Memory):
-{memories_json}
+{memories_context}
 
 Task:
 1. Check for specific SOP violations (e.g., capacity vs fire exits, noise rules).
@@ -1,15 +1,28 @@
 import os
+import sys
+import json
+import time
 import hashlib
+import threading
 import chromadb
-from typing import List, Dict, Optional, Any
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Any, Tuple, Iterable, Iterator, Callable
 
 # LangChain Imports
 from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.embedding_cache import EmbeddingCache, CachedEmbeddings, uncached
+from src.ollama_clients import embeddings_model
+from src.lexical_index import LexicalIndex
+from src.mmap_store import MmapVectorStore
+
 # --- CONFIGURATION (ABSOLUTE PATHS) ---
 # This ensures the DB is always created in your project root, not in a temp folder
 CURRENT_FILE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -17,9 +30,44 @@ PROJECT_ROOT = os.path.dirname(CURRENT_FILE_DIR)
 DB_PATH = os.path.join(PROJECT_ROOT, "chroma_db_storage")
 DATA_PATH = os.path.join(PROJECT_ROOT, "data", "knowledge_base")
 EMBEDDING_MODEL = "mxbai-embed-large:latest"
+EMBEDDING_CACHE_PATH = os.path.join(PROJECT_ROOT, "embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = 10000
+MANIFEST_FILENAME = "ingest_manifest.json"
+LEXICAL_INDEX_FILENAME = "lexical_index.json"
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
+INGEST_BATCH_SIZE = 64
+INGEST_WORKERS = 4
+# "hybrid": BM25 + vector fused with reciprocal-rank fusion (default)
+# "vector": embedding search only | "lexical": BM25 only, no embedding call
+RETRIEVAL_MODE = "hybrid"
+RRF_K = 60                 # standard RRF damping constant
+HYBRID_CANDIDATES = 10     # hits taken from each ranker before fusing
+# "chroma": PersistentClient (default) | "mmap": quantized memory-mapped index (see src/mmap_store.py)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+MMAP_INDEX_DIRNAME = "mmap_index"
+MMAP_DTYPE = os.environ.get("MMAP_VECTOR_DTYPE", "int8")   # "int8" | "float16"
+MEMORY_FLUSH_TIMEOUT_SECONDS = 30.0   # longest add_memory_log(wait=True) / flush_memory_log() block (Ollama may be down)
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Shared on-disk query-embedding cache (one per process, so counters add up).
+    """
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+        return _embedding_cache
 
 def get_embedding_function():
-    return OllamaEmbeddings(model=EMBEDDING_MODEL)
+    return CachedEmbeddings(
+        embeddings_model(EMBEDDING_MODEL),
+        cache=get_embedding_cache(),
+        model=EMBEDDING_MODEL,
+    )
 
 def generate_doc_id(content: str) -> str:
     return hashlib.md5(content.encode()).hexdigest()
@@ -33,123 +81,555 @@ def get_chroma_client():
         print(f"📁 Creating Database Storage at: {DB_PATH}")
     return chromadb.PersistentClient(path=DB_PATH)
 
-def get_vectorstore():
+# --- PROCESS-WIDE VECTOR STORE ---
+# Building the PersistentClient + embedder + Chroma wrapper is not free, so we
+# keep ONE handle per process and hand it out to every caller.
+COLLECTION_NAME = "campus_event_memory"
+_vectorstore = None
+_vectorstore_lock = threading.Lock()
+
+# Per-request timing: how much went to store setup vs the actual search.
+_retrieval_stats = {"requests": 0, "setup_seconds": 0.0, "search_seconds": 0.0, "last": {}}
+_stats_lock = threading.Lock()
+
+def _mmap_index_path() -> str:
+    return os.path.join(DB_PATH, MMAP_INDEX_DIRNAME)
+
+def _build_vectorstore(sync: bool = True):
     """
-    Returns the LangChain wrapper.
-    Checks if DB is empty; if so, populates it automatically.
+    Creates the store for VECTOR_BACKEND (the Chroma LangChain wrapper, or
+    the mmap index that mimics the parts of it we use).
+    Syncs it with the knowledge base folder (only new/changed files are embedded).
     """
-    client = get_chroma_client()
-    collection_name = "campus_event_memory"
-    
-    # Check if data exists
-    try:
-        count = client.get_collection(collection_name).count()
-    except Exception:
-        count = 0
-        
-    db = Chroma(
-        client=client,
-        collection_name=collection_name,
-        embedding_function=get_embedding_function(),
-    )
+    if VECTOR_BACKEND == "mmap":
+        db = MmapVectorStore(_mmap_index_path(), embedding_function=get_embedding_function(), dtype=MMAP_DTYPE)
+    elif VECTOR_BACKEND == "chroma":
+        db = Chroma(
+            client=get_chroma_client(),
+            collection_name=COLLECTION_NAME,
+            embedding_function=get_embedding_function(),
+        )
+    else:
+        raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}' (expected 'chroma' or 'mmap')")
     
-    # SELF-HEALING: If DB is empty, load data immediately
-    if count == 0:
-        print("⚠️ Database is empty. Auto-loading initial data...")
+    # SELF-HEALING: picks up an empty DB as well as edited/removed files
+    if sync:
         _ingest_files(db)
         
     return db
 
-def _ingest_files(db_instance):
+def get_vectorstore(reload: bool = False):
+    """
+    Returns the shared LangChain wrapper, building it on first use.
+    Pass reload=True to drop the cached handle and reconnect.
+    """
+    global _vectorstore
+    db = _vectorstore
+    if db is not None and not reload:
+        return db
+    
+    with _vectorstore_lock:
+        # Another thread may have finished the build while we waited
+        if _vectorstore is None or reload:
+            _vectorstore = _build_vectorstore()
+        return _vectorstore
+
+def reload_vectorstore():
+    """
+    Explicitly rebuilds the shared handle (e.g. after re-ingesting files).
+    """
+    print("🔄 Reloading vector store...")
+    return get_vectorstore(reload=True)
+
+# --- LEXICAL INDEX ---
+# BM25 postings kept next to the Chroma collection and updated by ingestion.
+_lexical_index = None
+_lexical_lock = threading.Lock()
+
+def _lexical_index_path() -> str:
+    return os.path.join(DB_PATH, LEXICAL_INDEX_FILENAME)
+
+def get_lexical_index() -> LexicalIndex:
+    """
+    Returns the shared BM25 index, loading it from disk on first use.
+    """
+    global _lexical_index
+    with _lexical_lock:
+        if _lexical_index is None:
+            index = LexicalIndex(_lexical_index_path())
+            index.load()
+            _lexical_index = index
+        return _lexical_index
+
+def _sync_lexical_index(db_instance) -> bool:
+    """
+    Rebuilds the index from the collection if they disagree (first run after
+    upgrading, a deleted index file, or an ingest that aborted midway).
+    Returns True if it had to rebuild.
+    """
+    index = get_lexical_index()
+    if len(index) == db_instance._collection.count():
+        return False
+    stored = db_instance.get(include=["documents", "metadatas"])
+    index.clear()
+    index.add(stored["ids"], stored["documents"], stored["metadatas"])
+    print(f"   🔤 Lexical index rebuilt from collection ({len(index)} chunks)")
+    return True
+
+def warm_vectorstore() -> float:
+    """
+    Builds the shared handle at startup so the first query doesn't pay for it.
+    Returns the time spent in seconds.
+    """
+    start = time.perf_counter()
+    get_vectorstore()
+    get_lexical_index()
+    elapsed = time.perf_counter() - start
+    print(f"🔥 Vector store warmed in {elapsed:.2f}s")
+    return elapsed
+
+def _record_retrieval_timing(setup_seconds: float, search_seconds: float):
+    with _stats_lock:
+        _retrieval_stats["requests"] += 1
+        _retrieval_stats["setup_seconds"] += setup_seconds
+        _retrieval_stats["search_seconds"] += search_seconds
+        _retrieval_stats["last"] = {"setup_seconds": setup_seconds, "search_seconds": search_seconds}
+
+def get_retrieval_stats() -> Dict[str, Any]:
+    """
+    Returns cumulative and last-request setup vs search timings.
+    """
+    with _stats_lock:
+        stats = dict(_retrieval_stats)
+        stats["last"] = dict(_retrieval_stats["last"])
+    requests = stats["requests"] or 1
+    stats["avg_setup_seconds"] = stats["setup_seconds"] / requests
+    stats["avg_search_seconds"] = stats["search_seconds"] / requests
+    stats["embedding_cache"] = get_embedding_cache().stats()
+    return stats
+
+# --- INCREMENTAL INGESTION ---
+# The manifest remembers each file's content hash and the chunk IDs it produced,
+# so a re-run only embeds what changed and deletes what disappeared.
+# Every write is a read-modify-write under _manifest_lock (ingestion's file map
+# and the memory writer's feedback revision must not overwrite each other).
+_manifest_lock = threading.Lock()
+
+def _manifest_path() -> str:
+    return os.path.join(DB_PATH, MANIFEST_FILENAME)
+
+def _load_manifest() -> Dict[str, Any]:
+    try:
+        with open(_manifest_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"files": {}}
+
+def _save_manifest(manifest: Dict[str, Any]):
+    path = _manifest_path()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def knowledge_base_version() -> str:
+    """
+    Fingerprint of the knowledge base contents (ingested file hashes + logged feedback).
+    Changes whenever ingestion picks up an edit or a new memory is written.
+    """
+    manifest = _load_manifest()
+    version = {
+        "files": {name: entry.get("hash") for name, entry in manifest.get("files", {}).items()},
+        "feedback_revision": manifest.get("feedback_revision", 0),
+    }
+    return hashlib.sha256(json.dumps(version, sort_keys=True).encode()).hexdigest()
+
+def _update_manifest(update: Callable[[Dict[str, Any]], None]):
+    """
+    Applies `update` to the manifest as it is on disk now and saves it, under the manifest lock.
+    """
+    with _manifest_lock:
+        manifest = _load_manifest()
+        update(manifest)
+        _save_manifest(manifest)
+
+def _bump_feedback_revision():
+    _update_manifest(lambda manifest: manifest.update(feedback_revision=manifest.get("feedback_revision", 0) + 1))
+
+def _hash_file(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _file_category(filename: str) -> str:
+    return "memory" if any(k in filename.lower() for k in ["incident", "log", "memory"]) else "rule"
+
+def _chunk_file(file_path: str, filename: str) -> Tuple[List[Document], List[str]]:
+    """
+    Splits one file into chunks with stable, file-scoped IDs.
+    """
+    raw_docs = TextLoader(file_path, encoding="utf-8").load()
+    for doc in raw_docs:
+        doc.metadata["category"] = _file_category(filename)
+        doc.metadata["source_file"] = filename
+    
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunks, ids = [], []
+    for chunk in text_splitter.split_documents(raw_docs):
+        chunk_id = generate_doc_id(f"{filename}::{chunk.page_content}")
+        if chunk_id in ids: continue
+        chunks.append(chunk)
+        ids.append(chunk_id)
+    return chunks, ids
+
+def _existing_ids_for_file(db_instance, filename: str) -> set:
+    return set(db_instance.get(where={"source_file": filename}, include=[])["ids"])
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _embed_and_upsert(db_instance, chunk_stream: Iterable[Tuple[Document, str]], batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS) -> int:
+    """
+    Streaming bulk-ingest: pulls (chunk, id) pairs lazily, embeds them in batches
+    across a thread pool, and upserts each batch as soon as it is ready.
+    At most `workers * 2` batches are in flight, so the reader never runs far
+    ahead of the embedder (backpressure).
     """
-    Internal function to read .txt files and save them.
+    embedder = uncached(db_instance.embeddings)   # chunks skip the query cache
+    collection = db_instance._collection
+    lexical = get_lexical_index()
+    
+    def _embed(batch):
+        return batch, embedder.embed_documents([chunk.page_content for chunk, _ in batch])
+    
+    done = 0
+    start = time.perf_counter()
+    
+    def _upsert(future):
+        nonlocal done
+        batch, vectors = future.result()
+        # Upserts stay on the calling thread: one writer, many embedders
+        collection.upsert(
+            ids=[chunk_id for _, chunk_id in batch],
+            embeddings=vectors,
+            documents=[chunk.page_content for chunk, _ in batch],
+            metadatas=[chunk.metadata for chunk, _ in batch],
+        )
+        lexical.add([chunk_id for _, chunk_id in batch], [chunk.page_content for chunk, _ in batch], [chunk.metadata for chunk, _ in batch])
+        done += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"   ⚡ {done} chunks embedded ({done / elapsed if elapsed else 0:.1f} chunks/sec)")
+    
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in _batched(chunk_stream, batch_size):
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    _upsert(future)
+            pending.add(pool.submit(_embed, batch))
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                _upsert(future)
+    
+    return done
+
+def _sync_incident_store(old_files: Dict[str, Dict[str, Any]], new_files: Dict[str, Dict[str, Any]]):
     """
+    Mirrors the 'memory' files into the structured incident store: files that
+    changed (or have no rows yet) are re-parsed, files that left the folder are dropped.
+    Rows are stored without vectors; the store embeds them on its first vector search.
+    """
+    from src.incident_store import get_incident_store, parse_incident_log  # imports this module
+    store = get_incident_store()
+    synced = store.source_files()
+    memory_files = {name: info for name, info in new_files.items() if info.get("category") == "memory"}
+    for filename, info in memory_files.items():
+        previous = old_files.get(filename)
+        if filename in synced and previous and previous.get("hash") == info.get("hash"):
+            continue
+        try:
+            with open(os.path.join(DATA_PATH, filename), "r", encoding="utf-8") as f:
+                incidents = store.sync_file(filename, parse_incident_log(f.read()), embed=False)
+        except Exception as e:
+            print(f"   ❌ Incident store {filename}: {e}")
+            continue
+        print(f"   -> Incident store: {filename} ({incidents} incidents)")
+    removed = [name for name in synced if name in old_files and name not in memory_files]
+    if removed:
+        print(f"   -> Incident store: dropped {store.remove_files(removed)} incidents from {len(removed)} removed files")
+
+def _ingest_files(db_instance, batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS) -> Dict[str, int]:
+    """
+    Internal function to sync the .txt files with the DB.
+    Unchanged files are skipped, new chunks are embedded, stale chunks are deleted.
+    """
+    report = {"files_scanned": 0, "files_changed": 0, "chunks_added": 0, "chunks_deleted": 0}
+    
     if not os.path.exists(DATA_PATH):
         os.makedirs(DATA_PATH)
         print(f"⚠️ Created data folder: {DATA_PATH}. Put your .txt files here!")
-        return
+        return report
 
-    documents = []
-    print(f"📂 Scanning {DATA_PATH}...")
+    old_files = _load_manifest().get("files", {})
+    new_files = {}
+    lexical_rebuilt = _sync_lexical_index(db_instance)
     
-    for filename in os.listdir(DATA_PATH):
-        if not filename.endswith(".txt"): continue
-        
-        file_path = os.path.join(DATA_PATH, filename)
-        category = "memory" if any(k in filename.lower() for k in ["incident", "log", "memory"]) else "rule"
-        
-        try:
-            loader = TextLoader(file_path, encoding="utf-8")
-            raw_docs = loader.load()
-            for doc in raw_docs:
-                doc.metadata["category"] = category
-                doc.metadata["source_file"] = filename
-                documents.extend(raw_docs)
-            print(f"   -> Found {filename}")
-        except Exception as e:
-            print(f"   ❌ Error {filename}: {e}")
+    def _changed_chunks():
+        # Files are read one at a time as the embedder asks for more work
+        for filename in sorted(os.listdir(DATA_PATH)):
+            if not filename.endswith(".txt"): continue
+            
+            file_path = os.path.join(DATA_PATH, filename)
+            report["files_scanned"] += 1
+            
+            try:
+                file_hash = _hash_file(file_path)
+                previous = old_files.get(filename)
+                if previous and previous.get("hash") == file_hash:
+                    new_files[filename] = previous
+                    continue
+                
+                chunks, ids = _chunk_file(file_path, filename)
+                existing = _existing_ids_for_file(db_instance, filename)
+                
+                # Only embed chunks the DB doesn't already hold
+                to_add = [(c, i) for c, i in zip(chunks, ids) if i not in existing]
+                stale = sorted(existing - set(ids))
+                if stale:
+                    db_instance.delete(ids=stale)
+                    get_lexical_index().remove(stale)
+            except Exception as e:
+                print(f"   ❌ Error {filename}: {e}")
+                if filename in old_files:
+                    new_files[filename] = old_files[filename]
+                continue
+            
+            new_files[filename] = {"hash": file_hash, "category": _file_category(filename), "chunk_ids": ids}
+            report["files_changed"] += 1
+            report["chunks_added"] += len(to_add)
+            report["chunks_deleted"] += len(stale)
+            print(f"   -> Syncing {filename}: +{len(to_add)} / -{len(stale)} chunks")
+            yield from to_add
+
+    start = time.perf_counter()
+    try:
+        _embed_and_upsert(db_instance, _changed_chunks(), batch_size=batch_size, workers=workers)
+    except Exception as e:
+        # Manifest is left untouched; chunks already upserted are skipped next run
+        # (the lexical index is rebuilt from the collection on the next sync)
+        print(f"   ❌ Ingestion aborted: {e}")
+        return report
+    elapsed = time.perf_counter() - start
+    
+    # Files that were removed from the folder
+    for filename in set(old_files) - set(new_files):
+        stale = sorted(_existing_ids_for_file(db_instance, filename) | set(old_files[filename].get("chunk_ids", [])))
+        if stale:
+            db_instance.delete(ids=stale)
+            get_lexical_index().remove(stale)
+        report["chunks_deleted"] += len(stale)
+        print(f"   -> Removed {filename}: -{len(stale)} chunks")
 
-    if documents:
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
-        chunks = text_splitter.split_documents(documents)
-        ids = [generate_doc_id(chunk.page_content) for chunk in chunks]
+    if new_files != old_files or lexical_rebuilt:
+        get_lexical_index().save()
+    _sync_incident_store(old_files, new_files)
+    if new_files != old_files:
+        # Re-read: a feedback revision may have been bumped while we were embedding
+        _update_manifest(lambda latest: latest.update(files=new_files))
+        rate = report["chunks_added"] / elapsed if elapsed else 0
+        print(f"✅ Knowledge base synced: +{report['chunks_added']} / -{report['chunks_deleted']} chunks ({rate:.1f} chunks/sec).")
         
-        print(f"💉 Injecting {len(chunks)} chunks into Persistent DB...")
-        db_instance.add_documents(documents=chunks, ids=ids)
-        print("✅ Data persisted.")
-    else:
-        print("⚠️ No documents found to ingest.")
+    return report
 
-def query_knowledge_base(query: str, filters: Optional[Dict[str, Any]] = None, k: int = 4) -> List[Dict]:
+def ingest_knowledge_base(reset: bool = False, batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS) -> Dict[str, int]:
     """
-    Retrieves info from the persistent DB.
+    Public entry point: incrementally syncs the knowledge base folder.
+    reset=True drops the collection, manifest and incident store first (full rebuild).
     """
-    db = get_vectorstore() # This triggers the auto-load check
-    results = db.similarity_search(query, k=k, filter=filters)
+    global _vectorstore, _lexical_index
+    with _vectorstore_lock:
+        if reset:
+            print("🧨 Resetting collection and ingestion manifest...")
+            if VECTOR_BACKEND == "mmap":
+                MmapVectorStore(_mmap_index_path()).reset()
+            else:
+                try:
+                    get_chroma_client().delete_collection(COLLECTION_NAME)
+                except Exception:
+                    pass
+            with _manifest_lock:
+                for path in (_manifest_path(), _lexical_index_path()):
+                    if os.path.exists(path):
+                        os.remove(path)
+            from src.incident_store import get_incident_store
+            get_incident_store().clear()   # refilled from the memory files below
+            _vectorstore = None
+            _lexical_index = None
+        if _vectorstore is None:
+            _vectorstore = _build_vectorstore(sync=False)
+        db = _vectorstore
     
-    return [{"content": doc.page_content, "source": doc.metadata.get("source_file", "unknown")} for doc in results]
+    print(f"📂 Scanning {DATA_PATH}...")
+    return _ingest_files(db, batch_size=batch_size, workers=workers)
+
+def _to_result(content: str, metadata: Dict[str, Any]) -> Dict:
+    return {"content": content, "source": (metadata or {}).get("source_file", "unknown")}
 
-def add_memory_log(event_name: str, outcome: str, description: str, lesson_learned: str) -> bool:
+def _ranked_search(db, query: str, vector: Optional[List[float]], filters: Optional[Dict[str, Any]], k: int, mode: str) -> List[Dict]:
     """
-    Writes a new memory to the persistent database.
+    One filtered lookup in the given mode. `vector` is the query embedding
+    (None in lexical mode, which never embeds).
     """
-    print(f"\n--- 💾 SAVING TO DISK: {event_name} ---")
+    if mode == "lexical":
+        index = get_lexical_index()
+        return [_to_result(**index.get(doc_id)) for doc_id, _ in index.search(query, k=k, filters=filters)]
+    
+    if mode == "vector":
+        return [_to_result(doc.page_content, doc.metadata) for doc in db.similarity_search_by_vector(vector, k=k, filter=filters)]
     
-    content = f"""
-    EVENT ID: {event_name.upper()}
-    Type: User Feedback
-    Outcome: {outcome}
-    Description: {description}
-    Lesson Learned: {lesson_learned}
+    # Hybrid: reciprocal-rank fusion of the two rankings (scores aren't comparable, ranks are)
+    index = get_lexical_index()
+    candidates = max(k, HYBRID_CANDIDATES)
+    fused: Dict[str, float] = {}
+    found: Dict[str, Dict] = {}
+    for rank, doc in enumerate(db.similarity_search_by_vector(vector, k=candidates, filter=filters)):
+        # Fusion needs the stored id; it can't be re-derived (chunks hash "file::content", memories their content)
+        if not doc.id:
+            raise ValueError("Vector store returned a document without an id; hybrid retrieval needs ids to fuse rankings")
+        doc_id = doc.id
+        fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        found[doc_id] = _to_result(doc.page_content, doc.metadata)
+    for rank, (doc_id, _) in enumerate(index.search(query, k=candidates, filters=filters)):
+        fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+        if doc_id not in found:
+            found[doc_id] = _to_result(**index.get(doc_id))
+    best = sorted(fused, key=fused.get, reverse=True)[:k]
+    return [found[doc_id] for doc_id in best]
+
+def query_knowledge_base(query: str, filters: Optional[Dict[str, Any]] = None, k: int = 4, mode: Optional[str] = None) -> List[Dict]:
+    """
+    Retrieves info from the persistent DB.
+    mode: "hybrid" | "vector" | "lexical" (defaults to RETRIEVAL_MODE).
     """
+    mode = mode or RETRIEVAL_MODE
+    start = time.perf_counter()
+    db = get_vectorstore() # Shared handle; first call triggers the auto-load check
+    setup_seconds = time.perf_counter() - start
     
-    new_doc = Document(
-        page_content=content,
-        metadata={
-            "category": "memory",
-            "source_file": "user_feedback_log.txt",
-            "timestamp": "new"
-        }
-    )
+    start = time.perf_counter()
+    vector = None if mode == "lexical" else db.embeddings.embed_query(query)
+    results = _ranked_search(db, query, vector, filters, k, mode)
+    search_seconds = time.perf_counter() - start
+    
+    _record_retrieval_timing(setup_seconds, search_seconds)
+    print(f"   ⏱️ Retrieval ({mode}): setup {setup_seconds*1000:.1f}ms | search {search_seconds*1000:.1f}ms")
+    
+    return results
+
+def query_knowledge_base_batch(requests: List[Tuple[str, Optional[Dict[str, Any]], int]], mode: Optional[str] = None,
+                               vectors: Optional[List[List[float]]] = None) -> List[List[Dict]]:
+    """
+    Runs several (query, filters, k) lookups with ONE embedding round-trip.
+    All query strings are embedded in a single batched call, then each vector
+    is searched against its own metadata filter. Lexical mode skips embedding.
+    `vectors` are precomputed query embeddings (the caller batched them with other queries).
+    """
+    if not requests:
+        return []
+    
+    mode = mode or RETRIEVAL_MODE
+    start = time.perf_counter()
+    db = get_vectorstore()
+    setup_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    embed_calls = 0
+    if mode == "lexical":
+        vectors = [None] * len(requests)
+    elif vectors is None:
+        vectors = db.embeddings.embed_documents([query for query, _, _ in requests])
+        embed_calls = 1
+    
+    batch_results = [
+        _ranked_search(db, query, vector, filters, k, mode)
+        for vector, (query, filters, k) in zip(vectors, requests)
+    ]
+    search_seconds = time.perf_counter() - start
+    
+    _record_retrieval_timing(setup_seconds, search_seconds)
+    print(f"   ⏱️ Batched retrieval ({len(requests)} queries, {mode}, {embed_calls} embed call): setup {setup_seconds*1000:.1f}ms | search {search_seconds*1000:.1f}ms")
     
+    return batch_results
+
+def add_memory_log(event_name: str, outcome: str, description: str, lesson_learned: str,
+                   event_type: Optional[str] = None, attendees: Optional[int] = None,
+                   venue: Optional[str] = None, is_outdoors: Optional[bool] = None,
+                   wait: bool = False, timeout: float = MEMORY_FLUSH_TIMEOUT_SECONDS) -> bool:
+    """
+    Queues a new memory for the persistent database.
+    The entry is journaled to disk before returning; the background writer
+    (src/memory_writer.py) embeds it with other queued entries and writes it
+    to Chroma, the lexical index and the incident store. wait=True blocks
+    until it is committed and verified, for at most `timeout` seconds.
+    False means it could not be journaled, or (wait=True) it was not committed
+    in time: it is still in the journal and the writer keeps retrying.
+    """
+    from src.memory_writer import get_memory_writer
+    print(f"\n--- 💾 QUEUEING MEMORY: {event_name} ---")
+    entry = {
+        "event_name": event_name,
+        "outcome": outcome,
+        "description": description,
+        "lesson_learned": lesson_learned,
+        "event_type": event_type,
+        "attendees": attendees,
+        "venue": venue,
+        "is_outdoors": is_outdoors,
+        "logged_at": datetime.now().isoformat(timespec="seconds"),
+    }
     try:
-        db = get_vectorstore()
-        doc_id = generate_doc_id(content)
-        db.add_documents(documents=[new_doc], ids=[doc_id])
-        
-        # Verify immediately
-        check = db.similarity_search(description, k=1)
-        if check:
-            print("✅ SUCCESS: Memory verified on hard drive.")
-            return True
-        return False
+        writer = get_memory_writer()
+        writer.submit(entry)
     except Exception as e:
         print(f"❌ ERROR: {e}")
         return False
+    return flush_memory_log(timeout) if wait else True
+
+def flush_memory_log(timeout: Optional[float] = MEMORY_FLUSH_TIMEOUT_SECONDS) -> bool:
+    """
+    Blocks until every queued memory is in the vector store, for at most
+    `timeout` seconds (None waits forever). False on timeout: the memories
+    are still in the journal and the writer keeps retrying in the background.
+    """
+    from src.memory_writer import get_memory_writer
+    return get_memory_writer().flush(timeout)
 
 # --- AUTO-SETUP BLOCK ---
-# This allows you to run `python src/rag.py` to force-check the DB
+# `python -m src.rag ingest` syncs changed files; add `--reset` for a full rebuild.
+# Running with no arguments just force-checks the DB.
 if __name__ == "__main__":
-    print("🔧 RUNNING DIRECT DB CHECK...")
-    db = get_vectorstore()
-    print("✅ DB Check Complete. You can run 'streamlit run main.py' now.")
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Knowledge base maintenance")
+    parser.add_argument("command", nargs="?", default="check", choices=["check", "ingest"])
+    parser.add_argument("--reset", action="store_true", help="Drop the collection and re-embed everything")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="Chunks per embedding request")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Parallel embedding requests")
+    args = parser.parse_args()
+    
+    if args.command == "ingest":
+        start = time.perf_counter()
+        report = ingest_knowledge_base(reset=args.reset, batch_size=args.batch_size, workers=args.workers)
+        print(f"✅ Ingest complete in {time.perf_counter() - start:.2f}s: {report}")
+    else:
+        print("🔧 RUNNING DIRECT DB CHECK...")
+        db = get_vectorstore()
+        print("✅ DB Check Complete. You can run 'streamlit run main.py' now.")
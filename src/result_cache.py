@@ -0,0 +1,251 @@
+"""
+Semantic cache for whole-pipeline analyses.
+Near-identical event descriptions ("CS Hackathon overnight 300 students" vs
+"Computer Science Hackathon, 300 students, overnight") reuse the stored
+AgentState instead of paying for four LLM calls + retrieval again.
+Similarity alone can't tell "15 people" from "150 people", so an entry is
+only reused when the hard facts (attendees, indoor/outdoor, every number in
+the description) are the same as well.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from src import prompts
+from src.rag import PROJECT_ROOT, EMBEDDING_MODEL, get_embedding_function, knowledge_base_version
+from src.embedding_cache import normalize_text
+from src.fast_path import parse_facts
+
+# --- CONFIGURATION ---
+RESULT_CACHE_PATH = os.path.join(PROJECT_ROOT, "result_cache.sqlite3")
+RESULT_CACHE_THRESHOLD = 0.95      # cosine similarity needed for a hit
+RESULT_CACHE_TTL_SECONDS = 24 * 3600
+RESULT_CACHE_MAX_ENTRIES = 1000
+
+def prompts_version() -> str:
+    """
+    Hash of every prompt template in src/prompts.py.
+    """
+    templates = {name: value for name, value in vars(prompts).items() if name.isupper() and isinstance(value, str)}
+    return hashlib.sha256(json.dumps(templates, sort_keys=True).encode()).hexdigest()
+
+def cache_fingerprint() -> str:
+    """
+    Entries are only valid for the embedder, knowledge base and prompts they were computed with.
+    """
+    return hashlib.sha256(f"{EMBEDDING_MODEL}:{knowledge_base_version()}:{prompts_version()}".encode()).hexdigest()
+
+def event_facts(event_name: str) -> str:
+    """
+    Canonical JSON of the facts a hit must match exactly.
+    """
+    facts = parse_facts(event_name)
+    facts["numbers"] = sorted(n.replace(",", "") for n in re.findall(r"\d[\d,]*", event_name))
+    return json.dumps(facts, sort_keys=True)
+
+def is_cacheable(state: Dict[str, Any]) -> bool:
+    """
+    Don't pin a result whose agents failed to produce valid JSON.
+    """
+    return not any(isinstance(state.get(key), dict) and "error" in state[key] for key in ("event_details", "risk_assessment"))
+
+class SemanticResultCache:
+    """
+    SQLite-backed store of (event embedding -> final AgentState), with TTL and LRU eviction.
+    Vectors for the current fingerprint are mirrored in memory as one matrix,
+    so a lookup is a single matrix-vector product.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_PATH, threshold: float = RESULT_CACHE_THRESHOLD,
+                 ttl_seconds: float = RESULT_CACHE_TTL_SECONDS, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 embedder=None):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embedder = embedder or get_embedding_function()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fingerprint TEXT,
+                event_name TEXT,
+                vector BLOB,
+                state TEXT,
+                created_at REAL,
+                last_used REAL,
+                facts TEXT
+            )
+        ''')
+        # Caches created before facts were stored: those rows (NULL) never match
+        if "facts" not in [row[1] for row in self._conn.execute('PRAGMA table_info(results)')]:
+            self._conn.execute('ALTER TABLE results ADD COLUMN facts TEXT')
+        self._conn.commit()
+        self._fingerprint = None
+        self._ids = []
+        self._facts = []
+        self._matrix = None
+
+    def embed(self, event_name: str) -> np.ndarray:
+        vector = np.asarray(self.embedder.embed_query(normalize_text(event_name)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _refresh(self, fingerprint: str):
+        """
+        Drops stale/expired rows and reloads the in-memory matrix if needed.
+        Called with the lock held.
+        """
+        expired_before = time.time() - self.ttl_seconds
+        deleted = self._conn.execute(
+            'DELETE FROM results WHERE fingerprint != ? OR created_at < ?', (fingerprint, expired_before)
+        ).rowcount
+        if deleted:
+            self._conn.commit()
+        if deleted or fingerprint != self._fingerprint or self._matrix is None:
+            rows = self._conn.execute('SELECT id, vector, facts FROM results').fetchall()
+            self._ids = [row[0] for row in rows]
+            self._facts = np.array([row[2] for row in rows], dtype=object)
+            self._matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+            self._fingerprint = fingerprint
+
+    def lookup(self, event_name: str, vector: Optional[np.ndarray] = None) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Returns (cached_state, similarity) for the closest stored event with the
+        same facts, or (None, best_similarity).
+        """
+        vector = self.embed(event_name) if vector is None else vector
+        fingerprint = cache_fingerprint()
+        facts = event_facts(event_name)
+        with self._lock:
+            self._refresh(fingerprint)
+            if self._matrix is None:
+                self.misses += 1
+                return None, 0.0
+            scores = np.where(self._facts == facts, self._matrix @ vector, -1.0)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+            row_id = self._ids[best]
+            row = self._conn.execute('SELECT state FROM results WHERE id = ?', (row_id,)).fetchone()
+            self._conn.execute('UPDATE results SET last_used = ? WHERE id = ?', (time.time(), row_id))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0]), similarity
+
+    def store(self, event_name: str, state: Dict[str, Any], vector: Optional[np.ndarray] = None):
+        vector = self.embed(event_name) if vector is None else vector
+        fingerprint = cache_fingerprint()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO results (fingerprint, event_name, vector, state, created_at, last_used, facts) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (fingerprint, event_name, vector.astype(np.float32).tobytes(), json.dumps(state), now, now, event_facts(event_name))
+            )
+            # LRU: keep the newest `max_entries` rows
+            self._conn.execute('''
+                DELETE FROM results WHERE id NOT IN (
+                    SELECT id FROM results ORDER BY last_used DESC LIMIT ?
+                )
+            ''', (self.max_entries,))
+            self._conn.commit()
+            self._matrix = None  # reload on next lookup
+            self._refresh(fingerprint)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "threshold": self.threshold,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM results')
+            self._conn.commit()
+            self._matrix = None
+
+class CachedGraph:
+    """
+    Wraps a compiled graph: invoke/ainvoke check the semantic cache first and
+    store fresh results. Everything else is passed through to the graph.
+    """
+
+    def __init__(self, app, cache: Optional[SemanticResultCache] = None):
+        self.app = app
+        self.cache = cache or SemanticResultCache()
+
+    def invoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> Dict[str, Any]:
+        vector = self.cache.embed(inputs["event_name"])
+        cached, similarity = self.cache.lookup(inputs["event_name"], vector=vector)
+        if cached is not None:
+            print(f"⚡ RESULT CACHE HIT (similarity {similarity:.3f}) for '{inputs['event_name']}'")
+            return cached
+        result = self.app.invoke(inputs, config=config, **kwargs)
+        if is_cacheable(result):
+            self.cache.store(inputs["event_name"], result, vector=vector)
+        return result
+
+    async def ainvoke(self, inputs: Dict[str, Any], config=None, **kwargs) -> Dict[str, Any]:
+        vector = await asyncio.to_thread(self.cache.embed, inputs["event_name"])
+        cached, similarity = await asyncio.to_thread(self.cache.lookup, inputs["event_name"], vector)
+        if cached is not None:
+            print(f"⚡ RESULT CACHE HIT (similarity {similarity:.3f}) for '{inputs['event_name']}'")
+            return cached
+        result = await self.app.ainvoke(inputs, config=config, **kwargs)
+        if is_cacheable(result):
+            await asyncio.to_thread(self.cache.store, inputs["event_name"], result, vector)
+        return result
+
+    def stream(self, inputs: Dict[str, Any], config=None, stream_mode="values", subgraphs: bool = False, **kwargs):
+        """
+        Cache-aware graph.stream(). A hit is replayed as a single top-level
+        "values" chunk holding the stored state.
+        """
+        modes = stream_mode if isinstance(stream_mode, list) else [stream_mode]
+        
+        def shape(namespace, mode, payload):
+            # Mirror LangGraph's chunk shape for the requested options
+            chunk = (mode, payload) if isinstance(stream_mode, list) else payload
+            if subgraphs:
+                return (namespace, *chunk) if isinstance(stream_mode, list) else (namespace, chunk)
+            return chunk
+        
+        vector = self.cache.embed(inputs["event_name"])
+        cached, similarity = self.cache.lookup(inputs["event_name"], vector=vector)
+        if cached is not None:
+            print(f"⚡ RESULT CACHE HIT (similarity {similarity:.3f}) for '{inputs['event_name']}'")
+            if "values" in modes:
+                yield shape((), "values", cached)
+            return
+        
+        final_state = None
+        for chunk in self.app.stream(inputs, config=config, stream_mode=stream_mode, subgraphs=subgraphs, **kwargs):
+            namespace = chunk[0] if subgraphs else ()
+            body = chunk[1:] if subgraphs else (chunk if isinstance(stream_mode, list) else (chunk,))
+            mode, payload = body if isinstance(stream_mode, list) else (stream_mode, body[0])
+            if mode == "values" and not namespace:
+                final_state = payload
+            yield chunk
+        if final_state is not None and is_cacheable(final_state):
+            self.cache.store(inputs["event_name"], final_state, vector=vector)
+
+    def __getattr__(self, name):
+        return getattr(self.app, name)
@@ -0,0 +1,21 @@
+from typing import List, Literal
+from pydantic import BaseModel, Field
+
+class EventProfile(BaseModel):
+    """
+    Typed version of the Inference Agent's output (see INFERENCE_PROMPT).
+    """
+    type: Literal["Social", "Academic", "Fundraiser", "Performance", "Workshop"]
+    estimated_attendees: int = Field(ge=0)
+    is_outdoors: bool
+    duration_hours: int = Field(ge=0)
+    vibes: Literal["formal", "casual", "energetic", "professional"]
+    venue_requirements: List[str]
+
+class ProfileWithTags(BaseModel):
+    """
+    Output of the combined Profile Agent: the event profile plus the search tags
+    the Classification Agent would have produced.
+    """
+    event_details: EventProfile
+    queries: List[str] = Field(min_length=1, max_length=8)
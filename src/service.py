@@ -0,0 +1,391 @@
+"""
+Local analysis service: the agent graph behind a small HTTP API.
+
+    python -m src.service --port 8765 --workers 2
+    ANALYSIS_SERVICE_URL=http://127.0.0.1:8765 streamlit run main.py
+
+One process owns the graph, the vector store and the Ollama clients; any
+number of Streamlit sessions submit jobs to it instead of each running a
+full pipeline in its script thread.
+  - Job queue + worker pool: WORKERS graphs run at once (sized to how many
+    requests the Ollama server processes in parallel, OLLAMA_NUM_PARALLEL).
+  - Deduplication: submitting an event that is already queued or running
+    returns the existing job, so both callers share one analysis.
+  - Admission control: at most MAX_QUEUED jobs wait; beyond that POST /jobs
+    answers 429 with a Retry-After estimate instead of queueing work the
+    model server can't get to.
+  - Results are streamed as the same events stream_analysis() yields
+    (token / update / span / final), fetched by long-polling. Cursors are
+    event sequence numbers. Only the newest MAX_BUFFERED_TOKENS token events
+    of a job are kept, and they are dropped once it finishes (the final state
+    holds the full text), so a finished job costs its few update/span events.
+
+    POST /jobs                           {"event_name": ...} -> 202 {"job_id", "status", "deduplicated"}
+    GET  /jobs/<id>                      status, and the result once done
+    GET  /jobs/<id>/events?after=N&wait=S&tokens=1
+    GET  /health                         queue depth, workers, counters, model readiness
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import bisect
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse, parse_qs, urlencode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Ensure the parent directory is in the path so we can run this file directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.embedding_cache import normalize_text
+from src.telemetry import TraceRecorder
+
+# --- CONFIGURATION ---
+SERVICE_HOST = os.environ.get("ANALYSIS_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("ANALYSIS_SERVICE_PORT", "8765"))
+# One graph keeps ~1 model request busy at a time (2 during the parallel lanes),
+# so by default run as many graphs as Ollama serves requests in parallel
+WORKERS = int(os.environ.get("ANALYSIS_WORKERS", os.environ.get("OLLAMA_NUM_PARALLEL", "2")))
+MAX_QUEUED = int(os.environ.get("ANALYSIS_MAX_QUEUED", str(WORKERS * 4)))
+JOB_TTL_SECONDS = 600          # finished jobs stay readable this long
+MAX_POLL_WAIT_SECONDS = 30
+DEFAULT_JOB_SECONDS = 30.0     # Retry-After estimate before any job has finished
+MAX_BUFFERED_TOKENS = 2000     # token events kept per running job (oldest dropped first)
+
+class ServiceBusy(Exception):
+    """Raised by submit() when the queue is full (HTTP 429)."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Analysis queue is full, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class Job:
+    """
+    One analysis: its status, the event log clients read from, and the final state.
+    """
+
+    def __init__(self, event_name: str, key: str):
+        self.id = uuid.uuid4().hex
+        self.event_name = event_name
+        self.key = key
+        self.status = "queued"     # queued -> running -> done | failed
+        # Event log: events[i] has sequence number seqs[i]; trimming tokens leaves gaps
+        self.events: List[Dict[str, Any]] = []
+        self.seqs: List[int] = []
+        self.next_seq = 0
+        self.tokens = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.submitters = 1
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cond = threading.Condition()
+
+    def _drop_tokens(self, keep: int):
+        # Keeps every non-token event and the newest `keep` tokens. Called with cond held.
+        drop = self.tokens - keep
+        seqs, events = [], []
+        for seq, event in zip(self.seqs, self.events):
+            if event["type"] == "token" and drop > 0:
+                drop -= 1
+                continue
+            seqs.append(seq)
+            events.append(event)
+        self.seqs, self.events = seqs, events
+        self.tokens = min(self.tokens, keep)
+
+    def append(self, event: Dict[str, Any]):
+        with self.cond:
+            self.events.append(event)
+            self.seqs.append(self.next_seq)
+            self.next_seq += 1
+            if event["type"] == "token":
+                self.tokens += 1
+                if self.tokens > MAX_BUFFERED_TOKENS:
+                    self._drop_tokens(MAX_BUFFERED_TOKENS // 2)   # amortized: trim in halves
+            self.cond.notify_all()
+
+    def since(self, cursor: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        (events with sequence number >= cursor, next cursor). Called with cond held.
+        """
+        return self.events[bisect.bisect_left(self.seqs, cursor):], self.next_seq
+
+    def finish(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self.cond:
+            self.status, self.result, self.error = status, result, error
+            self.finished = time.time()
+            # Tokens were only a live preview of text the final state has in full
+            self._drop_tokens(0)
+            self.cond.notify_all()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "event_name": self.event_name,
+            "status": self.status,
+            "submitters": self.submitters,
+            "queued_seconds": (self.started or time.time()) - self.created,
+            "run_seconds": ((self.finished or time.time()) - self.started) if self.started else 0.0,
+            "error": self.error,
+        }
+
+class AnalysisService:
+    """
+    Job queue + worker threads around one compiled graph.
+    """
+
+    def __init__(self, app, workers: int = WORKERS, max_queued: int = MAX_QUEUED):
+        self.app = app
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[str, Job] = {}     # dedup key -> queued/running job
+        self._lock = threading.Lock()
+        self._running = 0
+        self._durations: List[float] = []
+        self.counters = {"submitted": 0, "deduplicated": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._threads = [threading.Thread(target=self._work, name=f"analysis-worker-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    # --- submission ---
+
+    def _retry_after(self) -> float:
+        recent = self._durations[-20:]
+        per_job = sum(recent) / len(recent) if recent else DEFAULT_JOB_SECONDS
+        return per_job * max(1, self._queue.qsize()) / max(1, self.workers)
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id in [i for i, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, event_name: str) -> Tuple[Job, bool]:
+        """
+        Returns (job, deduplicated). Raises ServiceBusy when the queue is full.
+        """
+        key = normalize_text(event_name)
+        with self._lock:
+            self._prune()
+            existing = self._active.get(key)
+            if existing is not None:
+                existing.submitters += 1
+                self.counters["deduplicated"] += 1
+                return existing, True
+            if self._queue.qsize() >= self.max_queued:
+                self.counters["rejected"] += 1
+                raise ServiceBusy(self._retry_after())
+            job = Job(event_name, key)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self.counters["submitted"] += 1
+            self._queue.put(job)
+            return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    # --- workers ---
+
+    def _work(self):
+        from src.streaming import stream_with_spans
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+            job.status, job.started = "running", time.time()
+            job.append({"type": "status", "status": "running"})
+            try:
+                final_state = {}
+                for event in stream_with_spans(self.app, {"event_name": job.event_name}, TraceRecorder()):
+                    if event["type"] == "final":
+                        final_state = event["state"]
+                    job.append(event)
+                job.finish("done", result=final_state)
+            except Exception as e:
+                job.append({"type": "error", "error": str(e)})
+                job.finish("failed", error=str(e))
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._active.pop(job.key, None)
+                    self._durations = (self._durations + [job.finished - job.started])[-100:]
+                    self.counters["completed" if job.status == "done" else "failed"] += 1
+
+    def events(self, job: Job, after: int = 0, wait: float = 0.0, tokens: bool = True) -> Dict[str, Any]:
+        """
+        Events from sequence number `after` on, waiting up to `wait` seconds for new ones (long-poll).
+        "skipped" counts the token events in that range that were already dropped.
+        """
+        deadline = time.time() + min(wait, MAX_POLL_WAIT_SECONDS)
+        with job.cond:
+            while job.next_seq <= after and job.finished is None and time.time() < deadline:
+                job.cond.wait(deadline - time.time())
+            new, cursor = job.since(after)
+            status = job.status
+        skipped = max(0, cursor - after - len(new))
+        if not tokens:
+            new = [event for event in new if event["type"] != "token"]
+        return {"status": status, "events": new, "next": cursor, "skipped": skipped, "done": status in ("done", "failed")}
+
+    def health(self) -> Dict[str, Any]:
+        from src.ollama_clients import get_model_readiness
+        from src.llm_scheduler import get_scheduler_stats
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._queue.qsize(),
+                "max_queued": self.max_queued,
+                "counters": dict(self.counters),
+                "avg_job_seconds": sum(self._durations) / len(self._durations) if self._durations else None,
+                "models": get_model_readiness(),
+                "llm_scheduler": get_scheduler_stats(),
+            }
+
+# --- HTTP ---
+
+def _handler(service: AnalysisService):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            payload = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/jobs":
+                return self._send(404, {"error": "not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                event_name = str(body.get("event_name", "")).strip()
+            except (ValueError, AttributeError):
+                return self._send(400, {"error": "body must be JSON"})
+            if not event_name:
+                return self._send(400, {"error": "event_name is required"})
+            try:
+                job, deduplicated = service.submit(event_name)
+            except ServiceBusy as e:
+                return self._send(429, {"error": str(e), "retry_after": e.retry_after}, {"Retry-After": str(int(e.retry_after) + 1)})
+            self._send(202, {**job.summary(), "deduplicated": deduplicated})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if parts == ["health"]:
+                return self._send(200, service.health())
+            if len(parts) < 2 or parts[0] != "jobs":
+                return self._send(404, {"error": "not found"})
+            job = service.get(parts[1])
+            if job is None:
+                return self._send(404, {"error": "unknown or expired job"})
+            if len(parts) == 2:
+                return self._send(200, {**job.summary(), "result": job.result})
+            if parts[2:] == ["events"]:
+                return self._send(200, service.events(job, after=int(params.get("after", 0)), wait=float(params.get("wait", 0)),
+                                                      tokens=params.get("tokens", "1") != "0"))
+            self._send(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            pass  # long-polls would flood the console
+
+    return Handler
+
+def load_app():
+    """
+    Same boot as the Streamlit app: warm models (in the background) + vector store, start the memory writer, cache results.
+    """
+    from src.graph import build_graph
+    from src.agents import llm, creative_llm
+    from src.rag import warm_vectorstore, EMBEDDING_MODEL
+    from src.ollama_clients import embeddings_model, warm_models
+    from src.memory_writer import get_memory_writer
+    from src.result_cache import CachedGraph
+    warmup = threading.Thread(target=warm_models, args=({"Reasoning LLM": llm, "Creative LLM": creative_llm, "Embeddings": embeddings_model(EMBEDDING_MODEL)},), daemon=True)
+    warmup.start()
+    warm_vectorstore()
+    get_memory_writer()
+    # No join: /health reports models that are still warming
+    return CachedGraph(build_graph())
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, workers: int = WORKERS, max_queued: int = MAX_QUEUED, app=None):
+    service = AnalysisService(app or load_app(), workers=workers, max_queued=max_queued)
+    server = ThreadingHTTPServer((host, port), _handler(service))
+    server.daemon_threads = True
+    print(f"🛰️ Analysis service on http://{host}:{server.server_port} ({workers} workers, queue limit {max_queued})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+# --- CLIENT ---
+
+class AnalysisClient:
+    """
+    Thin client used by main.py when ANALYSIS_SERVICE_URL is set.
+    """
+
+    def __init__(self, base_url: str, timeout: float = MAX_POLL_WAIT_SECONDS + 10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            detail = json.loads(e.read() or b"{}")
+            if e.code == 429:
+                raise ServiceBusy(float(detail.get("retry_after", DEFAULT_JOB_SECONDS)))
+            raise RuntimeError(detail.get("error", f"HTTP {e.code}"))
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("/health")
+
+    def submit(self, event_name: str) -> Dict[str, Any]:
+        return self._request("/jobs", {"event_name": event_name})
+
+    def job(self, job_id: str) -> Dict[str, Any]:
+        return self._request(f"/jobs/{job_id}")
+
+    def stream(self, job_id: str, tokens: bool = True, wait: float = 10.0) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the job's events as they are produced (long-polling), ending with "final".
+        Raises RuntimeError if the job failed.
+        """
+        cursor = 0
+        while True:
+            page = self._request(f"/jobs/{job_id}/events?" + urlencode({"after": cursor, "wait": wait, "tokens": int(tokens)}))
+            for event in page["events"]:
+                if event["type"] == "error":
+                    raise RuntimeError(event["error"])
+                yield event
+            cursor = page["next"]
+            if page["done"]:
+                return
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the agent graph as a local analysis service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=WORKERS, help="Graphs analyzed in parallel")
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED, help="Waiting jobs before POST /jobs returns 429")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.max_queued)
@@ -1,10 +1,10 @@
-from src.rag import initialize_memory
+from src.rag import ingest_knowledge_base
 
 if __name__ == "__main__":
     print("🚧 STARTING DATABASE SETUP...")
     print("This will wipe existing data and re-import text files.")
     
     # This is the ONLY place reset=True should ever be used
-    initialize_memory(reset=True)
+    ingest_knowledge_base(reset=True)
     
-    print("🏁 SETUP COMPLETE. You can now run 'streamlit run main.py'")
\ No newline at end of file
+    print("🏁 SETUP COMPLETE. You can now run 'streamlit run main.py'")
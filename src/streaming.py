@@ -0,0 +1,73 @@
+"""
+Streaming mode for the agent graph.
+Turns LangGraph's stream (LLM tokens + node updates, including the nodes
+inside parallel lanes) into a flat sequence of simple events the UI can
+render as they arrive.
+"""
+import re
+from typing import Any, Dict, Iterator, Optional
+
+STREAM_MODES = ["messages", "updates", "values"]
+
+def stream_analysis(app, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Runs the graph and yields, in order of arrival:
+        {"type": "token",  "node": "risk", "text": "...partial output..."}
+        {"type": "update", "node": "inference", "data": {"event_details": {...}}}
+        {"type": "final",  "state": {...full AgentState...}}
+    Every LLM call made with .invoke() inside a node is streamed token by token
+    (LangGraph switches ChatOllama to .stream() under the "messages" mode).
+    """
+    final_state: Dict[str, Any] = {}
+    for namespace, mode, payload in app.stream(inputs, config=config, stream_mode=STREAM_MODES, subgraphs=True):
+        if mode == "messages":
+            chunk, metadata = payload
+            if chunk.content:
+                yield {"type": "token", "node": metadata.get("langgraph_node"), "text": chunk.content}
+        elif mode == "updates":
+            for node, data in payload.items():
+                yield {"type": "update", "node": node, "data": data or {}}
+        elif mode == "values" and not namespace:
+            # Only the top-level graph's values are the real pipeline state
+            final_state = payload
+    yield {"type": "final", "state": final_state}
+
+def stream_with_spans(app, inputs: Dict[str, Any], recorder, config: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    stream_analysis() with the recorder's finished spans interleaved as
+        {"type": "span", "span": {...}}
+    so a single iterator carries everything the UI shows (in-process, or
+    relayed by the analysis service).
+    """
+    config = dict(config or {})
+    config["callbacks"] = [*config.get("callbacks", []), recorder]
+    for event in stream_analysis(app, inputs, config=config):
+        for span in recorder.drain():
+            yield {"type": "span", "span": span}
+        yield event
+    for span in recorder.drain():
+        yield {"type": "span", "span": span}
+
+_JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "\\": "\\", "/": "/"}
+
+def partial_json_string(text: str, field: str) -> str:
+    """
+    Best-effort read of a string field from JSON that is still being generated,
+    e.g. the "reasoning" of a risk assessment halfway through the response.
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(field), text)
+    if not match:
+        return ""
+    out = []
+    escaped = False
+    for ch in text[match.end():]:
+        if escaped:
+            out.append(_JSON_ESCAPES.get(ch, ch))
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == '"':
+            break
+        else:
+            out.append(ch)
+    return "".join(out)
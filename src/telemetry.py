@@ -0,0 +1,214 @@
+"""
+Structured tracing for the agent graph.
+A LangChain callback handler turns every graph node and every Ollama call
+into a "span" (wall time, tokens, tokens/sec, docs retrieved), appends it to
+a local JSONL file and keeps a rolling window in memory for the dashboard.
+"""
+import os
+import json
+import time
+import queue
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.rag import PROJECT_ROOT
+
+# --- CONFIGURATION ---
+TRACE_LOG_PATH = os.path.join(PROJECT_ROOT, "traces.jsonl")
+RECENT_SPANS_LIMIT = 500
+
+# Rolling window shared by every session in this process (feeds the summary panel)
+_recent_spans = deque(maxlen=RECENT_SPANS_LIMIT)
+_sink_lock = threading.Lock()
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def _write_span(span: Dict[str, Any], path: Optional[str]):
+    _recent_spans.append(span)
+    if not path:
+        return
+    with _sink_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(span) + "\n")
+
+def _token_usage(response) -> Dict[str, int]:
+    """
+    Pulls prompt/completion token counts out of an LLMResult (ChatOllama fills usage_metadata).
+    """
+    try:
+        usage = response.generations[0][0].message.usage_metadata or {}
+    except (AttributeError, IndexError):
+        usage = {}
+    return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+
+class TraceRecorder(BaseCallbackHandler):
+    """
+    Callback handler that records one span per graph node and per LLM call.
+    Pass it as config={"callbacks": [recorder]}; one recorder can be shared by
+    many concurrent runs (spans carry the id of the run they belong to).
+
+    - `durations` collects wall times per stage ("total" = whole run) for percentiles.
+    - `spans` is a thread-safe queue of finished spans, for live UI updates.
+    """
+
+    def __init__(self, sink_path: Optional[str] = TRACE_LOG_PATH, on_span: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.sink_path = sink_path
+        self.on_span = on_span
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.spans: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._open: Dict[Any, Dict[str, Any]] = {}
+        self._roots: Dict[Any, Any] = {}
+        self._event_names: Dict[Any, str] = {}
+        self._lock = threading.Lock()
+
+    # --- bookkeeping ---
+
+    def _root_of(self, run_id, parent_run_id):
+        if parent_run_id is None:
+            return run_id
+        return self._roots.get(parent_run_id, parent_run_id)
+
+    def _open_span(self, run_id, parent_run_id, kind: str, name: str, node: Optional[str]):
+        with self._lock:
+            root = self._root_of(run_id, parent_run_id)
+            self._roots[run_id] = root
+            self._open[run_id] = {"kind": kind, "name": name, "node": node, "start": time.perf_counter()}
+
+    def _close_span(self, run_id, **fields) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            opened = self._open.pop(run_id, None)
+            root = self._roots.pop(run_id, None)
+            if opened is None:
+                return None
+            wall = time.perf_counter() - opened.pop("start")
+            span = {
+                "trace_id": str(root),
+                "event_name": self._event_names.get(root, ""),
+                "timestamp": time.time(),
+                "wall_seconds": wall,
+                **opened,
+                **fields,
+            }
+            if opened["kind"] != "llm":
+                self.durations["total" if opened["kind"] == "run" else opened["name"]].append(wall)
+            if opened["kind"] == "run":
+                self._event_names.pop(root, None)
+        _write_span(span, self.sink_path)
+        self.spans.put(span)
+        if self.on_span:
+            self.on_span(span)
+        return span
+
+    # --- chains (the whole run + each graph node) ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        if parent_run_id is None:
+            if isinstance(inputs, dict) and "event_name" in inputs:
+                self._event_names[run_id] = inputs["event_name"]
+            self._open_span(run_id, None, "run", "total", None)
+        elif any(t.startswith("graph:step:") for t in tags or []):
+            name = kwargs.get("name") or "unknown"
+            self._open_span(run_id, parent_run_id, "node", name, name)
+        else:
+            # Not a span, but remember its root so nested LLM calls can be attributed
+            with self._lock:
+                self._roots[run_id] = self._root_of(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        fields = {}
+        if isinstance(outputs, dict) and ("knowledge_docs" in outputs or "past_memories" in outputs):
+            fields["docs_returned"] = len(outputs.get("knowledge_docs", [])) + len(outputs.get("past_memories", []))
+        if self._close_span(run_id, **fields) is None:
+            with self._lock:
+                self._roots.pop(run_id, None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        if self._close_span(run_id, error=str(error)) is None:
+            with self._lock:
+                self._roots.pop(run_id, None)
+
+    # --- Ollama calls ---
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        model = (kwargs.get("invocation_params") or {}).get("model", "llm")
+        self._open_span(run_id, parent_run_id, "llm", model, node)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = _token_usage(response)
+        with self._lock:
+            opened = self._open.get(run_id)
+            wall = time.perf_counter() - opened["start"] if opened else 0.0
+        usage["tokens_per_second"] = usage["completion_tokens"] / wall if wall else 0.0
+        self._close_span(run_id, **usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._close_span(run_id, error=str(error))
+
+    # --- reading ---
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """
+        Returns every span finished since the last drain (non-blocking).
+        """
+        drained = []
+        while True:
+            try:
+                drained.append(self.spans.get_nowait())
+            except queue.Empty:
+                return drained
+
+def get_trace_summary() -> Dict[str, Dict[str, float]]:
+    """
+    Rolling per-stage summary over the most recent spans in this process.
+    Retrieval docs and LLM tokens/sec are folded into the node they ran in.
+    """
+    by_stage: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    for span in list(_recent_spans):
+        if span["kind"] == "llm":
+            stage = by_stage[span.get("node") or span["name"]]
+            stage["tokens"].append(span.get("prompt_tokens", 0) + span.get("completion_tokens", 0))
+            stage["tokens_per_second"].append(span.get("tokens_per_second", 0.0))
+        else:
+            stage = by_stage[span["name"]]
+            stage["wall"].append(span["wall_seconds"])
+            if "docs_returned" in span:
+                stage["docs"].append(span["docs_returned"])
+
+    summary = {}
+    for name, values in by_stage.items():
+        walls = values.get("wall", [])
+        summary[name] = {
+            "runs": len(walls),
+            "avg_seconds": sum(walls) / len(walls) if walls else 0.0,
+            "p95_seconds": percentile(walls, 95),
+            "avg_tokens": sum(values["tokens"]) / len(values["tokens"]) if values.get("tokens") else 0.0,
+            "avg_tokens_per_second": sum(values["tokens_per_second"]) / len(values["tokens_per_second"]) if values.get("tokens_per_second") else 0.0,
+            "avg_docs": sum(values["docs"]) / len(values["docs"]) if values.get("docs") else 0.0,
+        }
+    return summary
+
+def format_span(span: Dict[str, Any]) -> str:
+    """
+    One-line, human readable version of a span for the UI.
+    """
+    if span.get("error"):
+        return f"❌ {span['name']} failed after {span['wall_seconds']:.2f}s: {span['error']}"
+    if span["kind"] == "llm":
+        return (f"🧠 {span.get('node') or span['name']} · LLM {span['wall_seconds']:.2f}s · "
+                f"{span.get('prompt_tokens', 0)}→{span.get('completion_tokens', 0)} tok · "
+                f"{span.get('tokens_per_second', 0.0):.1f} tok/s")
+    if span["kind"] == "run":
+        return f"🏁 Pipeline finished in {span['wall_seconds']:.2f}s"
+    line = f"✅ {span['name']} · {span['wall_seconds']:.2f}s"
+    if "docs_returned" in span:
+        line += f" · {span['docs_returned']} docs retrieved"
+    return line
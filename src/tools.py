@@ -1,47 +1,94 @@
-from typing import List
-from src.rag import query_knowledge_base
+from typing import Any, Dict, List, Optional, Tuple
+import src.rag as rag
+from src.rag import query_knowledge_base, query_knowledge_base_batch, get_vectorstore
+from src.incident_store import get_incident_store
+
+# --- QUERY FORMULATION ---
+# Kept in one place so the single and batched lookups embed identical strings.
+def _sop_query(query_tags: list) -> str:
+    return f"Standard operating procedures, safety rules, and compliance policies for {', '.join(query_tags)}"
+
+def _memory_query(query_tags: list) -> str:
+    return f"Past failures, incidents, lessons learned, and success stories regarding {', '.join(query_tags)}"
+
+def _format_sops(results: List[dict]) -> List[str]:
+    # Format for the LLM to easily distinguish sources
+    return [f"[RULE SOURCE: {r['source']}]\n{r['content']}" for r in results]
+
+def _format_memories(results: List[dict]) -> List[str]:
+    return [f"[HISTORY LOG: {r['source']}]\n{r['content']}" for r in results]
+
+def _format_incidents(results: List[Tuple[Dict[str, Any], float]]) -> List[str]:
+    # Same layout as the prose log, plus the structured facts the filters used
+    blocks = []
+    for incident, _ in results:
+        facts = [f"Date: {incident['occurred_at'] or 'unknown'}", f"Attendees: {incident['attendees'] or 'unknown'}"]
+        if incident.get("is_outdoors") is not None:
+            facts.append("Setting: outdoor" if incident["is_outdoors"] else "Setting: indoor")
+        blocks.append(
+            f"[HISTORY LOG: incident_store]\nEVENT ID: {incident['event_id']}\nType: {incident['event_type'] or 'unknown'}\n"
+            f"Outcome: {incident['outcome_detail'] or incident['outcome']}\n{' | '.join(facts)}\n"
+            f"Description: {incident['description'] or ''}\nLesson Learned: {incident['lesson'] or ''}"
+        )
+    return blocks
 
 def retrieve_sop_guidelines(query_tags: list) -> List[str]:
     """
     Retrieves ONLY documents tagged as 'category': 'rule'.
     Used by the Risk Agent to find relevant Standard Operating Procedures.
     """
-    # specific query formulation for rules
-    query_string = f"Standard operating procedures, safety rules, and compliance policies for {', '.join(query_tags)}"
-    
     # METADATA FILTERING: Only look for Rules
     # This ensures we don't accidentally retrieve a past event when we need a law.
     results = query_knowledge_base(
-        query=query_string,
+        query=_sop_query(query_tags),
         filters={"category": "rule"}, 
         k=4
     )
     
-    # Format for the LLM to easily distinguish sources
-    formatted_docs = []
-    for r in results:
-        formatted_docs.append(f"[RULE SOURCE: {r['source']}]\n{r['content']}")
-        
-    return formatted_docs
+    return _format_sops(results)
 
-def retrieve_past_events(query_tags: list) -> List[str]:
+def retrieve_past_events(query_tags: list, event_details: Optional[Dict[str, Any]] = None) -> List[str]:
     """
-    Retrieves ONLY documents tagged as 'category': 'memory'.
+    Retrieves past incidents comparable to the event.
     Used by the Memory Agent to find historical precedents (Successes/Failures).
     """
-    # specific query formulation for memories
-    query_string = f"Past failures, incidents, lessons learned, and success stories regarding {', '.join(query_tags)}"
+    store = get_incident_store()
+    if store.count():
+        # STRUCTURED RANKING: relevant incidents, same type/setting and similar size first
+        return _format_incidents(store.search_for_event(_memory_query(query_tags), event_details, k=3))
     
-    # METADATA FILTERING: Only look for Memories
+    # Incident store still empty (no memory files ingested yet): prose log chunks, category filter only
     results = query_knowledge_base(
-        query=query_string,
+        query=_memory_query(query_tags),
         filters={"category": "memory"},
         k=3
     )
     
-    # Format for the LLM
-    formatted_memories = []
-    for r in results:
-        formatted_memories.append(f"[HISTORY LOG: {r['source']}]\n{r['content']}")
-        
-    return formatted_memories
\ No newline at end of file
+    return _format_memories(results)
+
+def retrieve_context(query_tags: list, event_details: Optional[Dict[str, Any]] = None) -> Tuple[List[str], List[str]]:
+    """
+    Retrieves SOPs AND past events in one go.
+    Both query strings share a single batched embedding call, then fan out
+    to the 'rule' filtered search and the incident store's structured search
+    (or the 'memory' filtered search when the incident store is empty).
+    """
+    store = get_incident_store()
+    if not store.count():
+        sop_results, memory_results = query_knowledge_base_batch([
+            (_sop_query(query_tags), {"category": "rule"}, 4),
+            (_memory_query(query_tags), {"category": "memory"}, 3),
+        ])
+        return _format_sops(sop_results), _format_memories(memory_results)
+    
+    sop_query, memory_query = _sop_query(query_tags), _memory_query(query_tags)
+    mode = rag.RETRIEVAL_MODE
+    if mode == "lexical":
+        # Keyword ranking on both sides: no embedding call at all
+        sop_vector = memory_vector = None
+    else:
+        sop_vector, memory_vector = get_vectorstore().embeddings.embed_documents([sop_query, memory_query])
+    sop_results, = query_knowledge_base_batch([(sop_query, {"category": "rule"}, 4)], mode=mode, vectors=[sop_vector])
+    incidents = store.search_for_event(memory_query, event_details, k=3, query_vector=memory_vector, mode=mode)
+    
+    return _format_sops(sop_results), _format_incidents(incidents)